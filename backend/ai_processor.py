@@ -1,14 +1,88 @@
 """AI-powered processing of camera descriptions using OpenAI"""
-from openai import AsyncOpenAI
-from typing import List, Dict, Optional
-from pydantic import BaseModel
+from typing import List, Dict, Literal, Optional, Tuple
+from pydantic import BaseModel, ValidationError
 import os
 from dotenv import load_dotenv
-import json
+import asyncio
+import threading
+import time
+from metrics import metrics
+from prompt_builder import build_observation_prompt
+from context_memory import TieredMemory
+from hedging import HedgePolicy, hedged
+from resilience import CLOSED, AdaptiveRateLimiter, CircuitBreaker
+from structured_output import parse_reply, repair_messages, response_format
 
 load_dotenv()
 
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# The openai package takes most of the backend's import time, so the client
+# is built on first use (get_client); benchmarks may assign their own here
+client = None
+pool_transport = None
+# Prewarm builds the client on an executor thread while a request may build it on the loop
+_client_lock = threading.Lock()
+
+# Connection pool for the OpenAI client: enough connections for a burst of
+# camera calls plus hedges, kept alive between bursts so they skip the
+# TCP/TLS handshake. HTTP/2 (needs the h2 package) multiplexes instead.
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "20"))
+OPENAI_CONNECT_TIMEOUT_S = float(os.getenv("OPENAI_CONNECT_TIMEOUT_S", "5"))
+OPENAI_POOL_TIMEOUT_S = float(os.getenv("OPENAI_POOL_TIMEOUT_S", "5"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_S = float(os.getenv("OPENAI_KEEPALIVE_S", "60"))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "false").lower() == "true"
+
+
+def get_client():
+    """The shared AsyncOpenAI client, imported and constructed on first call"""
+    global client, pool_transport
+    if client is not None:
+        return client
+    with _client_lock:
+        if client is not None:
+            return client
+        import httpx
+        from openai import AsyncOpenAI
+        from http_pool import PoolMetricsTransport, http2_available
+
+        http2 = OPENAI_HTTP2 and http2_available()
+        if OPENAI_HTTP2 and not http2:
+            print("OPENAI_HTTP2 needs the h2 package (pip install h2); using HTTP/1.1")
+        limits = httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_KEEPALIVE_S,
+        )
+        transport = PoolMetricsTransport("openai", limits, http2=http2)
+        timeout = httpx.Timeout(
+            OPENAI_TIMEOUT_S, connect=OPENAI_CONNECT_TIMEOUT_S, pool=OPENAI_POOL_TIMEOUT_S
+        )
+        # No SDK-level retries: failures go to the circuit breaker and hedging
+        # instead of stalling a request for several timeouts in a row
+        built = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=timeout,
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=transport, timeout=timeout, follow_redirects=True),
+        )
+        pool_transport, client = transport, built
+    return client
+
+
+async def warm_up() -> None:
+    """Open a pooled connection to the API ahead of the first camera call"""
+    started = time.perf_counter()
+    try:
+        await get_client().models.list()
+    except Exception as e:
+        print(f"OpenAI warm-up failed: {e}")
+        return
+    metrics.observe("openai.warmup_ms", (time.perf_counter() - started) * 1000)
+
+
+def pool_stats() -> Optional[Dict]:
+    return pool_transport.stats() if pool_transport is not None else None
 
 
 class AIGameUpdate(BaseModel):
@@ -16,35 +90,63 @@ class AIGameUpdate(BaseModel):
     objective: str
     message_text: str
     message_visible: bool
-    danger_level: str  # "none", "low", "high"
+    danger_level: Literal["none", "low", "high"]
     boss_fight_active: bool
     boss_name: Optional[str] = None
     environment_summary: str
 
 
-# Keep a rolling context window of recent descriptions
-description_history: List[str] = []
+# Decoding is constrained to AIGameUpdate's JSON schema (strict structured
+# output); OPENAI_STRICT_SCHEMA=false falls back to plain JSON mode for
+# OpenAI-compatible servers without it. Replies that still fail validation
+# get LLM_REPAIR_RETRIES follow-up calls quoting the errors.
+OPENAI_STRICT_SCHEMA = os.getenv("OPENAI_STRICT_SCHEMA", "true").lower() == "true"
+UPDATE_RESPONSE_FORMAT = (
+    response_format(AIGameUpdate, "game_update") if OPENAI_STRICT_SCHEMA else {"type": "json_object"}
+)
+LLM_REPAIR_RETRIES = int(os.getenv("LLM_REPAIR_RETRIES", "1"))
+
+
+# Recent descriptions verbatim, older ones compacted into a running summary
 MAX_HISTORY = 5
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "150"))
+description_memory = TieredMemory(MAX_HISTORY, SUMMARY_TOKEN_BUDGET)
 
+# Token budget for the dynamic (per-call) part of the prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "400"))
 
-async def process_camera_description(description: str) -> AIGameUpdate:
-    """
-    Process a camera description using OpenAI to generate game state updates.
-    
-    Detects confrontations, generates Skyrim-style narratives, and determines
-    danger levels based on the scene description.
-    """
-    global description_history
-    
-    # Add to history
-    description_history.append(description)
-    if len(description_history) > MAX_HISTORY:
-        description_history.pop(0)
-    
-    # Build context from recent descriptions
-    context = "\n".join([f"[{i}] {desc}" for i, desc in enumerate(description_history)])
-    
-    system_prompt = """You are a game master for a real-world RPG overlay in the style of Skyrim and Dark Souls.
+# Hedged requests: if the primary model is slower than its recent
+# HEDGE_PERCENTILE latency, race a backup call (HEDGE_MODEL, default the
+# same model) and keep whichever valid answer arrives first
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() == "true"
+HEDGE_MODEL = os.getenv("HEDGE_MODEL")
+hedge_policy = HedgePolicy(
+    pct=float(os.getenv("HEDGE_PERCENTILE", "95")),
+    min_delay_ms=float(os.getenv("HEDGE_MIN_DELAY_MS", "500")),
+    max_delay_ms=float(os.getenv("HEDGE_MAX_DELAY_MS", "5000")),
+    budget=float(os.getenv("HEDGE_BUDGET", "0.1")),
+)
+
+# Shared guards for every OpenAI call made by this process
+openai_breaker = CircuitBreaker(
+    "openai",
+    failure_threshold=int(os.getenv("OPENAI_BREAKER_FAILURES", "3")),
+    base_cooldown_s=float(os.getenv("OPENAI_BREAKER_COOLDOWN_S", "2")),
+    max_cooldown_s=float(os.getenv("OPENAI_BREAKER_MAX_COOLDOWN_S", "60")),
+)
+openai_limiter = AdaptiveRateLimiter(
+    "openai",
+    rate=float(os.getenv("OPENAI_RATE_PER_S", "2")),
+    burst=float(os.getenv("OPENAI_RATE_BURST", "4")),
+)
+
+# Last successful update, served while the API is failing or throttled
+last_good_update: Optional[AIGameUpdate] = None
+
+# Static instructions. Kept as a module constant and sent first so the prefix
+# is byte-identical on every call, which is what provider-side prompt caching
+# keys on. Nothing per-call may be interpolated into it.
+SYSTEM_PROMPT = """You are a game master for a real-world RPG overlay in the style of Skyrim and Dark Souls.
 You receive descriptions of what a person's camera sees in real life, and you transform mundane reality into fantasy RPG elements.
 
 Your job:
@@ -73,48 +175,198 @@ Respond ONLY with valid JSON matching this schema:
   "boss_fight_active": true/false,
   "boss_name": "Boss Name" or null,
   "environment_summary": "Brief 2-3 word description"
-}"""
+}
+
+Several observations may arrive together, each tagged with the camera or bot that sent it. Treat them as views of the same moment and answer with ONE update for the whole scene; the most dangerous view decides the danger level."""
+
+
+def record_llm_usage(name: str, response, started: float) -> None:
+    """Report input/cached/output tokens and latency for one completion"""
+    metrics.incr(f"llm.{name}.calls")
+    metrics.observe(f"llm.{name}.latency_ms", (time.perf_counter() - started) * 1000)
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or 0
+    metrics.observe(f"llm.{name}.prompt_tokens", usage.prompt_tokens)
+    metrics.observe(f"llm.{name}.cached_prompt_tokens", cached)
+    metrics.observe(f"llm.{name}.completion_tokens", usage.completion_tokens)
+
 
+def degraded_update() -> AIGameUpdate:
+    """Last good update (without re-showing its popup), or a neutral fallback"""
+    if last_good_update is not None:
+        return last_good_update.model_copy(update={"message_text": "", "message_visible": False})
+    return AIGameUpdate(
+        objective="Continue your journey",
+        message_text="",
+        message_visible=False,
+        danger_level="none",
+        boss_fight_active=False,
+        boss_name=None,
+        environment_summary="unknown"
+    )
+
+
+async def request_completion(model: str, messages: List[Dict[str, str]]) -> str:
+    """
+    One completion call; returns the reply text.
+
+    Outcomes feed the shared breaker and limiter: 429s slow the limiter down,
+    5xx/connection errors/timeouts count as breaker failures.
+    """
+    import openai  # deferred like the client; only the exception types are needed
+
+    started = time.perf_counter()
     try:
-        response = await client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Recent camera observations:\n{context}\n\nLatest observation: {description}"}
-            ],
-            response_format={"type": "json_object"},
+        raw = await get_client().chat.completions.with_raw_response.create(
+            model=model,
+            messages=messages,
+            response_format=UPDATE_RESPONSE_FORMAT,
             temperature=0.7,
             max_tokens=300
         )
-        
-        result = json.loads(response.choices[0].message.content)
-        
-        return AIGameUpdate(
-            objective=result.get("objective", "Explore the unknown realm"),
-            message_text=result.get("message_text", ""),
-            message_visible=result.get("message_visible", False),
-            danger_level=result.get("danger_level", "none"),
-            boss_fight_active=result.get("boss_fight_active", False),
-            boss_name=result.get("boss_name"),
-            environment_summary=result.get("environment_summary", "mysterious area")
+    except openai.RateLimitError as e:
+        openai_limiter.on_rate_limited(e.response.headers)
+        openai_breaker.record_abandoned()
+        raise
+    except openai.APIStatusError as e:
+        if e.status_code >= 500:
+            openai_breaker.record_failure()
+        else:
+            openai_breaker.record_abandoned()
+        raise
+    except openai.APIConnectionError:
+        openai_breaker.record_failure()
+        raise
+    except asyncio.CancelledError:
+        # Hedging cancelled the losing call
+        openai_breaker.record_abandoned()
+        raise
+    except Exception:
+        # Anything else (a bug, an unexpected SDK error) must not leave a
+        # half-open probe marked in flight forever
+        openai_breaker.record_abandoned()
+        raise
+    openai_breaker.record_success()
+    openai_limiter.on_success(raw.headers)
+
+    response = raw.parse()
+    record_llm_usage("camera", response, started)
+    message = response.choices[0].message
+    if getattr(message, "refusal", None):
+        raise ValueError(f"Model refused: {message.refusal}")
+    return message.content or ""
+
+
+async def request_update(model: str, messages: List[Dict[str, str]]) -> AIGameUpdate:
+    """
+    A validated AIGameUpdate, parsed straight from the reply JSON. A reply
+    that doesn't validate (bad JSON, missing field, unknown danger level)
+    gets up to LLM_REPAIR_RETRIES repair calls, each within the rate limit;
+    after that the ValidationError is raised.
+    """
+    for attempt in range(LLM_REPAIR_RETRIES + 1):
+        content = await request_completion(model, messages)
+        started = time.perf_counter()
+        try:
+            update = parse_reply(AIGameUpdate, content)
+        except ValidationError as e:
+            metrics.incr("llm.camera.invalid")
+            if attempt == LLM_REPAIR_RETRIES or not openai_limiter.try_acquire():
+                raise
+            metrics.incr("llm.camera.repairs")
+            messages = repair_messages(messages, content, e)
+            continue
+        metrics.observe("llm.camera.parse_us", (time.perf_counter() - started) * 1e6)
+        if attempt:
+            metrics.incr("llm.camera.repaired")
+        return update
+
+
+async def process_camera_description(description: str) -> AIGameUpdate:
+    """
+    Process a camera description using OpenAI to generate game state updates.
+    
+    Detects confrontations, generates Skyrim-style narratives, and determines
+    danger levels based on the scene description.
+    """
+    return await process_camera_batch([(None, description)])
+
+
+async def process_camera_batch(observations: List[Tuple[Optional[str], str]]) -> AIGameUpdate:
+    """
+    One LLM call for one or more simultaneous (source, description)
+    observations, answered with a single consolidated update.
+    """
+    if len(observations) == 1:
+        latest, latest_header = observations[0][1], "Latest observation:"
+    else:
+        latest = "\n".join(
+            f"[{source or f'camera {i + 1}'}] {description}"
+            for i, (source, description) in enumerate(observations)
         )
+        latest_header = "Latest observations (same moment):"
+    # Previous descriptions plus the summary of older ones; the builder
+    # de-duplicates and trims them so prompt size stays bounded
+    user_prompt = build_observation_prompt(
+        description_memory.recent(),
+        latest,
+        PROMPT_TOKEN_BUDGET,
+        summary=description_memory.summary,
+        latest_header=latest_header,
+    )
+    for _, description in observations:
+        description_memory.add(description)
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+    def can_hedge() -> bool:
+        # Never hedge into a degraded upstream
+        if openai_breaker.state != CLOSED or not openai_limiter.try_acquire():
+            metrics.incr("llm.camera.hedge_skipped")
+            return False
+        return True
+
+    global last_good_update
+    try:
+        # Fail fast while the API is down or we are over our rate
+        if not openai_breaker.allow():
+            metrics.incr("llm.camera.short_circuited")
+            return degraded_update()
+        if not openai_limiter.try_acquire():
+            openai_breaker.record_abandoned()
+            metrics.incr("llm.camera.rate_limited")
+            return degraded_update()
+
+        if HEDGE_ENABLED:
+            last_good_update = await hedged(
+                lambda: request_update(model, messages),
+                lambda: request_update(HEDGE_MODEL or model, messages),
+                hedge_policy,
+                name="camera",
+                can_hedge=can_hedge,
+            )
+        else:
+            last_good_update = await request_update(model, messages)
+        return last_good_update
     
     except Exception as e:
         print(f"Error processing with OpenAI: {e}")
-        # Fallback response
-        return AIGameUpdate(
-            objective="Continue your journey",
-            message_text="",
-            message_visible=False,
-            danger_level="none",
-            boss_fight_active=False,
-            boss_name=None,
-            environment_summary="unknown"
-        )
+        metrics.incr("llm.camera.errors")
+        return degraded_update()
+    
+    finally:
+        # Fold evicted descriptions into the summary after the response
+        description_memory.schedule_compaction()
 
 
 def reset_context():
     """Clear the description history"""
-    global description_history
-    description_history = []
+    description_memory.reset()
 
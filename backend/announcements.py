@@ -0,0 +1,83 @@
+"""Voices overlay messages: synthesizes clips off the event loop and publishes them"""
+from typing import Callable, List, Optional
+import asyncio
+import time
+
+from metrics import metrics
+
+
+class Announcement:
+    __slots__ = ("text", "requested_at", "clip_key")
+
+    def __init__(self, text: str, requested_at: float, clip_key: Optional[str] = None):
+        self.text = text
+        self.requested_at = requested_at
+        self.clip_key = clip_key
+
+
+class AnnouncementPipeline:
+    """
+    Single worker that turns message texts into cached audio clips.
+
+    announce() never blocks: it replaces whatever is still waiting, so a
+    burst of messages only voices the latest one. The worker runs
+    `synthesize(text) -> clip key` in a thread and, unless a newer
+    announcement arrived meanwhile, publishes the result to every
+    subscriber queue (each holds at most `subscriber_backlog` items; the
+    oldest is dropped when a slow subscriber falls behind).
+    """
+
+    def __init__(self, synthesize: Callable[[str], Optional[str]], subscriber_backlog: int = 4):
+        self.synthesize = synthesize
+        self.subscriber_backlog = subscriber_backlog
+        self._pending: Optional[Announcement] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._subscribers: List[asyncio.Queue] = []
+
+    def announce(self, text: str) -> None:
+        if self._pending is not None:
+            metrics.incr("announce.superseded")
+        self._pending = Announcement(text, time.perf_counter())
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def subscribe(self) -> asyncio.Queue:
+        subscriber: asyncio.Queue = asyncio.Queue(maxsize=self.subscriber_backlog)
+        self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: asyncio.Queue) -> None:
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+
+    def _publish(self, announcement: Announcement) -> None:
+        for subscriber in self._subscribers:
+            if subscriber.full():
+                subscriber.get_nowait()
+                metrics.incr("announce.dropped")
+            subscriber.put_nowait(announcement)
+
+    async def run(self) -> None:
+        """Worker loop; start once as a background task"""
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._pending is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            announcement, self._pending = self._pending, None
+            try:
+                announcement.clip_key = await loop.run_in_executor(
+                    None, self.synthesize, announcement.text
+                )
+            except Exception as e:
+                metrics.incr("announce.errors")
+                print(f"Announcement synthesis failed: {e}")
+                continue
+            if announcement.clip_key is None:
+                continue  # TTS not configured
+            if self._pending is not None:
+                metrics.incr("announce.superseded")
+                continue
+            metrics.observe("announce.text_to_audio_ms", (time.perf_counter() - announcement.requested_at) * 1000)
+            self._publish(announcement)
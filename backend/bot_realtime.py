@@ -25,10 +25,14 @@ import sys
 import tempfile
 import time
 import requests
-from typing import List, Dict, Optional
-import json
+from typing import List, Dict, Literal, Optional
 from dotenv import load_dotenv
 from datetime import datetime
+from prompt_builder import estimate_tokens, fit_to_budget, truncate_to_tokens
+from context_memory import TieredMemory
+from pydantic import BaseModel, ValidationError
+from resilience import AdaptiveRateLimiter, CircuitBreaker
+from structured_output import parse_reply, repair_messages, response_format
 
 load_dotenv()
 
@@ -39,6 +43,83 @@ DEFAULT_INTERVAL = 3.0  # 0.33 FPS - good balance of detail and cost
 DEFAULT_CONTEXT_SIZE = 5  # Remember last 15 seconds
 DEFAULT_MODEL = "gpt-4o"
 MAX_TOKENS = 800  # Allow for detailed descriptions + structured output
+CONTEXT_TOKEN_BUDGET = 600  # Cap on previous-frame context per request
+SUMMARY_TOKEN_BUDGET = 200  # Cap on the compacted summary of older frames
+
+# Static instructions. Never interpolate per-frame data into this string: it
+# must stay byte-identical across frames so the provider can cache the prefix.
+GAME_STATE_INSTRUCTIONS = """You are the AI brain for a real-world RPG overlay system. Analyze this first-person view from smart glasses and generate ALL the game state in ONE response.
+
+ANALYZE THE CURRENT FRAME AND OUTPUT JSON:
+
+1. **DETAILED DESCRIPTION** (description): 
+   - EXTREMELY detailed visual description (3-5 sentences)
+   - People: count, positions, clothing, actions, expressions, body language
+   - Objects: specific items (laptop, coffee cup, drone), locations
+   - Environment: setting, lighting, layout, atmosphere
+   - Actions: movements, interactions, changes from previous frames
+   - Be specific: "person in white t-shirt near window" not just "a person"
+
+2. **RPG OBJECTIVE** (objective):
+   - Transform the scene into a Skyrim/Dark Souls style objective
+   - Examples: "Navigate the crowded guild hall" | "Investigate the sealed tavern" | "Explore the ancient archives"
+   - Keep it immersive and fantasy-themed
+   - Make it match what's actually happening
+
+3. **DANGER ASSESSMENT** (danger_level):
+   - "none": Normal, calm, safe situation
+   - "low": Tense, suspicious, argumentative but not threatening
+   - "high": Aggressive behavior, hostile approach, immediate danger
+   
+4. **BOSS FIGHT DETECTION** (boss_fight_active):
+   - true: Someone is behaving aggressively/threateningly, moving toward camera with hostile intent
+   - false: No immediate threat
+   - Look for: angry expressions, charging, raised fists, yelling, attacking
+
+5. **BOSS NAME** (boss_name):
+   - If boss_fight_active=true, create a Dark Souls style boss name
+   - Examples: "The Enraged Stranger" | "The Aggressive Assailant" | "The Hostile Wanderer"
+   - null if no boss fight
+
+6. **POPUP DECISION** (show_popup):
+   - true: Something significant happened that deserves a notification
+   - Examples: boss fight started, dramatic change, achievement, quest update
+   - false: Normal ongoing activity, nothing notable
+   - BE SELECTIVE - don't popup for every minor thing
+
+7. **POPUP MESSAGE** (popup_message):
+   - If show_popup=true, write a brief Skyrim-style message
+   - Examples: "DANGER APPROACHING!" | "Quest Updated" | "Enemy Defeated" | "Discovery Made"
+   - Keep it short and impactful
+   - Empty string if show_popup=false
+
+**RESPOND WITH VALID JSON ONLY:**
+{
+  "description": "detailed 3-5 sentence description...",
+  "objective": "RPG-style objective",
+  "danger_level": "none" | "low" | "high",
+  "boss_fight_active": true | false,
+  "boss_name": "Boss Name" or null,
+  "show_popup": true | false,
+  "popup_message": "message text" or ""
+}
+
+Be smart about popup decisions. Only show them for significant events, not every frame."""
+
+
+class BotGameState(BaseModel):
+    """The one-call game state reply; decoding is constrained to this schema"""
+    description: str
+    objective: str
+    danger_level: Literal["none", "low", "high"]
+    boss_fight_active: bool
+    boss_name: Optional[str] = None
+    show_popup: bool
+    popup_message: str
+
+
+GAME_STATE_FORMAT = response_format(BotGameState, "game_state")
+REPAIR_RETRIES = 1  # follow-up calls for a reply that fails validation
 
 
 def require_env(name: str) -> str:
@@ -94,31 +175,53 @@ def load_openai_client():
     return OpenAI(api_key=api_key)
 
 
-def build_context_prompt(context_window: List[Dict[str, str]]) -> str:
+def build_context_prompt(
+    context_window: List[Dict[str, str]],
+    budget_tokens: int = CONTEXT_TOKEN_BUDGET,
+    summary: str = "",
+) -> str:
     """
     Build a context prompt from recent frame descriptions.
     Helps GPT track changes, movements, and escalations over time.
+    Repeated descriptions are dropped and the oldest frames are trimmed
+    to keep the context within budget_tokens. `summary` condenses frames
+    older than the window and is prepended when given.
     """
-    if not context_window:
+    if not context_window and not summary:
         return ""
     
     context_lines = []
+    seen = set()
     for i, entry in enumerate(reversed(context_window)):
+        desc = entry.get('description', '')
+        key = " ".join(desc.lower().split())
+        if not key or key in seen:
+            continue
+        seen.add(key)
         seconds_ago = (i + 1) * 3  # Assuming 3-second intervals
         timestamp = entry.get('timestamp', 'unknown')
-        desc = entry.get('description', '')
         context_lines.append(f"[{seconds_ago}s ago - {timestamp}]: {desc}")
     
-    return "\n".join(context_lines)
+    # fit_to_budget expects oldest-first and keeps the newest entries
+    kept = fit_to_budget(list(reversed(context_lines)), budget_tokens)
+    lines = list(reversed(kept))
+    if summary:
+        remaining = budget_tokens - sum(estimate_tokens(line) + 1 for line in kept)
+        if remaining > 0:
+            lines.append(f"[earlier, summarized]: {truncate_to_tokens(summary, remaining)}")
+    return "\n".join(lines)
 
 
 def generate_complete_game_state(
     client,
     image_png_bytes: bytes,
     context_window: List[Dict[str, str]],
+    context_summary: str = "",
     model: str = "gpt-4o",
     max_tokens: int = 800,
     temperature: float = 0.3,
+    breaker: Optional[CircuitBreaker] = None,
+    limiter: Optional[AdaptiveRateLimiter] = None,
 ) -> Dict:
     """
     ONE SMART OpenAI CALL that generates EVERYTHING:
@@ -130,107 +233,80 @@ def generate_complete_game_state(
     
     Returns structured JSON with all game state.
     This saves money (1 call vs 2) and gives us full control.
+    
+    If given, `breaker` records server/connection failures and `limiter`
+    adapts to 429s and rate-limit headers.
     """
     b64_image = base64.b64encode(image_png_bytes).decode("utf-8")
     
     # Build context from previous frames
-    context_text = build_context_prompt(context_window)
-    context_section = f"\n\nPREVIOUS OBSERVATIONS:\n{context_text}\n" if context_text else ""
+    context_text = build_context_prompt(context_window, summary=context_summary)
+    context_section = f"PREVIOUS OBSERVATIONS:\n{context_text}\n\n" if context_text else ""
+    frame_prompt = f"{context_section}Analyze the current frame."
     
-    # One comprehensive prompt that does everything
-    prompt = f"""You are the AI brain for a real-world RPG overlay system. Analyze this first-person view from smart glasses and generate ALL the game state in ONE response.{context_section}
-
-ANALYZE THE CURRENT FRAME AND OUTPUT JSON:
-
-1. **DETAILED DESCRIPTION** (description): 
-   - EXTREMELY detailed visual description (3-5 sentences)
-   - People: count, positions, clothing, actions, expressions, body language
-   - Objects: specific items (laptop, coffee cup, drone), locations
-   - Environment: setting, lighting, layout, atmosphere
-   - Actions: movements, interactions, changes from previous frames
-   - Be specific: "person in white t-shirt near window" not just "a person"
-
-2. **RPG OBJECTIVE** (objective):
-   - Transform the scene into a Skyrim/Dark Souls style objective
-   - Examples: "Navigate the crowded guild hall" | "Investigate the sealed tavern" | "Explore the ancient archives"
-   - Keep it immersive and fantasy-themed
-   - Make it match what's actually happening
-
-3. **DANGER ASSESSMENT** (danger_level):
-   - "none": Normal, calm, safe situation
-   - "low": Tense, suspicious, argumentative but not threatening
-   - "high": Aggressive behavior, hostile approach, immediate danger
-   
-4. **BOSS FIGHT DETECTION** (boss_fight_active):
-   - true: Someone is behaving aggressively/threateningly, moving toward camera with hostile intent
-   - false: No immediate threat
-   - Look for: angry expressions, charging, raised fists, yelling, attacking
-
-5. **BOSS NAME** (boss_name):
-   - If boss_fight_active=true, create a Dark Souls style boss name
-   - Examples: "The Enraged Stranger" | "The Aggressive Assailant" | "The Hostile Wanderer"
-   - null if no boss fight
-
-6. **POPUP DECISION** (show_popup):
-   - true: Something significant happened that deserves a notification
-   - Examples: boss fight started, dramatic change, achievement, quest update
-   - false: Normal ongoing activity, nothing notable
-   - BE SELECTIVE - don't popup for every minor thing
-
-7. **POPUP MESSAGE** (popup_message):
-   - If show_popup=true, write a brief Skyrim-style message
-   - Examples: "DANGER APPROACHING!" | "Quest Updated" | "Enemy Defeated" | "Discovery Made"
-   - Keep it short and impactful
-   - Empty string if show_popup=false
-
-**RESPOND WITH VALID JSON ONLY:**
-{{
-  "description": "detailed 3-5 sentence description...",
-  "objective": "RPG-style objective",
-  "danger_level": "none" | "low" | "high",
-  "boss_fight_active": true | false,
-  "boss_name": "Boss Name" or null,
-  "show_popup": true | false,
-  "popup_message": "message text" or ""
-}}
-
-Be smart about popup decisions. Only show them for significant events, not every frame."""
-
-    try:
-        resp = client.chat.completions.create(
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            response_format={"type": "json_object"},
-            messages=[
+    # Static instructions go first as the system message so they form a
+    # cacheable prefix; per-frame context and the image come after them
+    messages = [
+        {"role": "system", "content": GAME_STATE_INSTRUCTIONS},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": frame_prompt},
                 {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{b64_image}"
-                            },
-                        },
-                    ],
-                }
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/png;base64,{b64_image}"
+                    },
+                },
             ],
-        )
-        
-        content = resp.choices[0].message.content or "{}"
-        game_state = json.loads(content)
+        }
+    ]
+    
+    for attempt in range(REPAIR_RETRIES + 1):
+        started = time.perf_counter()
+        try:
+            raw = client.chat.completions.with_raw_response.create(
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                response_format=GAME_STATE_FORMAT,
+                messages=messages,
+            )
+        except Exception as exc:
+            status = getattr(exc, "status_code", None)
+            if status == 429:
+                if limiter:
+                    limiter.on_rate_limited(getattr(getattr(exc, "response", None), "headers", None))
+                if breaker:
+                    breaker.record_abandoned()
+            elif breaker:
+                if status is None or status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_abandoned()
+            raise RuntimeError(f"OpenAI request failed: {exc}")
         
-        # Validate required fields
-        required_fields = ["description", "objective", "danger_level", "boss_fight_active"]
-        for field in required_fields:
-            if field not in game_state:
-                game_state[field] = "" if field in ["description", "objective"] else ("none" if field == "danger_level" else False)
+        if breaker:
+            breaker.record_success()
+        if limiter:
+            limiter.on_success(raw.headers)
         
-        return game_state
+        resp = raw.parse()
+        latency_ms = (time.perf_counter() - started) * 1000
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", 0) or 0
+            print(f"  ⏱  {latency_ms:.0f}ms, {usage.prompt_tokens} input tokens ({cached} cached, ~{estimate_tokens(frame_prompt)} context)")
         
-    except Exception as exc:
-        raise RuntimeError(f"OpenAI request failed: {exc}")
+        content = resp.choices[0].message.content or ""
+        try:
+            return parse_reply(BotGameState, content).model_dump()
+        except ValidationError as exc:
+            if attempt == REPAIR_RETRIES or (limiter and not limiter.try_acquire()):
+                raise RuntimeError(f"OpenAI response invalid: {exc}")
+            print(f"  ↻ Invalid reply, asking for a repair ({exc.error_count()} errors)")
+            messages = repair_messages(messages, content, exc)
 
 
 def update_sidequest_objective(objective: str, api_url: str = SIDEQUEST_API) -> bool:
@@ -287,7 +363,7 @@ def log_description_to_backend(description: str, api_url: str = SIDEQUEST_API) -
     try:
         requests.post(
             f"{api_url}/api/camera",
-            json={"description": description},
+            json={"description": description, "source": "bot_realtime"},
             timeout=2
         )
         return True
@@ -363,7 +439,19 @@ def main() -> None:
         print(f"✓ SideQuest backend is running at {args.api_url}")
 
     client = load_openai_client()
-    context_window: List[Dict[str, str]] = []
+    # Last --context-size frames verbatim; older frames are compacted into a
+    # bounded summary on a background thread between frames
+    memory = TieredMemory(
+        args.context_size,
+        SUMMARY_TOKEN_BUDGET,
+        text_of=lambda entry: entry.get('description', ''),
+    )
+    # Back off from a failing API instead of retrying every interval, and
+    # slow down when OpenAI reports we are over our rate limit
+    breaker = CircuitBreaker("openai", failure_threshold=3, base_cooldown_s=args.interval, max_cooldown_s=120)
+    limiter = AdaptiveRateLimiter(
+        "openai", rate=1 / args.interval, burst=1, min_rate=1 / 60, max_rate=1 / args.interval
+    )
 
     # Calculate costs
     images_per_hour = 3600 / args.interval
@@ -390,18 +478,38 @@ def main() -> None:
             frame_count += 1
             timestamp = datetime.now().strftime("%H:%M:%S")
             
+            skip_wait = None
+            if not breaker.allow():
+                wait = breaker.retry_after()
+                print(f"[{timestamp}] OpenAI circuit open, next attempt in {wait:.1f}s")
+                skip_wait = max(wait, 0.1)
+            elif not limiter.try_acquire():
+                breaker.record_abandoned()
+                print(f"[{timestamp}] Rate limited, skipping frame {frame_count}")
+                skip_wait = args.interval
+            if skip_wait is not None:
+                # --once means one frame, even a skipped one
+                if args.once:
+                    break
+                time.sleep(skip_wait)
+                continue
+            
             try:
                 # 1. Capture screenshot
                 print(f"[{timestamp}] Frame {frame_count}: Capturing...")
                 img = take_screenshot_png_bytes()
                 
                 # 2. ONE SMART OpenAI CALL - Get everything at once
+                context_window = memory.recent()
                 print(f"[{timestamp}] Frame {frame_count}: Processing with AI (context: {len(context_window)} frames)...")
                 game_state = generate_complete_game_state(
                     client, 
                     img, 
                     context_window,
-                    model=args.model
+                    context_summary=memory.summary,
+                    model=args.model,
+                    breaker=breaker,
+                    limiter=limiter,
                 )
                 
                 # 3. Display what we got
@@ -457,27 +565,27 @@ def main() -> None:
                 # Optional: Log raw description to backend (for debugging)
                 # log_description_to_backend(game_state.get('description', ''), args.api_url)
                 
-                # 5. Update context window (rolling buffer)
-                context_window.append({
+                # 5. Update context memory (verbatim window + running summary)
+                memory.add({
                     'timestamp': timestamp,
                     'description': game_state.get('description', ''),
                     'objective': game_state.get('objective', ''),
                     'danger_level': game_state.get('danger_level', 'none'),
                     'frame': frame_count
                 })
-                
-                if len(context_window) > args.context_size:
-                    context_window.pop(0)
+                memory.schedule_compaction()
                 
                 print(f"[{timestamp}] Frame {frame_count}: Complete\n")
                 
             except Exception as exc:
+                # Frees a half-open probe slot if we failed before calling OpenAI
+                breaker.record_abandoned()
                 print(f"[{timestamp}] [error] {exc}", file=sys.stderr)
             
             if args.once:
                 break
             
-            time.sleep(args.interval)
+            time.sleep(max(args.interval, breaker.retry_after()))
             
     except KeyboardInterrupt:
         print("\n\n" + "="*70)
@@ -0,0 +1,96 @@
+"""Micro-batching of /api/camera descriptions into one LLM call"""
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+import asyncio
+import time
+
+from metrics import metrics
+
+
+# (source id or None, description)
+Observation = Tuple[Optional[str], str]
+
+
+class CameraBatcher:
+    """
+    Collects observations that arrive within `window_ms` of the first one
+    (or until `max_batch` are waiting) and hands them to `process` as one
+    list. Every submitter gets the same result, so N cameras posting at
+    once cost one LLM call and produce one consolidated state update.
+
+    A later observation from a source already in the batch replaces the
+    earlier one: only the freshest view per camera is worth a prompt.
+
+    At most one call is in flight, so results are applied in the order the
+    observations arrived and never overwrite a newer update. While no call
+    is running and the last batch held a single observation, a post goes
+    out on the next event-loop turn (together with any posted in the same
+    turn), so a single camera pays no window; after a multi-camera batch
+    the first post waits out `window_ms` for the others. Posts that arrive
+    during a call queue up as the next batch, which goes out once the call
+    has finished and `window_ms` has passed since its first post. Should
+    more than `max_batch` queue up, the prompt keeps only the newest; every
+    submitter still gets the batch's result.
+    """
+
+    def __init__(self, process: Callable[[List[Observation]], Awaitable[Any]], window_ms: float = 100, max_batch: int = 8):
+        self.process = process
+        self.window_s = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Observation, float]] = []
+        self._result: Optional[asyncio.Future] = None
+        self._timer: Optional[asyncio.Handle] = None
+        self._running = False
+        self._last_size = 1
+
+    async def submit(self, description: str, source: Optional[str] = None) -> Any:
+        if self._result is None:
+            loop = asyncio.get_running_loop()
+            self._result = loop.create_future()
+            if self._running or self._last_size > 1:
+                self._timer = loop.call_later(self.window_s, self._flush)
+            else:
+                self._timer = loop.call_soon(self._flush)
+        result = self._result
+        if source is not None:
+            self._pending = [p for p in self._pending if p[0][0] != source]
+        self._pending.append(((source, description), time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        # shield: one caller disconnecting must not cancel the shared call
+        return await asyncio.shield(result)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._running:
+            # _run flushes the queued batch when the current call ends
+            return
+        batch, result = self._pending, self._result
+        self._pending, self._result = [], None
+        if not batch:
+            return
+        now = time.perf_counter()
+        for _, arrived in batch:
+            metrics.observe("camera.batch_wait_ms", (now - arrived) * 1000)
+        if len(batch) > self.max_batch:
+            metrics.incr("camera.superseded", len(batch) - self.max_batch)
+            batch = batch[-self.max_batch:]
+        metrics.incr("camera.batches")
+        metrics.observe("camera.batch_size", len(batch))
+        self._last_size = len(batch)
+        self._running = True
+        asyncio.ensure_future(self._run([observation for observation, _ in batch], result))
+
+    async def _run(self, batch: List[Observation], result: asyncio.Future) -> None:
+        try:
+            result.set_result(await self.process(batch))
+        except asyncio.CancelledError as e:
+            result.set_exception(e)
+            raise
+        except Exception as e:
+            result.set_exception(e)
+        finally:
+            self._running = False
+            if self._pending and self._timer is None:
+                self._flush()
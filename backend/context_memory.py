@@ -0,0 +1,148 @@
+"""Tiered narrative memory: recent entries verbatim, older ones in a bounded summary"""
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional
+import asyncio
+import re
+import threading
+
+from prompt_builder import estimate_tokens
+
+
+# Words ignored when comparing facts for overlap
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "with", "while",
+    "is", "are", "was", "were", "some", "their", "his", "her", "its", "into", "by",
+    "for", "from", "as", "that", "this", "there", "visible", "background",
+}
+# Two facts sharing at least this fraction of content words are merged
+MERGE_SIMILARITY = 0.5
+# Words kept from each evicted entry when it becomes a fact
+FACT_WORDS = 18
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+
+
+def _content_words(text: str) -> set:
+    return {w for w in re.findall(r"[a-z']+", text.lower()) if w not in STOPWORDS}
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def condense(text: str, max_words: int = FACT_WORDS) -> str:
+    """Reduce an entry to its first sentence, capped at max_words"""
+    first = _SENTENCE_END.split(text.strip(), maxsplit=1)[0].rstrip(".;")
+    words = first.split()
+    if len(words) > max_words:
+        words = words[:max_words] + ["..."]
+    return " ".join(words)
+
+
+class TieredMemory:
+    """
+    Keeps the last `recent_size` entries verbatim. Entries pushed out of that
+    window are queued and later folded into a running summary of short facts
+    capped at `summary_tokens`, so prompt size stays fixed no matter how long
+    the session runs.
+
+    Compaction is extractive (no LLM call) and runs off the hot path via
+    schedule_compaction(): on the running event loop's executor when called
+    from async code, otherwise on a daemon thread.
+    """
+
+    def __init__(
+        self,
+        recent_size: int = 5,
+        summary_tokens: int = 150,
+        text_of: Callable[[Any], str] = str,
+    ):
+        self.recent_size = recent_size
+        self.summary_tokens = summary_tokens
+        self._text_of = text_of
+        self._lock = threading.Lock()
+        self._recent: Deque[Any] = deque()
+        self._pending: List[str] = []
+        self._facts: List[str] = []
+        self._compacting = False
+        self._task: Optional[asyncio.Future] = None
+        # Bumped by reset(); a compaction that started before it is discarded
+        self._generation = 0
+
+    def add(self, entry: Any) -> None:
+        """Append an entry; anything evicted from the verbatim tier is queued"""
+        with self._lock:
+            self._recent.append(entry)
+            while len(self._recent) > self.recent_size:
+                self._pending.append(self._text_of(self._recent.popleft()))
+
+    def recent(self) -> List[Any]:
+        """Verbatim entries, oldest first"""
+        with self._lock:
+            return list(self._recent)
+
+    @property
+    def summary(self) -> str:
+        with self._lock:
+            return "; ".join(self._facts)
+
+    @property
+    def needs_compaction(self) -> bool:
+        return bool(self._pending)
+
+    def compact(self) -> None:
+        """Fold queued entries into the summary (cheap, extractive)"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            facts = list(self._facts)
+            generation = self._generation
+
+        for text in pending:
+            fact = condense(text)
+            if not fact:
+                continue
+            words = _content_words(fact)
+            # A newer fact replaces an older one describing the same scene
+            facts = [f for f in facts if _similarity(_content_words(f), words) < MERGE_SIMILARITY]
+            facts.append(fact)
+
+        # Oldest facts fall off first once the budget is exceeded
+        while facts and estimate_tokens("; ".join(facts)) > self.summary_tokens:
+            facts.pop(0)
+
+        with self._lock:
+            if generation == self._generation:
+                self._facts = facts
+
+    def schedule_compaction(self) -> None:
+        """Compact in the background if anything is queued and no run is active"""
+        with self._lock:
+            if not self._pending or self._compacting:
+                return
+            self._compacting = True
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is not None:
+            self._task = loop.run_in_executor(None, self._run_compaction)
+        else:
+            threading.Thread(target=self._run_compaction, daemon=True).start()
+
+    def _run_compaction(self) -> None:
+        try:
+            self.compact()
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._recent.clear()
+            self._pending = []
+            self._facts = []
@@ -8,7 +8,7 @@ import requests
 import time
 import random
 import math 
-from tts import stream_tts
+from tts import prewarm, stream_tts, wait_for_playback
 
 BASE_URL = "http://localhost:8787"
 
@@ -113,6 +113,7 @@ def demo_sequence():
     print_banner("🎮 SIDEQUEST OVERLAY LIVE DEMO 🎮")
     print("Watch the overlay at: http://localhost:3000")
     print("Press Ctrl+C to stop\n")
+    prewarm()  # stock phrases synthesize in the background while we wait
     time.sleep(2)
     
     # Phase 1: Intro and exploration
@@ -221,6 +222,7 @@ def demo_sequence():
     send_message("Achievement Unlocked: First Quest!", 5000)
     stream_tts("Achievement unlocked: First quest!", play=True)
     time.sleep(3)
+    wait_for_playback()
     
     print("\n✅ Demo complete!")
     print("The overlay will continue showing the last state.")
@@ -0,0 +1,60 @@
+"""GPS routes through San Francisco shared by benchmark.py and the tests"""
+from typing import List, Tuple
+import math
+
+
+# Waypoints of the demo_livestream.py tour (lat, lon)
+DEMO_WAYPOINTS = [
+    (37.7749, -122.4194), (37.8080, -122.4177), (37.8024, -122.4058),
+    (37.8030, -122.4187), (37.7955, -122.4058), (37.7879, -122.4074),
+]
+
+
+def _bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Heading in degrees (0 = north) from one nearby point to another"""
+    dy = (lat2 - lat1) * 111_320
+    dx = (lon2 - lon1) * 111_320 * math.cos(math.radians(lat1))
+    return math.degrees(math.atan2(dx, dy)) % 360
+
+
+def circle_route(fixes: int) -> List[Tuple[float, float, float]]:
+    """(lat, lon, heading) fixes along the mock_gps.py circle"""
+    route = []
+    angle = 0.0
+    for _ in range(fixes):
+        angle = (angle + 0.02) % (2 * math.pi)
+        route.append((
+            37.7749 + 0.002 * math.cos(angle),
+            -122.4194 + 0.002 * math.sin(angle),
+            (math.degrees(angle) + 90) % 360,
+        ))
+    return route
+
+
+def walking_route(fixes: int, step_m: float = 1.4) -> List[Tuple[float, float, float]]:
+    """1 Hz fixes walking (~1.4 m/s) between the demo_livestream.py waypoints"""
+    route = []
+    legs = list(zip(DEMO_WAYPOINTS, DEMO_WAYPOINTS[1:] + DEMO_WAYPOINTS[:1]))
+    while len(route) < fixes:
+        for (lat1, lon1), (lat2, lon2) in legs:
+            dy = (lat2 - lat1) * 111_320
+            dx = (lon2 - lon1) * 111_320 * math.cos(math.radians(lat1))
+            heading = _bearing(lat1, lon1, lat2, lon2)
+            steps = max(1, int(math.hypot(dx, dy) / step_m))
+            for i in range(steps):
+                t = i / steps
+                route.append((lat1 + (lat2 - lat1) * t, lon1 + (lon2 - lon1) * t, heading))
+                if len(route) >= fixes:
+                    return route
+    return route
+
+
+def demo_route(steps_per_leg: int = 3) -> List[Tuple[float, float, float]]:
+    """1 Hz fixes as demo_livestream.py sends them: a few big jumps per leg"""
+    route = []
+    for (lat1, lon1), (lat2, lon2) in zip(DEMO_WAYPOINTS, DEMO_WAYPOINTS[1:]):
+        heading = _bearing(lat1, lon1, lat2, lon2)
+        for step in range(steps_per_leg):
+            t = (step + 1) / steps_per_leg
+            route.append((lat1 + (lat2 - lat1) * t, lon1 + (lon2 - lon1) * t, heading))
+    return route
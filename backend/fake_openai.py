@@ -0,0 +1,144 @@
+"""
+Local OpenAI-compatible stand-in for latency and failure testing.
+
+Serves POST /v1/chat/completions with a canned AIGameUpdate-shaped JSON body
+after an injected delay. No API key or network access needed.
+
+Run as a server and point the backend at it:
+  uvicorn fake_openai:app --port 8790
+  OPENAI_BASE_URL=http://localhost:8790/v1 OPENAI_API_KEY=fake uvicorn main:app --port 8787
+
+Or use in-process (no sockets) with make_client().
+
+Latency knobs (environment, milliseconds):
+  FAKE_LATENCY_MS   base latency (default 300)
+  FAKE_JITTER_MS    uniform jitter added on top (default 100)
+  FAKE_TAIL_RATE    probability of a tail spike (default 0.05)
+  FAKE_TAIL_MS      extra latency of a tail spike (default 6000)
+  FAKE_CONNECT_MS   added to the first request on each new connection,
+                    standing in for the TCP/TLS handshake with the real
+                    API that loopback doesn't have (default 0)
+A per-model base latency can be given as FAKE_LATENCY_MS_<MODEL>, with the
+model name upper-cased and non-alphanumerics replaced by "_".
+
+Failure knobs (environment, probabilities 0-1):
+  FAKE_ERROR_RATE       answer 500 instead of a completion (default 0)
+  FAKE_RATE_LIMIT_RATE  answer 429 with retry-after-ms (default 0)
+  FAKE_INVALID_RATE     answer with a reply that fails the schema: half an
+                        unknown danger level, half truncated JSON (default 0)
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+
+
+app = FastAPI()
+
+CANNED_UPDATE = {
+    "objective": "Investigate the dimly lit guild hall",
+    "message_text": "",
+    "message_visible": False,
+    "danger_level": "none",
+    "boss_fight_active": False,
+    "boss_name": None,
+    "environment_summary": "quiet guild hall",
+}
+
+
+def _env_ms(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def injected_latency(model: str) -> float:
+    """Seconds to wait before answering a request for `model`"""
+    model_key = "FAKE_LATENCY_MS_" + re.sub(r"[^A-Z0-9]", "_", model.upper())
+    base = _env_ms(model_key, _env_ms("FAKE_LATENCY_MS", 300))
+    latency = base + random.uniform(0, _env_ms("FAKE_JITTER_MS", 100))
+    if random.random() < _env_ms("FAKE_TAIL_RATE", 0.05):
+        latency += _env_ms("FAKE_TAIL_MS", 6000)
+    return latency / 1000
+
+
+# Client (host, port) pairs seen so far: a new pair is a new connection
+_connections = set()
+
+
+async def connection_setup(request: Request) -> None:
+    if request.client is None or request.client in _connections:
+        return
+    _connections.add(request.client)
+    await asyncio.sleep(_env_ms("FAKE_CONNECT_MS", 0) / 1000)
+
+
+@app.get("/v1/models")
+async def list_models(request: Request):
+    """Cheap endpoint for connection warm-up"""
+    await connection_setup(request)
+    return {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model", "owned_by": "fake"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    await connection_setup(request)
+    body = await request.json()
+    model = body.get("model", "fake-model")
+    await asyncio.sleep(injected_latency(model))
+
+    if random.random() < _env_ms("FAKE_RATE_LIMIT_RATE", 0):
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after-ms": "500", "x-ratelimit-remaining-requests": "0"},
+        )
+    if random.random() < _env_ms("FAKE_ERROR_RATE", 0):
+        return JSONResponse(
+            {"error": {"message": "Injected server error", "type": "server_error"}},
+            status_code=500,
+        )
+
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+    content = json.dumps(CANNED_UPDATE)
+    if random.random() < _env_ms("FAKE_INVALID_RATE", 0):
+        if random.random() < 0.5:
+            content = json.dumps({**CANNED_UPDATE, "danger_level": "medium"})
+        else:
+            content = content[: len(content) // 2]
+    headers = {
+        "x-ratelimit-remaining-requests": "500",
+        "x-ratelimit-reset-requests": "60s",
+    }
+    return JSONResponse(headers=headers, content={
+        "id": f"chatcmpl-fake-{random.getrandbits(32):08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (prompt_chars + len(content)) // 4,
+        },
+    })
+
+
+def make_client():
+    """AsyncOpenAI client wired to this app in-process (no sockets)"""
+    import httpx
+    from openai import AsyncOpenAI
+
+    transport = httpx.ASGITransport(app=app)
+    return AsyncOpenAI(
+        api_key="fake",
+        max_retries=0,
+        base_url="http://fake-openai/v1",
+        http_client=httpx.AsyncClient(transport=transport),
+    )
@@ -0,0 +1,151 @@
+"""Circular geofences around POIs with per-player enter/exit events"""
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import math
+
+from metrics import metrics
+from models import POI
+from motion import METERS_PER_DEG_LAT
+
+
+ENTER = "enter"
+EXIT = "exit"
+
+# (lat, lon, radius_km) -> (site_id, lat, lon, label) of POIs within radius_km
+SiteLookup = Callable[[float, float, float], Iterable[Tuple[int, float, float, str]]]
+
+
+class Geofence:
+    __slots__ = ("fence_id", "lat", "lon", "radius_m", "label")
+
+    def __init__(self, fence_id: int, lat: float, lon: float, radius_m: float, label: str):
+        self.fence_id = fence_id
+        self.lat = lat
+        self.lon = lon
+        self.radius_m = radius_m
+        self.label = label
+
+
+class GeofenceEvent:
+    __slots__ = ("kind", "fence")
+
+    def __init__(self, kind: str, fence: Geofence):
+        self.kind = kind
+        self.fence = fence
+
+    def __repr__(self) -> str:
+        return f"GeofenceEvent({self.kind!r}, {self.fence.label!r})"
+
+
+class GeofenceEngine:
+    """
+    Tracks which fences each player is inside.
+
+    Fences are bucketed into a uniform grid of `cell_m` square cells (each
+    fence in every cell its circle touches), so a fix only tests the fences
+    registered in its own cell: constant time in the total fence count.
+
+    A player counts as inside from the fence radius and stays inside until
+    `exit_factor` times the radius, so GPS noise at the edge doesn't make
+    enter/exit flap.
+
+    Fences can also come from a lookup (add_source): a cell's fences are
+    then fetched the first time a fix lands in it, so startup doesn't touch
+    every POI of a large extract. Fence ids come from one counter whatever
+    the fence's origin; a source's own site ids are mapped onto it.
+    """
+
+    def __init__(self, cell_m: float = 250.0, exit_factor: float = 1.2):
+        self.cell_deg = cell_m / METERS_PER_DEG_LAT
+        self.exit_factor = exit_factor
+        self.fences: Dict[int, Geofence] = {}
+        self._grid: Dict[Tuple[int, int], List[Geofence]] = defaultdict(list)
+        self._inside: Dict[str, Set[int]] = defaultdict(set)
+        self._lookup: Optional[SiteLookup] = None
+        self._lookup_radius_m = 0.0
+        self._loaded: Set[Tuple[int, int]] = set()
+        self._site_fences: Dict[int, int] = {}
+        self._next_id = 0
+
+    def _allocate(self) -> int:
+        fence_id = self._next_id
+        self._next_id += 1
+        return fence_id
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def _cell_range(self, fence: Geofence) -> Tuple[int, int, int, int]:
+        """Cells the fence's exit circle touches: lat_lo, lon_lo, lat_hi, lon_hi"""
+        reach_m = fence.radius_m * self.exit_factor
+        dlat = reach_m / METERS_PER_DEG_LAT
+        dlon = dlat / max(math.cos(math.radians(fence.lat)), 1e-6)
+        return (*self._cell(fence.lat - dlat, fence.lon - dlon), *self._cell(fence.lat + dlat, fence.lon + dlon))
+
+    def add(self, fence: Geofence) -> None:
+        self.fences[fence.fence_id] = fence
+        self._next_id = max(self._next_id, fence.fence_id + 1)
+        lat_lo, lon_lo, lat_hi, lon_hi = self._cell_range(fence)
+        for i in range(lat_lo, lat_hi + 1):
+            for j in range(lon_lo, lon_hi + 1):
+                self._grid[(i, j)].append(fence)
+
+    def add_pois(self, pois: Iterable[POI], radius_m: float) -> None:
+        """One fence of radius_m around each POI"""
+        for poi in pois:
+            self.add(Geofence(self._allocate(), poi.lat, poi.lon, radius_m, poi.label))
+
+    def add_source(self, lookup: SiteLookup, radius_m: float) -> None:
+        """Fences of radius_m around the sites `lookup` returns, loaded per cell on demand"""
+        self._lookup = lookup
+        self._lookup_radius_m = radius_m
+
+    def _load_cell(self, cell: Tuple[int, int]) -> None:
+        self._loaded.add(cell)
+        lat = (cell[0] + 0.5) * self.cell_deg
+        lon = (cell[1] + 0.5) * self.cell_deg
+        # Anything whose exit circle reaches the cell is within its half
+        # diagonal plus that circle of the centre
+        reach_m = self.cell_deg * METERS_PER_DEG_LAT * math.sqrt(0.5) + self._lookup_radius_m * self.exit_factor
+        for site_id, site_lat, site_lon, label in self._lookup(lat, lon, reach_m / 1000):
+            fence_id = self._site_fences.get(site_id)
+            if fence_id is None:
+                fence_id = self._site_fences[site_id] = self._allocate()
+                self.fences[fence_id] = Geofence(fence_id, site_lat, site_lon, self._lookup_radius_m, label)
+            fence = self.fences[fence_id]
+            lat_lo, lon_lo, lat_hi, lon_hi = self._cell_range(fence)
+            if lat_lo <= cell[0] <= lat_hi and lon_lo <= cell[1] <= lon_hi:
+                self._grid[cell].append(fence)
+        metrics.incr("geofence.cells_loaded")
+
+    def check(self, lat: float, lon: float, player_id: str = "player") -> List[GeofenceEvent]:
+        """Update the player's inside set for a fix; returns enter/exit events"""
+        inside = self._inside[player_id]
+        cos_lat = math.cos(math.radians(lat))
+        now_inside = set()
+        entered = []
+        cell = self._cell(lat, lon)
+        if self._lookup is not None and cell not in self._loaded:
+            self._load_cell(cell)
+        for fence in self._grid.get(cell, ()):
+            north = (fence.lat - lat) * METERS_PER_DEG_LAT
+            east = (fence.lon - lon) * METERS_PER_DEG_LAT * cos_lat
+            was_inside = fence.fence_id in inside
+            limit = fence.radius_m * (self.exit_factor if was_inside else 1.0)
+            if math.hypot(north, east) <= limit:
+                now_inside.add(fence.fence_id)
+                if not was_inside:
+                    entered.append(GeofenceEvent(ENTER, fence))
+        # Fences not registered in this cell can't contain the point either
+        events = [GeofenceEvent(EXIT, self.fences[i]) for i in inside - now_inside]
+        events += entered
+        self._inside[player_id] = now_inside
+        for event in events:
+            metrics.incr(f"geofence.{event.kind}")
+        return events
+
+    def inside(self, player_id: str = "player") -> List[Geofence]:
+        return [self.fences[i] for i in self._inside.get(player_id, ())]
+
+    def __len__(self) -> int:
+        return len(self.fences)
@@ -0,0 +1,195 @@
+"""Smoothing and outlier rejection for raw phone GPS fixes"""
+from typing import Optional
+import math
+import time
+
+from metrics import metrics
+from motion import METERS_PER_DEG_LAT, _angle_diff
+
+
+class _Axis:
+    """Constant-velocity Kalman filter along one axis (position m, velocity m/s)"""
+    __slots__ = ("p", "v", "pp", "pv", "vv")
+
+    def __init__(self, position: float, position_var: float, velocity_var: float):
+        self.p = position
+        self.v = 0.0
+        self.pp = position_var
+        self.pv = 0.0
+        self.vv = velocity_var
+
+    def predict(self, dt: float, accel_var: float) -> None:
+        self.p += self.v * dt
+        dt2 = dt * dt
+        self.pp += dt * (2 * self.pv + dt * self.vv) + accel_var * dt2 * dt2 / 4
+        self.pv += dt * self.vv + accel_var * dt2 * dt / 2
+        self.vv += accel_var * dt2
+
+    def update(self, measured: float, measurement_var: float) -> None:
+        s = self.pp + measurement_var
+        k_p = self.pp / s
+        k_v = self.pv / s
+        residual = measured - self.p
+        self.p += k_p * residual
+        self.v += k_v * residual
+        self.vv -= k_v * self.pv
+        self.pv -= k_v * self.pp
+        self.pp -= k_p * self.pp
+
+
+class GpsFix:
+    """Filter output for one raw fix"""
+    __slots__ = ("lat", "lon", "heading", "speed", "accepted", "significant")
+
+    def __init__(self, lat: float, lon: float, heading: float, speed: float,
+                 accepted: bool, significant: bool):
+        self.lat = lat
+        self.lon = lon
+        self.heading = heading
+        self.speed = speed
+        self.accepted = accepted
+        self.significant = significant
+
+
+class GpsFilter:
+    """
+    Smooths raw GPS fixes with a constant-velocity Kalman filter.
+
+    A fix whose implied speed from the current estimate exceeds
+    `max_speed_mps` is rejected as an outlier. The filter restarts at the
+    new fix instead once the raw fixes agree on where the player went: the
+    outlier stays within accuracy of the previous fix, or continues the
+    previous step at the same velocity (a scripted player stepping along a
+    leg). Scattered multipath spikes do neither and stay rejected, up to
+    `max_rejects` in a row; that many, or a gap longer than `max_gap_s`,
+    restarts the filter regardless.
+
+    Each output is flagged `significant` when the smoothed position moved at
+    least `min_move_m` or the heading turned at least `min_turn_deg` since the
+    last significant fix; downstream POI and broadcast work keys off that.
+    """
+
+    def __init__(
+        self,
+        accuracy_m: float = 8.0,
+        accel_mps2: float = 0.5,
+        max_speed_mps: float = 50.0,
+        max_rejects: int = 3,
+        max_gap_s: float = 5.0,
+        min_move_m: float = 8.0,
+        min_turn_deg: float = 10.0,
+        min_heading_speed_mps: float = 1.0,
+    ):
+        self.accuracy_m = accuracy_m
+        self.accel_var = accel_mps2 ** 2
+        self.max_speed_mps = max_speed_mps
+        self.max_rejects = max_rejects
+        self.max_gap_s = max_gap_s
+        self.min_move_m = min_move_m
+        self.min_turn_deg = min_turn_deg
+        self.min_heading_speed_mps = min_heading_speed_mps
+        self.reset()
+
+    def reset(self) -> None:
+        self._origin = None
+        self._north: Optional[_Axis] = None
+        self._east: Optional[_Axis] = None
+        self._t = 0.0
+        self._rejects = 0
+        self._recent = ()
+        self._heading = 0.0
+        self._last_significant = None
+
+    def _to_local(self, lat: float, lon: float):
+        lat0, lon0, cos_lat = self._origin
+        return (lat - lat0) * METERS_PER_DEG_LAT, (lon - lon0) * METERS_PER_DEG_LAT * cos_lat
+
+    def _to_latlon(self, north: float, east: float):
+        lat0, lon0, cos_lat = self._origin
+        return lat0 + north / METERS_PER_DEG_LAT, lon0 + east / (METERS_PER_DEG_LAT * cos_lat)
+
+    def _start(self, lat: float, lon: float, t: float, variance: float) -> None:
+        self._origin = (lat, lon, max(math.cos(math.radians(lat)), 1e-6))
+        self._north = _Axis(0.0, variance, self.max_speed_mps ** 2)
+        self._east = _Axis(0.0, variance, self.max_speed_mps ** 2)
+        self._t = t
+        self._rejects = 0
+
+    def update(
+        self,
+        lat: float,
+        lon: float,
+        heading: Optional[float] = None,
+        accuracy_m: Optional[float] = None,
+        t: Optional[float] = None,
+    ) -> GpsFix:
+        t = time.monotonic() if t is None else t
+        variance = (accuracy_m or self.accuracy_m) ** 2
+        metrics.incr("gps.fixes")
+
+        accepted = True
+        recent, self._recent = self._recent, (self._recent + ((lat, lon, t),))[-2:]
+        if self._origin is None or t - self._t > self.max_gap_s:
+            self._start(lat, lon, t, variance)
+        else:
+            dt = max(t - self._t, 0.0)
+            north, east = self._to_local(lat, lon)
+            # Fixes rarely come faster than 1 Hz; don't let near-simultaneous
+            # requests turn a few meters of jitter into an absurd speed
+            implied_speed = math.hypot(north - self._north.p, east - self._east.p) / max(dt, 1.0)
+            if implied_speed > self.max_speed_mps and (
+                self._rejects + 1 >= self.max_rejects or self._agrees(recent, north, east, t, accuracy_m)
+            ):
+                self._start(lat, lon, t, variance)
+                metrics.incr("gps.resets")
+            elif implied_speed > self.max_speed_mps:
+                self._rejects += 1
+                accepted = False
+                metrics.incr("gps.rejected")
+            else:
+                self._rejects = 0
+                self._north.predict(dt, self.accel_var)
+                self._east.predict(dt, self.accel_var)
+                self._north.update(north, variance)
+                self._east.update(east, variance)
+                self._t = t
+
+        speed = math.hypot(self._north.v, self._east.v)
+        if heading is not None:
+            self._heading = heading % 360
+        elif speed >= self.min_heading_speed_mps:
+            self._heading = math.degrees(math.atan2(self._east.v, self._north.v)) % 360
+
+        smoothed_lat, smoothed_lon = self._to_latlon(self._north.p, self._east.p)
+        significant = False
+        if accepted:
+            last = self._last_significant
+            if (
+                last is None
+                or math.hypot(*self._to_local_delta(last, smoothed_lat, smoothed_lon)) >= self.min_move_m
+                or _angle_diff(self._heading, last[2]) >= self.min_turn_deg
+            ):
+                significant = True
+                self._last_significant = (smoothed_lat, smoothed_lon, self._heading)
+                metrics.incr("gps.significant")
+        return GpsFix(smoothed_lat, smoothed_lon, self._heading, speed, accepted, significant)
+
+    def _agrees(self, recent, north: float, east: float, t: float, accuracy_m: Optional[float]) -> bool:
+        """Whether an outlier confirms the raw fixes before it as a real jump"""
+        if not recent:
+            return False
+        tolerance = 2 * (accuracy_m or self.accuracy_m)
+        prev_north, prev_east = self._to_local(recent[-1][0], recent[-1][1])
+        if math.hypot(north - prev_north, east - prev_east) <= tolerance:
+            return True
+        if len(recent) < 2:
+            return False
+        before_north, before_east = self._to_local(recent[0][0], recent[0][1])
+        scale = max(t - recent[-1][2], 1.0) / max(recent[-1][2] - recent[0][2], 1.0)
+        ahead_north = prev_north + (prev_north - before_north) * scale
+        ahead_east = prev_east + (prev_east - before_east) * scale
+        return math.hypot(north - ahead_north, east - ahead_east) <= tolerance
+
+    def _to_local_delta(self, last, lat: float, lon: float):
+        _, _, cos_lat = self._origin
+        return (lat - last[0]) * METERS_PER_DEG_LAT, (lon - last[1]) * METERS_PER_DEG_LAT * cos_lat
@@ -0,0 +1,123 @@
+"""Hedged requests: fire a backup call when the primary is slower than usual"""
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+import asyncio
+import time
+
+from metrics import metrics, percentile
+
+
+T = TypeVar("T")
+
+
+class HedgePolicy:
+    """
+    Decides when a backup request is sent.
+
+    The hedge deadline is the `pct` percentile of recent primary latencies,
+    clamped to [min_delay_ms, max_delay_ms]; until `min_samples` latencies are
+    known `initial_delay_ms` is used. `budget` caps hedges as a fraction of
+    requests (0.1 = at most one extra call per ten, plus `burst` up front) so a
+    slow provider cannot double our traffic.
+    """
+
+    def __init__(
+        self,
+        pct: float = 95,
+        min_delay_ms: float = 500,
+        max_delay_ms: float = 5000,
+        initial_delay_ms: float = 2000,
+        budget: float = 0.1,
+        burst: int = 1,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        self.pct = pct
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.initial_delay_ms = initial_delay_ms
+        self.budget = budget
+        self.burst = burst
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.hedges = 0
+
+    def observe(self, latency_ms: float) -> None:
+        self._latencies.append(latency_ms)
+
+    def delay(self) -> float:
+        """Seconds to wait on the primary before hedging"""
+        if len(self._latencies) < self.min_samples:
+            delay_ms = self.initial_delay_ms
+        else:
+            delay_ms = percentile(self._latencies, self.pct)
+        return min(self.max_delay_ms, max(self.min_delay_ms, delay_ms)) / 1000
+
+    def try_spend(self) -> bool:
+        """Reserve a hedge if the budget allows it"""
+        if self.budget <= 0 or self.hedges + 1 > self.budget * self.requests + self.burst:
+            return False
+        self.hedges += 1
+        return True
+
+    def refund(self) -> None:
+        """Return a reserved hedge that was not sent"""
+        self.hedges = max(0, self.hedges - 1)
+
+
+async def hedged(
+    primary: Callable[[], Awaitable[T]],
+    backup: Callable[[], Awaitable[T]],
+    policy: HedgePolicy,
+    name: str = "request",
+    can_hedge: Optional[Callable[[], bool]] = None,
+) -> T:
+    """
+    Await primary(); if it has not finished within policy.delay(), also start
+    backup() and return whichever succeeds first, cancelling the other.
+
+    can_hedge() is asked once the budget allows a hedge; if it declines, the
+    hedge is refunded and not sent.
+
+    A call that raises counts as a loss, not a win, so a fast failure does not
+    beat a slower valid answer. If every attempt fails the last error is raised.
+    Counters: hedge.<name>.requests / .fired / .declined / .won.
+    """
+    policy.requests += 1
+    metrics.incr(f"hedge.{name}.requests")
+    started = time.perf_counter()
+
+    primary_task = asyncio.ensure_future(primary())
+    pending = {primary_task}
+    backup_task: Optional[asyncio.Future] = None
+    last_error: Optional[BaseException] = None
+
+    try:
+        done, pending = await asyncio.wait(pending, timeout=policy.delay())
+        if not done and policy.try_spend():
+            if can_hedge is None or can_hedge():
+                metrics.incr(f"hedge.{name}.fired")
+                backup_task = asyncio.ensure_future(backup())
+                pending = pending | {backup_task}
+            else:
+                policy.refund()
+                metrics.incr(f"hedge.{name}.declined")
+
+        while True:
+            for task in done:
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    continue
+                if task is backup_task:
+                    metrics.incr(f"hedge.{name}.won")
+                # If the backup won, the primary was at least this slow, so
+                # the sample is a lower bound rather than being dropped
+                policy.observe((time.perf_counter() - started) * 1000)
+                return task.result()
+            if not pending:
+                raise last_error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,49 @@
+"""Conditional GET and response compression helpers for cached JSON bodies"""
+from typing import Optional
+import gzip
+
+try:
+    import brotli
+except ImportError:  # br is only offered when the brotli package is installed
+    brotli = None
+
+
+# Bodies smaller than this go out uncompressed; the headers would eat the gain
+MIN_COMPRESS_BYTES = 500
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header lists `etag` (weak or strong) or is *"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def pick_encoding(accept_encoding: Optional[str], size: int) -> Optional[str]:
+    """The content coding to use for a body of `size` bytes: "br", "gzip" or None"""
+    if not accept_encoding or size < MIN_COMPRESS_BYTES:
+        return None
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the bytes identical across processes for the same body
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)
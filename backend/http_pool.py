@@ -0,0 +1,80 @@
+"""Pooled, instrumented httpx transport for the shared OpenAI client"""
+from typing import Optional
+import importlib.util
+import time
+
+import httpx
+
+from metrics import metrics
+
+
+class PoolMetricsTransport(httpx.AsyncHTTPTransport):
+    """
+    httpx transport that reports how the connection pool is used.
+
+    Per request (metric names prefixed with `name`):
+      <name>.pool.wait_ms   time from sending until the request headers start
+                            going out: queueing for a connection plus, for a
+                            new one, the TCP/TLS handshake
+      <name>.pool.in_flight requests outstanding as this one started (itself
+                            included); above max_connections means queueing
+      <name>.pool.connects  counter of new TCP connections (churn)
+    stats() gives the live picture for /api/metrics; the open/busy counts
+    come from httpcore's pool internals and are None if those change.
+    """
+
+    def __init__(self, name: str, limits: httpx.Limits, http2: bool = False, **kwargs):
+        super().__init__(limits=limits, http2=http2, **kwargs)
+        self.name = name
+        self.max_connections = limits.max_connections
+        self.http2 = http2
+        self.in_flight = 0
+
+    def _connections(self) -> Optional[list]:
+        connections = getattr(getattr(self, "_pool", None), "connections", None)
+        return list(connections) if connections is not None else None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        waited = False
+        outer_trace = request.extensions.get("trace")
+
+        async def trace(event: str, info: dict) -> None:
+            nonlocal waited
+            if not waited and event in (
+                "http11.send_request_headers.started",
+                "http2.send_request_headers.started",
+            ):
+                waited = True
+                metrics.observe(f"{self.name}.pool.wait_ms", (time.perf_counter() - started) * 1000)
+            if event == "connection.connect_tcp.complete":
+                metrics.incr(f"{self.name}.pool.connects")
+            if outer_trace is not None:
+                await outer_trace(event, info)
+
+        request.extensions["trace"] = trace
+        metrics.incr(f"{self.name}.pool.requests")
+        self.in_flight += 1
+        metrics.observe(f"{self.name}.pool.in_flight", self.in_flight)
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        connections = self._connections()
+        try:
+            busy = sum(not c.is_idle() for c in connections) if connections is not None else None
+        except AttributeError:
+            busy = None
+        return {
+            "connections": len(connections) if connections is not None else None,
+            "busy": busy,
+            "max_connections": self.max_connections,
+            "in_flight": self.in_flight,
+            "http2": self.http2,
+        }
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
@@ -1,22 +1,84 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
+from dataclasses import replace
 import asyncio
 import json
-from typing import List
+import math
+from typing import Callable, List, Optional, Tuple
 from models import (
-    GameState, Player, POI, Message,
+    GAME_STATE_ADAPTER, GameState, Player, POI, Message,
     LocationUpdate, CameraDescription, ObjectiveUpdate, MessageUpdate, DangerUpdate
 )
-from pois_database import get_nearby_pois
-from ai_processor import process_camera_description
+import ai_processor
+from ai_processor import AIGameUpdate, process_camera_batch
+from announcements import AnnouncementPipeline
+from camera_batcher import CameraBatcher, Observation
+from geofence import ENTER, EXIT, GeofenceEngine, GeofenceEvent
+from http_encoding import etag_matches, pick_encoding
+from gps_filter import GpsFilter
+from message_scheduler import MessageScheduler
+from metrics import metrics
+from motion import MotionModel
+from poi_cache import POI_LIST_ADAPTER, PoiPrefetcher, PoiTileCache
+from pois_database import get_fence_sites
+from session_recorder import RecordingMiddleware, SessionRecorder
+from state_store import StateStore
+from subscriptions import Subscription, parse_fields
 import os
+import re
+import time
+import tts
 
 
+POI_RADIUS_KM = float(os.getenv("POI_RADIUS_KM", "1.5"))
+# Optional view culling: only POIs within POI_FOV_DEG of the heading, ranked,
+# best POI_MAX_COUNT kept (0 = return every POI in the radius)
+POI_FOV_DEG = float(os.getenv("POI_FOV_DEG", "360"))
+POI_MAX_COUNT = int(os.getenv("POI_MAX_COUNT", "0"))
+# Bounds on /api/pois queries; larger areas would scan (and cache) most of the store
+POI_QUERY_MAX_RADIUS_KM = 10.0
+POI_QUERY_MAX_LIMIT = 200
+
+# Nearby POIs are looked up per geohash cell and kept pre-serialized
+poi_tile_cache = PoiTileCache(
+    precision=int(os.getenv("POI_TILE_PRECISION", "7")),
+    max_tiles=int(os.getenv("POI_TILE_CACHE_SIZE", "2048")),
+)
+# Raw phone fixes are smoothed; jitter below these thresholds is ignored
+gps_filter = GpsFilter(
+    accuracy_m=float(os.getenv("GPS_ACCURACY_M", "8")),
+    accel_mps2=float(os.getenv("GPS_ACCEL_MPS2", "0.5")),
+    max_speed_mps=float(os.getenv("GPS_MAX_SPEED_MPS", "50")),
+    min_move_m=float(os.getenv("GPS_MIN_MOVE_M", "8")),
+    min_turn_deg=float(os.getenv("GPS_MIN_TURN_DEG", "10")),
+)
+GPS_FILTER_ENABLED = os.getenv("GPS_FILTER_ENABLED", "true").lower() == "true"
+
+# Reaching a POI advances the quest directly, without an LLM call. Fences
+# are built per grid cell as the player reaches it, not for every POI at once
+GEOFENCE_ENABLED = os.getenv("GEOFENCE_ENABLED", "true").lower() == "true"
+geofences = GeofenceEngine()
+if GEOFENCE_ENABLED:
+    geofences.add_source(get_fence_sites, float(os.getenv("GEOFENCE_RADIUS_M", "60")))
+
+# Tiles along the player's projected path are built ahead of time
+motion = MotionModel()
+poi_prefetcher = PoiPrefetcher(
+    poi_tile_cache,
+    horizon_s=float(os.getenv("POI_PREFETCH_HORIZON_S", "10")),
+    step_s=float(os.getenv("POI_PREFETCH_STEP_S", "1")),
+)
+PREFETCH_ENABLED = os.getenv("POI_PREFETCH_ENABLED", "true").lower() == "true"
+current_tile = poi_tile_cache.get(
+    37.7749, -122.4194, POI_RADIUS_KM, 0.0, POI_FOV_DEG, POI_MAX_COUNT
+)
+
 # Global state - initialize with San Francisco center
-game_state = GameState(
+initial_state = GameState(
     player=Player(lat=37.7749, lon=-122.4194, heading=0.0),
-    pois=get_nearby_pois(37.7749, -122.4194),  # Get nearby SF POIs
+    pois=current_tile.pois,  # Get nearby SF POIs
     objective="Begin your adventure in San Francisco",
     message=Message(text="", visible=False, timeoutMs=0),
     danger_level="none",
@@ -26,27 +88,175 @@ game_state = GameState(
 )
 
 # Connected WebSocket clients
-connected_clients: List[WebSocket] = []
+connected_clients: List[Subscription] = []
+sse_streams = 0
+
+
+def encode_state(state: GameState, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+    """
+    JSON-encode the state (or only `fields` of it), splicing in the cached
+    POI payload when the POI list is still the one from the current tile
+    (skips re-serializing it).
+    """
+    if fields is not None and "pois" not in fields:
+        return GAME_STATE_ADAPTER.dump_json(state, include=set(fields))
+    if state.pois is current_tile.pois:
+        pois_json = current_tile.payload
+    else:
+        pois_json = POI_LIST_ADAPTER.dump_json(state.pois)
+    if fields is None:
+        body = GAME_STATE_ADAPTER.dump_json(state, exclude={"pois"})
+    else:
+        body = GAME_STATE_ADAPTER.dump_json(state, include=set(fields) - {"pois"})
+    if body == b"{}":
+        return b"".join((b'{"pois":', pois_json, b"}"))
+    return b"".join((body[:-1], b',"pois":', pois_json, b"}"))
+
+
+# Handlers publish new immutable snapshots; readers share one encoding per revision.
+# Changes to critical fields reach clients without waiting out their throttle.
+CRITICAL_FIELDS = ("danger_level", "boss_fight_active", "boss_name")
+store = StateStore(initial_state, encode_state, CRITICAL_FIELDS)
+
+# ETags are "<boot>-<revision>": revisions restart at 1 with the process
+STATE_ETAG_PREFIX = format(time.time_ns(), "x")
+
+# Per-client update rate adapts between these bounds to each link's quality
+BROADCAST_MAX_HZ = float(os.getenv("BROADCAST_MAX_HZ", "10"))
+BROADCAST_MIN_HZ = float(os.getenv("BROADCAST_MIN_HZ", "1"))
+
+# Fallback transports for clients that can't keep a WebSocket open
+SSE_KEEPALIVE_S = float(os.getenv("SSE_KEEPALIVE_S", "15"))
+LONG_POLL_TIMEOUT_S = float(os.getenv("LONG_POLL_TIMEOUT_S", "25"))
+
+# Critical lane: danger/boss/panic changes wake every sender at once instead
+# of waiting for the next broadcast tick
+CRITICAL_PUSH_ENABLED = os.getenv("CRITICAL_PUSH_ENABLED", "true").lower() == "true"
+
+
+def push_critical(revision: int, critical: bool):
+    if not critical or not CRITICAL_PUSH_ENABLED:
+        return
+    metrics.incr("ws.critical_pushes")
+    for client in connected_clients:
+        if client.wants(store.critical_fields):
+            client.offer(critical=True)
+
+
+store.add_listener(push_critical)
+
+
+def show_message(message: Message):
+    store.update(message=message)
+
+
+# Timestamps for the GPS filter, motion model and message expiry. replay.py
+# swaps in the recording's clock so --speed doesn't change their decisions
+session_clock: Callable[[], float] = time.monotonic
+
+
+def clock() -> float:
+    return session_clock()
+
+
+# Message expiry and queueing happen here, once for every client
+# (priorities: geofence 0, camera/AI 1, manual messages choose)
+message_scheduler = MessageScheduler(show_message, clock)
+CAMERA_MESSAGE_PRIORITY = 1
+
+# Visible messages are voiced; clips go out to /ws/audio subscribers
+ANNOUNCE_ENABLED = os.getenv("ANNOUNCE_ENABLED", "true").lower() == "true"
+announcer = AnnouncementPipeline(tts.cache_clip)
+last_announced: Optional[Message] = None
+
+
+def announce_message_changes(revision: int, critical: bool):
+    """Queue an announcement as soon as a new visible message is published"""
+    global last_announced
+    if not ANNOUNCE_ENABLED:
+        return
+    message = store.state.message
+    if message is last_announced:
+        return
+    last_announced = message
+    if message.visible and message.text:
+        announcer.announce(message.text)
+
+
+store.add_listener(announce_message_changes)
 
 
 async def broadcast_state():
-    """Background task to broadcast game state to all connected clients every 100ms"""
+    """
+    Background task ticking at BROADCAST_MAX_HZ (10 Hz by default): wakes the
+    sender of every client whose own interval has elapsed, or that has a
+    critical change pending. Sending happens in per-client tasks, so a slow
+    link never holds up the others.
+    """
     while True:
-        if connected_clients:
-            state_json = game_state.model_dump_json()
-            disconnected = []
-            for client in connected_clients:
-                try:
-                    await client.send_text(state_json)
-                except Exception:
-                    disconnected.append(client)
-            
-            # Remove disconnected clients
-            for client in disconnected:
-                if client in connected_clients:
-                    connected_clients.remove(client)
+        revision = store.revision
+        now = time.monotonic()
+        for client in connected_clients:
+            critical = store.critical_revision > client.last_revision and client.wants(store.critical_fields)
+            if client.due(revision, now, critical=critical):
+                client.offer()
         
-        await asyncio.sleep(0.1)  # 100ms = 10 Hz broadcast rate
+        await asyncio.sleep(1.0 / BROADCAST_MAX_HZ)
+
+
+async def send_frames(client: Subscription):
+    """
+    Per-client sender: always sends the latest encoding, never a backlog.
+    Publish-to-delivery latency is recorded separately for frames carrying
+    a critical change (ws.critical_latency_ms) and routine ones
+    (ws.routine_latency_ms).
+    """
+    while True:
+        await client.wakeup.wait()
+        client.wakeup.clear()
+        revision = store.revision
+        # Each projection in use is encoded once per revision
+        payload = store.encoded_text(client.fields)
+        if client.unchanged(revision, payload):
+            continue
+        critical = store.critical_revision > client.last_revision and client.wants(store.critical_fields)
+        published_at = store.critical_changed_at if critical else store.changed_at
+        client.sending = True
+        started = time.monotonic()
+        try:
+            await client.websocket.send_text(payload)
+        finally:
+            client.sending = False
+        finished = time.monotonic()
+        client.sent(revision, payload, started, finished - started)
+        lane = "critical" if critical else "routine"
+        metrics.observe(f"ws.{lane}_latency_ms", (finished - published_at) * 1000)
+        metrics.observe("ws.rate_hz", client.rate_hz)
+
+
+# The OpenAI SDK is imported lazily; load it in the background shortly after
+# startup so the first health check isn't competing with it (negative = off),
+# then open a pooled connection so the first camera call skips the handshake
+AI_PREWARM_DELAY_S = float(os.getenv("AI_PREWARM_DELAY_S", "1"))
+OPENAI_WARMUP_ENABLED = os.getenv("OPENAI_WARMUP_ENABLED", "true").lower() == "true"
+
+
+# Synthesize the stock TTS phrases in the background at startup
+TTS_PREWARM_ENABLED = os.getenv("TTS_PREWARM_ENABLED", "true").lower() == "true"
+
+
+async def prewarm_ai_client():
+    await asyncio.sleep(AI_PREWARM_DELAY_S)
+    started = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(None, ai_processor.get_client)
+    metrics.observe("startup.ai_client_ms", (time.perf_counter() - started) * 1000)
+    if OPENAI_WARMUP_ENABLED:
+        await ai_processor.warm_up()
+
+
+# Record every inbound /api/* call to this file for replay.py (empty = off)
+SESSION_RECORD_PATH = os.getenv("SESSION_RECORD_PATH", "")
+session_recorder = SessionRecorder(SESSION_RECORD_PATH) if SESSION_RECORD_PATH else None
 
 
 @asynccontextmanager
@@ -54,11 +264,22 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Start background tasks
     broadcast_task = asyncio.create_task(broadcast_state())
+    announce_task = asyncio.create_task(announcer.run())
+    message_task = asyncio.create_task(message_scheduler.run())
+    prewarm_task = asyncio.create_task(prewarm_ai_client()) if AI_PREWARM_DELAY_S >= 0 else None
+    if ANNOUNCE_ENABLED and TTS_PREWARM_ENABLED:
+        tts.prewarm()
     
     yield
     
     # Cleanup
     broadcast_task.cancel()
+    announce_task.cancel()
+    message_task.cancel()
+    if prewarm_task:
+        prewarm_task.cancel()
+    if session_recorder:
+        session_recorder.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -77,6 +298,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if session_recorder:
+    app.add_middleware(RecordingMiddleware, recorder=session_recorder)
 
 
 @app.get("/")
@@ -84,78 +307,276 @@ async def root():
     return {"status": "SideQuest Overlay Backend Running"}
 
 
+def client_max_hz(requested) -> float:
+    """A client's requested rate capped at BROADCAST_MAX_HZ; missing, non-numeric or non-finite means the cap"""
+    try:
+        hz = float(requested or 0)
+    except (TypeError, ValueError):
+        return BROADCAST_MAX_HZ
+    return min(hz, BROADCAST_MAX_HZ) if math.isfinite(hz) and hz > 0 else BROADCAST_MAX_HZ
+
+
+def handle_control(client: Subscription, text: str) -> None:
+    """Apply one client message: {"ack": true} and/or {"fields": [...], "max_hz": n}"""
+    request = json.loads(text)
+    if not isinstance(request, dict):
+        raise TypeError("control message must be an object")
+    if request.get("ack"):
+        client.acked()
+    if "fields" in request:
+        client.configure(parse_fields(request["fields"]), client_max_hz(request.get("max_hz")))
+        client.offer()
+
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time state broadcasting"""
+async def websocket_endpoint(websocket: WebSocket, fields: Optional[str] = None, max_hz: float = 0.0):
+    """
+    WebSocket endpoint for real-time state broadcasting.
+
+    Clients get the full state by default. To receive only some fields,
+    connect with ?fields=objective,danger_level (optionally &max_hz=2), or
+    send {"fields": [...], "max_hz": 2} at any time. Projected clients only
+    get a frame when the state changed.
+    
+    The update rate adapts to the link between BROADCAST_MIN_HZ and max_hz
+    (or BROADCAST_MAX_HZ). Clients may send {"ack": true} after each frame
+    to let the server measure round-trip time as well.
+    """
     await websocket.accept()
-    connected_clients.append(websocket)
+    client = Subscription(websocket, parse_fields(fields), client_max_hz(max_hz), BROADCAST_MIN_HZ)
+    connected_clients.append(client)
+    sender = asyncio.create_task(send_frames(client))
+    client.offer()  # first frame right away
     print(f"Client connected. Total clients: {len(connected_clients)}")
     
     try:
-        # Keep connection alive and listen for any client messages
+        # Keep connection alive and listen for acks and subscription changes
         while True:
-            await websocket.receive_text()
+            receive = asyncio.ensure_future(websocket.receive_text())
+            done, _ = await asyncio.wait({receive, sender}, return_when=asyncio.FIRST_COMPLETED)
+            if receive not in done:
+                receive.cancel()
+                sender.result()  # the send failed: treat as a disconnect
+            try:
+                handle_control(client, receive.result())
+            except (ValueError, TypeError, KeyError):
+                # A malformed control message is ignored, not a reason to drop the client
+                metrics.incr("ws.bad_messages")
     except WebSocketDisconnect:
-        connected_clients.remove(websocket)
+        pass
+    except Exception as e:
+        print(f"WebSocket error: {e!r}")
+    finally:
+        sender.cancel()
+        if client in connected_clients:
+            connected_clients.remove(client)
         print(f"Client disconnected. Total clients: {len(connected_clients)}")
 
 
+async def sse_events(fields: Optional[Tuple[str, ...]], min_interval: float, since: int):
+    """
+    SSE frames for one stream: the latest encoding after every revision,
+    at most once per min_interval (critical changes cut the wait short).
+    Projected streams skip revisions that didn't change their fields.
+    """
+    global sse_streams
+    sse_streams += 1
+    metrics.incr("sse.connects")
+    revision, last_payload, last_sent = since, "", 0.0
+    try:
+        while True:
+            if not await store.wait_for_change(revision, SSE_KEEPALIVE_S):
+                yield ": keepalive\n\n"
+                continue
+            # Coalesce bursts: wait out the interval unless something critical lands
+            until = last_sent + min_interval
+            while store.critical_revision <= revision and time.monotonic() < until:
+                await store.wait_for_change(store.revision, until - time.monotonic())
+            revision = store.revision
+            payload = store.encoded_text(fields)
+            if fields is not None and payload == last_payload:
+                continue
+            last_payload, last_sent = payload, time.monotonic()
+            metrics.incr("sse.frames")
+            yield f"id: {revision}\ndata: {payload}\n\n"
+    finally:
+        sse_streams -= 1
+
+
+@app.get("/api/stream")
+async def stream_state(
+    fields: Optional[str] = None,
+    max_hz: float = 0.0,
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events fallback for /ws: one `data:` event with the state
+    JSON (or a ?fields= projection) per change, tagged with its revision as
+    the event id. Browsers resend it as Last-Event-ID on reconnect, which
+    skips the first frame if nothing changed meanwhile.
+    """
+    since = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    if since > store.revision:
+        since = 0  # id from before a server restart
+    events = sse_events(parse_fields(fields), 1.0 / client_max_hz(max_hz), since)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/state/poll")
+async def poll_state(since: int = 0, fields: Optional[str] = None, timeout: float = LONG_POLL_TIMEOUT_S):
+    """
+    Long-poll fallback: answers {"revision": n, "state": {...}} as soon as
+    the revision passes `since` (right away if it already has), or 204
+    after `timeout` seconds. Pass the returned revision as the next `since`.
+    """
+    metrics.incr("longpoll.requests")
+    if since == store.revision:
+        if not await store.wait_for_change(since, min(timeout, LONG_POLL_TIMEOUT_S)):
+            metrics.incr("longpoll.timeouts")
+            return Response(status_code=204)
+    body = b"".join((b'{"revision":', str(store.revision).encode(), b',"state":', store.encoded(parse_fields(fields)), b"}"))
+    return Response(content=body, media_type="application/json")
+
+
+@app.websocket("/ws/audio")
+async def audio_websocket(websocket: WebSocket):
+    """Announcement clips for visible messages, as {"text", "url"} JSON"""
+    await websocket.accept()
+    subscriber = announcer.subscribe()
+    try:
+        while True:
+            announcement = await subscriber.get()
+            await websocket.send_json({
+                "text": announcement.text,
+                "url": f"/api/audio/{announcement.clip_key}",
+            })
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        announcer.unsubscribe(subscriber)
+
+
 @app.post("/update")
 async def update_state(state: GameState):
     """HTTP endpoint to update game state externally (full state)"""
-    global game_state
-    game_state = state
+    # Let the scheduler own the message's lifetime, but publish its message
+    # with the rest of the state as a single revision
+    message = state.message
+    scheduled = message_scheduler.reset(message.text if message.visible else "", message.timeoutMs)
+    store.replace(replace(state, message=scheduled))
     return {"status": "updated"}
 
 
+def apply_geofence_events(events: List[GeofenceEvent], objective: str) -> str:
+    """Turn POI enter/exit events into messages; returns the new objective"""
+    for event in events:
+        label = event.fence.label
+        print(f"Geofence {event.kind}: {label}")
+        if event.kind == ENTER:
+            objective = f"Explore {label}"
+            message_scheduler.post(f"Discovered {label}!", 3000)
+        elif event.kind == EXIT and objective == f"Explore {label}":
+            objective = "Find the next landmark"
+    return objective
+
+
 @app.post("/api/location")
 async def update_location(location: LocationUpdate):
     """Update player location from phone GPS"""
-    global game_state
+    global current_tile
+    state = store.state
+    
+    if GPS_FILTER_ENABLED:
+        fix = gps_filter.update(location.lat, location.lon, location.heading, location.accuracy, clock())
+        if not fix.significant:
+            # Jitter or a rejected outlier: nothing downstream changes
+            return {
+                "status": "location_filtered" if fix.accepted else "location_rejected",
+                "nearby_pois": len(state.pois),
+            }
+        lat, lon, heading = fix.lat, fix.lon, fix.heading
+    else:
+        lat, lon = location.lat, location.lon
+        heading = location.heading if location.heading is not None else state.player.heading
+    
+    motion.update(lat, lon, clock())
     
-    # Update player position
-    game_state.player.lat = location.lat
-    game_state.player.lon = location.lon
-    if location.heading is not None:
-        game_state.player.heading = location.heading
+    # Update POIs based on new location (cached per geohash cell)
+    started = time.perf_counter()
+    current_tile = poi_tile_cache.get(
+        lat, lon, POI_RADIUS_KM, heading, POI_FOV_DEG, POI_MAX_COUNT,
+    )
+    metrics.observe("location.poi_lookup_ms", (time.perf_counter() - started) * 1000)
+    
+    if PREFETCH_ENABLED:
+        poi_prefetcher.schedule(
+            motion, POI_RADIUS_KM, POI_FOV_DEG, POI_MAX_COUNT
+        )
     
-    # Update POIs based on new location
-    game_state.pois = get_nearby_pois(location.lat, location.lon)
+    objective = state.objective
+    if GEOFENCE_ENABLED:
+        objective = apply_geofence_events(geofences.check(lat, lon), objective)
     
-    print(f"Location updated: {location.lat}, {location.lon} - {len(game_state.pois)} POIs nearby")
+    # Player, POIs and objective change together in one snapshot
+    store.update(
+        player=Player(lat=lat, lon=lon, heading=heading),
+        pois=current_tile.pois,
+        objective=objective,
+    )
+    
+    print(f"Location updated: {lat:.6f}, {lon:.6f} - {len(current_tile.pois)} POIs nearby")
     
     return {
         "status": "location_updated",
-        "nearby_pois": len(game_state.pois)
+        "nearby_pois": len(current_tile.pois)
     }
 
 
+async def process_camera_observations(observations: List[Observation]) -> AIGameUpdate:
+    """One LLM call for a batch of camera descriptions, applied as one state update"""
+    ai_update = await process_camera_batch(observations)
+    
+    # Update game state with AI results (one snapshot, applied after the await)
+    store.update(
+        objective=ai_update.objective,
+        danger_level=ai_update.danger_level,
+        boss_fight_active=ai_update.boss_fight_active,
+        boss_name=ai_update.boss_name,
+        environment=ai_update.environment_summary,
+    )
+    
+    # Update message if AI generated one
+    if ai_update.message_visible and ai_update.message_text:
+        message_scheduler.post(ai_update.message_text, 3000, CAMERA_MESSAGE_PRIORITY)
+    
+    print(f"AI Update ({len(observations)} obs) - Objective: {ai_update.objective}, Danger: {ai_update.danger_level}, Boss: {ai_update.boss_fight_active}")
+    return ai_update
+
+
+# Descriptions posted within CAMERA_BATCH_WINDOW_MS of each other (several
+# cameras or bots) share one LLM call and one consolidated update
+CAMERA_BATCH_ENABLED = os.getenv("CAMERA_BATCH_ENABLED", "true").lower() == "true"
+camera_batcher = CameraBatcher(
+    process_camera_observations,
+    window_ms=float(os.getenv("CAMERA_BATCH_WINDOW_MS", "100")),
+    max_batch=int(os.getenv("CAMERA_BATCH_MAX", "8")),
+)
+
+
 @app.post("/api/camera")
 async def process_camera(camera: CameraDescription):
     """Process camera description with AI to update game narrative"""
-    global game_state
-    
     print(f"Processing camera: {camera.description[:50]}...")
     
     # Process with OpenAI
-    ai_update = await process_camera_description(camera.description)
-    
-    # Update game state with AI results
-    game_state.objective = ai_update.objective
-    game_state.danger_level = ai_update.danger_level
-    game_state.boss_fight_active = ai_update.boss_fight_active
-    game_state.boss_name = ai_update.boss_name
-    game_state.environment = ai_update.environment_summary
-    
-    # Update message if AI generated one
-    if ai_update.message_visible and ai_update.message_text:
-        game_state.message = Message(
-            text=ai_update.message_text,
-            visible=True,
-            timeoutMs=3000
-        )
-    
-    print(f"AI Update - Objective: {ai_update.objective}, Danger: {ai_update.danger_level}, Boss: {ai_update.boss_fight_active}")
+    if CAMERA_BATCH_ENABLED:
+        ai_update = await camera_batcher.submit(camera.description, camera.source)
+    else:
+        ai_update = await process_camera_observations([(camera.source, camera.description)])
     
     return {
         "status": "processed",
@@ -168,35 +589,79 @@ async def process_camera(camera: CameraDescription):
 @app.post("/api/objective")
 async def set_objective(update: ObjectiveUpdate):
     """Manually set objective"""
-    global game_state
-    game_state.objective = update.text
+    store.update(objective=update.text)
     return {"status": "objective_updated"}
 
 
 @app.post("/api/message")
 async def send_message(update: MessageUpdate):
     """Manually send a message"""
-    global game_state
-    game_state.message = Message(
-        text=update.text,
-        visible=True,
-        timeoutMs=update.timeoutMs
-    )
+    message_scheduler.post(update.text, update.timeoutMs, update.priority)
     return {"status": "message_sent"}
 
 
 @app.post("/api/danger")
 async def update_danger(update: DangerUpdate):
     """Update danger level and boss fight state (called from bot_realtime.py)"""
-    global game_state
-    game_state.danger_level = update.danger_level
-    game_state.boss_fight_active = update.boss_fight_active
-    game_state.boss_name = update.boss_name
+    store.update(
+        danger_level=update.danger_level,
+        boss_fight_active=update.boss_fight_active,
+        boss_name=update.boss_name,
+    )
     return {"status": "danger_updated"}
 
 
 @app.get("/api/state")
-async def get_state():
-    """Get current game state"""
-    return game_state
+async def get_state(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    Get current game state. The ETag is the state revision, so pollers that
+    send If-None-Match get a bodyless 304 until something changes. The body
+    (and its gzip/br form, when accepted) is encoded once per revision.
+    """
+    etag = f'"{STATE_ETAG_PREFIX}-{store.revision}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        metrics.incr("state.not_modified")
+        return Response(status_code=304, headers=headers)
+    body = store.encoded()
+    coding = pick_encoding(accept_encoding, len(body))
+    if coding:
+        body = store.compressed(coding)
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/pois")
+async def get_pois(
+    lat: float = Query(ge=-90, le=90),
+    lon: float = Query(ge=-180, le=180),
+    heading: float = 0.0,
+    fov: float = Query(360.0, gt=0, le=360),
+    limit: int = Query(0, ge=0, le=POI_QUERY_MAX_LIMIT),
+    radius_km: float = Query(POI_RADIUS_KM, gt=0, le=POI_QUERY_MAX_RADIUS_KM),
+):
+    """Query POIs around a point, optionally culled to a view cone and top-K"""
+    tile = poi_tile_cache.get(lat, lon, radius_km, heading, fov, limit)
+    return Response(content=tile.payload, media_type="application/json")
+
+
+@app.get("/api/audio/{clip_key}")
+async def get_audio(clip_key: str):
+    """A cached announcement clip"""
+    audio = tts.clip_cache.get(clip_key) if re.fullmatch(r"[0-9a-f]{64}", clip_key) else None
+    if audio is None:
+        raise HTTPException(status_code=404, detail="Clip not found")
+    return Response(content=audio, media_type=tts.CLIP_MEDIA_TYPE)
+
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Counters and latency/token observations collected in-process"""
+    snapshot = metrics.snapshot()
+    snapshot["ws_clients"] = [client.stats() for client in connected_clients]
+    snapshot["sse_streams"] = sse_streams
+    snapshot["openai_pool"] = ai_processor.pool_stats()
+    return snapshot
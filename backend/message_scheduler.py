@@ -0,0 +1,121 @@
+"""Server-side timing for overlay messages: expiry and a priority queue"""
+from typing import Callable, List, Optional, Tuple
+import asyncio
+import heapq
+import math
+import time
+
+from metrics import metrics
+from models import Message
+
+
+# A preempted message with less time left than this is dropped, not requeued
+MIN_REQUEUE_MS = 500
+
+
+class MessageScheduler:
+    """
+    Owns GameState.message timing so clients don't have to.
+
+    post() shows a message right away when nothing is on screen or when it
+    outranks the current one (the preempted message is requeued with its
+    remaining time). Otherwise it waits in a heap ordered by priority, then
+    arrival. When the on-screen message expires, the next queued one is
+    shown, or the message is hidden. A timeout of 0 keeps a message up
+    until the next one arrives, as the overlay has always treated it.
+    `on_change(message)` is called exactly once per transition, with a fresh
+    Message object.
+
+    Call advance() whenever time may have passed, or run() as a background
+    task, which sleeps until the next expiry.
+    """
+
+    def __init__(self, on_change: Callable[[Message], None], clock: Callable[[], float] = time.monotonic):
+        self.on_change = on_change
+        self.clock = clock
+        self._queue: List[Tuple[int, int, str, int]] = []  # (-priority, seq, text, timeout ms)
+        self._seq = 0
+        self._current: Optional[Tuple[int, int, str]] = None  # (priority, seq, text)
+        self._expires_at = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def post(self, text: str, timeout_ms: int = 3000, priority: int = 0) -> None:
+        self._seq += 1
+        self.advance()
+        if self._current is None or self._expires_at == math.inf:
+            self._show(priority, self._seq, text, timeout_ms)
+        elif priority > self._current[0]:
+            current_priority, current_seq, current_text = self._current
+            remaining_ms = int((self._expires_at - self.clock()) * 1000)
+            if remaining_ms >= MIN_REQUEUE_MS:
+                heapq.heappush(self._queue, (-current_priority, current_seq, current_text, remaining_ms))
+            metrics.incr("messages.preempted")
+            self._show(priority, self._seq, text, timeout_ms)
+        else:
+            heapq.heappush(self._queue, (-priority, self._seq, text, timeout_ms))
+            metrics.incr("messages.queued")
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def clear(self) -> None:
+        """Hide the current message and drop everything queued"""
+        self._queue.clear()
+        if self._current is not None:
+            self._current = None
+            self.on_change(Message(text="", visible=False, timeoutMs=0))
+
+    def reset(self, text: str = "", timeout_ms: int = 3000, priority: int = 0) -> Message:
+        """
+        Drop everything queued and show `text` (nothing if empty) WITHOUT
+        calling on_change; the caller publishes the returned Message along
+        with its other state changes.
+        """
+        self._queue.clear()
+        self._seq += 1
+        if text:
+            message = self._set_current(priority, self._seq, text, timeout_ms)
+        else:
+            self._current = None
+            message = Message(text="", visible=False, timeoutMs=0)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return message
+
+    def _set_current(self, priority: int, seq: int, text: str, timeout_ms: int) -> Message:
+        self._current = (priority, seq, text)
+        self._expires_at = self.clock() + timeout_ms / 1000 if timeout_ms > 0 else math.inf
+        return Message(text=text, visible=True, timeoutMs=timeout_ms)
+
+    def _show(self, priority: int, seq: int, text: str, timeout_ms: int) -> None:
+        self.on_change(self._set_current(priority, seq, text, timeout_ms))
+
+    def advance(self) -> None:
+        """Expire the on-screen message if due and show the next one"""
+        if self._current is None or self.clock() < self._expires_at:
+            return
+        metrics.incr("messages.expired")
+        if self._queue:
+            neg_priority, seq, text, timeout_ms = heapq.heappop(self._queue)
+            self._show(-neg_priority, seq, text, timeout_ms)
+            return
+        self._current = None
+        self.on_change(Message(text="", visible=False, timeoutMs=0))
+
+    @property
+    def next_deadline(self) -> Optional[float]:
+        if self._current is None or self._expires_at == math.inf:
+            return None
+        return self._expires_at
+
+    async def run(self) -> None:
+        """Background task: wake at each expiry (or new post) and advance"""
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            deadline = self.next_deadline
+            timeout = None if deadline is None else max(0.0, deadline - self.clock())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self.advance()
@@ -0,0 +1,64 @@
+"""In-process counters and latency samples, exposed via GET /api/metrics"""
+from collections import defaultdict, deque
+from typing import Deque, Dict
+import threading
+
+
+MAX_SAMPLES = 512
+
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile of a sequence of numbers (0 if empty)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Metrics:
+    """Thread-safe counters plus bounded windows of observed values"""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=max_samples))
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            self._samples[name].append(value)
+
+    def samples(self, name: str) -> list:
+        with self._lock:
+            return list(self._samples.get(name, ()))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            samples = {name: list(values) for name, values in self._samples.items()}
+        return {
+            "counters": counters,
+            "observations": {
+                name: {
+                    "count": len(values),
+                    "avg": sum(values) / len(values) if values else 0.0,
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                    "max": max(values) if values else 0.0,
+                }
+                for name, values in samples.items()
+            },
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._samples.clear()
+
+
+# Shared registry for the whole backend process
+metrics = Metrics()
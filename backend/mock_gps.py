@@ -1,10 +1,12 @@
 import asyncio
 import math
 import time
-from models import GameState, Message
+from message_scheduler import MessageScheduler
+from models import Player
+from state_store import StateStore
 
 
-async def simulate_gps(game_state: GameState):
+async def simulate_gps(store: StateStore):
     """
     Simulate GPS movement in a circular path around San Francisco.
     Updates player position at ~5 Hz with realistic lat/lon increments.
@@ -35,6 +37,7 @@ async def simulate_gps(game_state: GameState):
     message_index = 0
     last_message_time = time.time()
     message_interval = 15  # Show message every 15 seconds
+    scheduler = MessageScheduler(lambda message: store.update(message=message))
     
     while True:
         # Update position in circular path
@@ -50,29 +53,23 @@ async def simulate_gps(game_state: GameState):
         heading = (math.degrees(angle) + 90) % 360
         
         # Update player state
-        game_state.player.lat = new_lat
-        game_state.player.lon = new_lon
-        game_state.player.heading = heading
+        store.update(player=Player(lat=new_lat, lon=new_lon, heading=heading))
         
         # Change objective every 20 seconds
         current_time = time.time()
         if current_time - last_objective_change > 20:
             objective_index = (objective_index + 1) % len(objectives)
-            game_state.objective = objectives[objective_index]
+            store.update(objective=objectives[objective_index])
             last_objective_change = current_time
         
         # Show messages periodically
         if current_time - last_message_time > message_interval:
-            game_state.message.text = messages[message_index]
-            game_state.message.visible = True
-            game_state.message.timeoutMs = 3000
+            scheduler.post(messages[message_index], 3000)
             message_index = (message_index + 1) % len(messages)
             last_message_time = current_time
         
-        # Clear message after it should have disappeared
-        if game_state.message.visible and current_time - last_message_time > 3.5:
-            game_state.message.visible = False
-            game_state.message.text = ""
+        # Hide the message once its timeout has passed
+        scheduler.advance()
         
         # Update rate: 200ms = 5 Hz
         await asyncio.sleep(0.2)
@@ -1,26 +1,36 @@
-from pydantic import BaseModel
+from dataclasses import dataclass
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
 
 
-class Player(BaseModel):
+# State kept in memory and broadcast 10x per second: plain slotted,
+# immutable dataclasses (cheap to build and copy). FastAPI still validates
+# them where they appear in a request body (/update), and encoding goes
+# through pydantic-core's serializer via the adapters below.
+
+@dataclass(frozen=True, slots=True)
+class Player:
     lat: float
     lon: float
     heading: float
 
 
-class POI(BaseModel):
+@dataclass(frozen=True, slots=True)
+class POI:
     lat: float
     lon: float
     label: str
 
 
-class Message(BaseModel):
+@dataclass(frozen=True, slots=True)
+class Message:
     text: str
     visible: bool
     timeoutMs: int
 
 
-class GameState(BaseModel):
+@dataclass(frozen=True, slots=True)
+class GameState:
     player: Player
     pois: List[POI]
     objective: str
@@ -31,16 +41,21 @@ class GameState(BaseModel):
     environment: str = ""
 
 
+GAME_STATE_ADAPTER = TypeAdapter(GameState)
+
+
 # Request models for API endpoints
 class LocationUpdate(BaseModel):
     lat: float
     lon: float
     heading: Optional[float] = None
+    accuracy: Optional[float] = None  # meters, as reported by the phone
 
 
 class CameraDescription(BaseModel):
     description: str
     timestamp: Optional[int] = None
+    source: Optional[str] = None  # camera/bot id, used when batching
 
 
 class ObjectiveUpdate(BaseModel):
@@ -50,6 +65,7 @@ class ObjectiveUpdate(BaseModel):
 class MessageUpdate(BaseModel):
     text: str
     timeoutMs: int = 3000
+    priority: int = 0  # higher preempts the message on screen
 
 
 class DangerUpdate(BaseModel):
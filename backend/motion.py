@@ -0,0 +1,98 @@
+"""Player motion estimate (velocity, heading) from recent GPS fixes"""
+from collections import deque
+from typing import Deque, Optional, Tuple
+import math
+import time
+
+
+METERS_PER_DEG_LAT = 111_320.0
+
+
+def _angle_diff(a: float, b: float) -> float:
+    """Smallest absolute difference between two headings in degrees"""
+    return abs((a - b + 180) % 360 - 180)
+
+
+class MotionModel:
+    """
+    Constant-velocity estimate from a least-squares fit over the last
+    `window` fixes no older than `max_age_s`. Positions are converted to a
+    local north/east frame in meters around the latest fix.
+
+    A fix that leaves the fitted course by more than `max_turn_deg` starts
+    a new fit from the fix before it, so predictions follow a turn right
+    away instead of averaging the old and new legs for a whole window.
+    """
+
+    def __init__(self, window: int = 5, max_age_s: float = 15.0, max_turn_deg: float = 45.0):
+        self.window = window
+        self.max_age_s = max_age_s
+        self.max_turn_deg = max_turn_deg
+        self._fixes: Deque[Tuple[float, float, float]] = deque(maxlen=window)
+        self._velocity: Tuple[float, float] = (0.0, 0.0)
+
+    def update(self, lat: float, lon: float, t: Optional[float] = None) -> None:
+        t = time.monotonic() if t is None else t
+        if len(self._fixes) >= 2 and self.speed > 0:
+            _, last_lat, last_lon = self._fixes[-1]
+            north = (lat - last_lat) * METERS_PER_DEG_LAT
+            east = (lon - last_lon) * METERS_PER_DEG_LAT * math.cos(math.radians(last_lat))
+            if (north or east) and _angle_diff(math.degrees(math.atan2(east, north)), self.heading) > self.max_turn_deg:
+                while len(self._fixes) > 1:
+                    self._fixes.popleft()
+        self._fixes.append((t, lat, lon))
+        while self._fixes and t - self._fixes[0][0] > self.max_age_s:
+            self._fixes.popleft()
+        self._velocity = self._fit()
+
+    def _fit(self) -> Tuple[float, float]:
+        """(north, east) velocity in m/s"""
+        if len(self._fixes) < 2:
+            return 0.0, 0.0
+        t0, lat0, lon0 = self._fixes[-1]
+        cos_lat = math.cos(math.radians(lat0))
+        ts, ns, es = [], [], []
+        for t, lat, lon in self._fixes:
+            ts.append(t - t0)
+            ns.append((lat - lat0) * METERS_PER_DEG_LAT)
+            es.append((lon - lon0) * METERS_PER_DEG_LAT * cos_lat)
+        mean_t = sum(ts) / len(ts)
+        var_t = sum((t - mean_t) ** 2 for t in ts)
+        if var_t <= 1e-9:
+            return 0.0, 0.0
+        mean_n = sum(ns) / len(ns)
+        mean_e = sum(es) / len(es)
+        v_north = sum((t - mean_t) * (n - mean_n) for t, n in zip(ts, ns)) / var_t
+        v_east = sum((t - mean_t) * (e - mean_e) for t, e in zip(ts, es)) / var_t
+        return v_north, v_east
+
+    @property
+    def has_fix(self) -> bool:
+        return bool(self._fixes)
+
+    @property
+    def speed(self) -> float:
+        """Meters per second"""
+        return math.hypot(*self._velocity)
+
+    @property
+    def heading(self) -> float:
+        """Direction of travel in degrees (0 = north)"""
+        v_north, v_east = self._velocity
+        return math.degrees(math.atan2(v_east, v_north)) % 360
+
+    def predict(self, dt_s: float) -> Tuple[float, float]:
+        """(lat, lon) expected dt_s seconds after the latest fix"""
+        if not self._fixes:
+            raise ValueError("No fixes yet")
+        _, lat, lon = self._fixes[-1]
+        v_north, v_east = self._velocity
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        return (
+            lat + v_north * dt_s / METERS_PER_DEG_LAT,
+            lon + v_east * dt_s / (METERS_PER_DEG_LAT * cos_lat),
+        )
+
+    def reset(self) -> None:
+        self._fixes.clear()
+        self._velocity = (0.0, 0.0)
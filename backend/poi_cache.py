@@ -0,0 +1,304 @@
+"""LRU cache of ready-serialized nearby-POI payloads, keyed by geohash cell"""
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+import asyncio
+import math
+import threading
+
+from pydantic import TypeAdapter
+
+from metrics import metrics
+from models import POI
+from motion import MotionModel
+from poi_store import KM_PER_DEG_LAT
+from pois_database import Candidate, get_nearby_pois, pois_at, rank_bounded, view_candidates
+
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {c: i for i, c in enumerate(_BASE32)}
+
+POI_LIST_ADAPTER = TypeAdapter(List[POI])
+
+# Heading-aware queries are cached per 22.5 degree sector
+HEADING_SECTORS = 16
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 7) -> str:
+    """Standard base32 geohash of a point"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def geohash_decode(geohash: str) -> Tuple[float, float]:
+    """Center point (lat, lon) of a geohash cell"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for char in geohash:
+        value = _BASE32_INDEX[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+
+def cell_half_diagonal_km(geohash: str) -> float:
+    """Farthest a point in the cell can be from its center"""
+    lat, _ = geohash_decode(geohash)
+    bits = 5 * len(geohash)
+    height_deg = 180 / 2 ** (bits // 2)
+    width_deg = 360 / 2 ** (bits - bits // 2)
+    return math.hypot(height_deg, width_deg * math.cos(math.radians(lat))) * KM_PER_DEG_LAT / 2
+
+
+class PoiTile:
+    """Nearby POIs for one cell, plus their JSON array encoding"""
+    __slots__ = ("cell", "pois", "payload")
+
+    def __init__(self, cell: str, pois: List[POI], payload: bytes):
+        self.cell = cell
+        self.pois = pois
+        self.payload = payload
+
+
+class ViewTile:
+    """
+    View-cone candidates for one (cell, heading sector): every POI that can
+    be in view from anywhere in the cell with a heading in the sector, best
+    possible score first. Each fix ranks them from the player's own position
+    and heading, stopping once the rest can't make the top max_count; the
+    PoiTile is reused while the result doesn't change.
+    """
+    __slots__ = ("cell", "candidates", "_ranked", "_tile")
+
+    def __init__(self, cell: str, candidates: List[Tuple[float, Candidate]]):
+        self.cell = cell
+        self.candidates = candidates
+        self._ranked: Optional[List[int]] = None
+        self._tile: Optional[PoiTile] = None
+
+    def at(self, lat: float, lon: float, heading: float, fov_deg: float, max_count: int, radius_km: float) -> PoiTile:
+        ranked = rank_bounded(self.candidates, lat, lon, heading, fov_deg, max_count, radius_km)
+        if ranked != self._ranked:
+            pois = pois_at(ranked)
+            self._ranked, self._tile = ranked, PoiTile(self.cell, pois, POI_LIST_ADAPTER.dump_json(pois))
+        return self._tile
+
+
+class PoiTileCache:
+    """
+    Nearby-POI results computed once per (geohash cell, radius) and reused by
+    every fix that lands in the same cell. View-culled queries (see
+    get_pois_in_view) are additionally keyed by heading sector, field of
+    view and max count.
+
+    Radius results are computed for the cell center, so at the default
+    precision 7 (cells of roughly 150 m x 150 m) a POI within ~100 m of the
+    radius edge may be included or excluded slightly early. View-culled
+    tiles cache only the candidate search; bearings, distances and ranking
+    are computed per fix from the player's position. Tiles are built lazily
+    and the least recently used ones are evicted beyond `max_tiles`.
+    """
+
+    def __init__(self, precision: int = 7, max_tiles: int = 2048):
+        self.precision = precision
+        self.max_tiles = max_tiles
+        self._lock = threading.Lock()
+        self._tiles: "OrderedDict[tuple, Union[PoiTile, ViewTile]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(
+        self, lat: float, lon: float, radius_km: float,
+        heading: float, fov_deg: float, max_count: int,
+    ) -> tuple:
+        cell = geohash_encode(lat, lon, self.precision)
+        if fov_deg >= 360 and max_count <= 0:
+            sector = None  # plain radius query, heading irrelevant
+        else:
+            width = 360 / HEADING_SECTORS
+            sector = int(((heading % 360) + width / 2) // width) % HEADING_SECTORS
+        return (cell, radius_km, sector, fov_deg, max_count)
+
+    def get(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        heading: float = 0.0,
+        fov_deg: float = 360.0,
+        max_count: int = 0,
+    ) -> PoiTile:
+        key = self._key(lat, lon, radius_km, heading, fov_deg, max_count)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                metrics.incr("poi_cache.hits")
+        if tile is None:
+            tile = self._build(*key)
+            with self._lock:
+                self.misses += 1
+                metrics.incr("poi_cache.misses")
+                self._insert(key, tile)
+        if isinstance(tile, ViewTile):
+            return tile.at(lat, lon, heading, fov_deg, max_count, radius_km)
+        return tile
+
+    def warm(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        heading: float = 0.0,
+        fov_deg: float = 360.0,
+        max_count: int = 0,
+    ) -> bool:
+        """Build the tile for a point if missing, without counting a lookup"""
+        key = self._key(lat, lon, radius_km, heading, fov_deg, max_count)
+        with self._lock:
+            if key in self._tiles:
+                return False
+        tile = self._build(*key)
+        with self._lock:
+            self._insert(key, tile)
+        return True
+
+    def _insert(self, key: tuple, tile: Union[PoiTile, ViewTile]) -> None:
+        self._tiles[key] = tile
+        self._tiles.move_to_end(key)
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+            metrics.incr("poi_cache.evictions")
+
+    def _build(
+        self, cell: str, radius_km: float, sector, fov_deg: float, max_count: int
+    ) -> Union[PoiTile, ViewTile]:
+        center_lat, center_lon = geohash_decode(cell)
+        if sector is None:
+            pois = get_nearby_pois(center_lat, center_lon, radius_km)
+            return PoiTile(cell, pois, POI_LIST_ADAPTER.dump_json(pois))
+        # Wide enough for any position in the cell and heading in the sector
+        width = 360 / HEADING_SECTORS
+        return ViewTile(cell, view_candidates(
+            center_lat, center_lon, sector * width, fov_deg,
+            radius_km, cell_half_diagonal_km(cell), width / 2,
+        ))
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tiles.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class PoiPrefetcher:
+    """
+    Warms the tile cache for where the player is heading.
+
+    After each fix, positions `step_s`, 2*`step_s`, ... up to `horizon_s`
+    seconds ahead are predicted from the motion model and their tiles built
+    in a worker thread, so the next /api/location lands on a warm tile.
+    View tiles are keyed by the heading the motion model predicts for each
+    point, not the one the player reported last. At most one prefetch runs
+    at a time; fixes arriving meanwhile are skipped.
+    """
+
+    def __init__(
+        self,
+        cache: PoiTileCache,
+        horizon_s: float = 10.0,
+        step_s: float = 1.0,
+        min_speed_mps: float = 0.5,
+    ):
+        self.cache = cache
+        self.horizon_s = horizon_s
+        self.step_s = step_s
+        self.min_speed_mps = min_speed_mps
+        self._task: Optional[asyncio.Future] = None
+
+    def predicted_points(self, motion: MotionModel) -> List[Tuple[float, float, float]]:
+        """(lat, lon, heading) of each predicted position"""
+        if not motion.has_fix or motion.speed < self.min_speed_mps:
+            return []
+        steps = int(self.horizon_s / self.step_s)
+        # Constant velocity: every predicted point keeps the current course
+        heading = motion.heading
+        return [(*motion.predict(self.step_s * (i + 1)), heading) for i in range(steps)]
+
+    def prefetch_now(
+        self,
+        points: List[Tuple[float, float, float]],
+        radius_km: float,
+        fov_deg: float = 360.0,
+        max_count: int = 0,
+    ) -> int:
+        """Build any missing tiles for points; returns how many were built"""
+        built = sum(
+            self.cache.warm(lat, lon, radius_km, heading, fov_deg, max_count)
+            for lat, lon, heading in points
+        )
+        metrics.incr("poi_cache.prefetched", built)
+        return built
+
+    def schedule(
+        self,
+        motion: MotionModel,
+        radius_km: float,
+        fov_deg: float = 360.0,
+        max_count: int = 0,
+    ) -> None:
+        """Start a background prefetch from inside the event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        points = self.predicted_points(motion)
+        if not points:
+            return
+        loop = asyncio.get_running_loop()
+        self._task = loop.run_in_executor(
+            None, self.prefetch_now, points, radius_km, fov_deg, max_count
+        )
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Compact, memory-mapped POI storage for large extracts.
+
+File layout (little-endian), POIs sorted by latitude:
+  header    8s magic "SQPOI\\x00\\x00\\x02", uint32 count, uint32 label blob size
+  lat       float32[count]
+  lon       float32[count]
+  offsets   uint32[count + 1]  start of each label in the blob
+  category  uint8[count]       index into CATEGORIES
+  labels    utf-8 blob
+
+float32 keeps coordinates to within ~1 m, plenty for map markers.
+
+Build from OpenStreetMap/GeoJSON/CSV extracts:
+  python poi_store.py build sf.geojson more.csv -o pois.bin
+  python poi_store.py info pois.bin
+
+Supported inputs:
+  .geojson/.json  GeoJSON FeatureCollection of Points (name from properties
+                  "name" or "label"), or Overpass API JSON ("elements" with
+                  lat/lon and tags.name). Convert .osm.pbf first, e.g.
+                  `osmium export extract.osm.pbf -f geojson -o extract.geojson`.
+  .csv            header with lat, lon and name or label columns, plus an
+                  optional category column
+Categories come from a "category" property/column when present, otherwise
+from common OSM tags (amenity, tourism, leisure, historic).
+
+Point the backend at the file with POI_DATA_FILE=pois.bin.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, List, Tuple
+import argparse
+import csv
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+
+
+MAGIC = b"SQPOI\x00\x00\x02"
+HEADER = struct.Struct("<8sII")
+KM_PER_DEG_LAT = 111.32
+# float32 holds ~7 significant digits; 5 decimals (~1 m) avoids noisy output
+COORD_DECIMALS = 5
+EARTH_RADIUS_KM = 6371
+
+# Append only: packed files store the index
+CATEGORIES = ("other", "landmark", "park", "culture", "coffee", "venue", "museum")
+_CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}
+
+# OSM tag values mapped onto our categories
+OSM_CATEGORIES = {
+    ("amenity", "cafe"): "coffee",
+    ("amenity", "theatre"): "culture",
+    ("amenity", "arts_centre"): "culture",
+    ("tourism", "attraction"): "landmark",
+    ("tourism", "viewpoint"): "landmark",
+    ("tourism", "museum"): "museum",
+    ("tourism", "gallery"): "museum",
+    ("historic", "monument"): "landmark",
+    ("historic", "memorial"): "landmark",
+    ("leisure", "park"): "park",
+    ("leisure", "garden"): "park",
+    ("leisure", "stadium"): "venue",
+}
+
+
+def category_of(tags: dict) -> str:
+    """Our category for a property/tag dict (explicit "category" wins)"""
+    if tags.get("category") in _CATEGORY_CODES:
+        return tags["category"]
+    for (key, value), category in OSM_CATEGORIES.items():
+        if tags.get(key) == value:
+            return category
+    return "other"
+
+
+def _read_geojson_or_overpass(path: str) -> Iterator[Tuple[float, float, str, str]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if "elements" in data:
+        for element in data["elements"]:
+            tags = element.get("tags", {})
+            name = tags.get("name")
+            if name and "lat" in element and "lon" in element:
+                yield element["lat"], element["lon"], name, category_of(tags)
+        return
+    for feature in data.get("features", []):
+        geometry = feature.get("geometry") or {}
+        props = feature.get("properties") or {}
+        name = props.get("name") or props.get("label")
+        if geometry.get("type") == "Point" and name:
+            lon, lat = geometry["coordinates"][:2]
+            yield lat, lon, name, category_of(props)
+
+
+def _read_csv(path: str) -> Iterator[Tuple[float, float, str, str]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            name = row.get("name") or row.get("label")
+            if name:
+                yield float(row["lat"]), float(row["lon"]), name, category_of(row)
+
+
+def read_extract(path: str) -> Iterator[Tuple[float, float, str, str]]:
+    """Yield (lat, lon, label, category) from a GeoJSON, Overpass JSON or CSV file"""
+    if path.lower().endswith(".csv"):
+        return _read_csv(path)
+    return _read_geojson_or_overpass(path)
+
+
+def write_store(pois: Iterable[Tuple], out_path: str) -> int:
+    """
+    Pack (lat, lon, label[, category]) rows into the columnar file format;
+    returns the POI count
+    """
+    rows = sorted(pois, key=lambda p: p[0])
+    lats = array("f", (p[0] for p in rows))
+    lons = array("f", (p[1] for p in rows))
+    categories = array("B", (_CATEGORY_CODES.get(p[3] if len(p) > 3 else "other", 0) for p in rows))
+    offsets = array("I", [0])
+    blob = bytearray()
+    for row in rows:
+        blob += row[2].encode("utf-8")
+        offsets.append(len(blob))
+    if sys.byteorder != "little":
+        for column in (lats, lons, offsets):
+            column.byteswap()
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(rows), len(blob)))
+        lats.tofile(f)
+        lons.tofile(f)
+        offsets.tofile(f)
+        categories.tofile(f)
+        f.write(blob)
+    os.replace(tmp_path, out_path)
+    return len(rows)
+
+
+def box_degrees(lat: float, radius_km: float) -> Tuple[float, float]:
+    """Half-height and half-width in degrees of the box enclosing a radius_km circle"""
+    angle = radius_km / EARTH_RADIUS_KM
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    return math.degrees(angle), math.degrees(math.asin(min(1.0, math.sin(angle) / cos_lat)))
+
+
+class PoiStore:
+    """Read-only view over a packed POI file, memory-mapped on open"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, blob_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a POI store (bad magic {magic!r})")
+        self.count = count
+
+        view = memoryview(self._mmap)
+        pos = HEADER.size
+        self.lats = self._column(view, pos, "f", count)
+        pos += 4 * count
+        self.lons = self._column(view, pos, "f", count)
+        pos += 4 * count
+        self._offsets = self._column(view, pos, "I", count + 1)
+        pos += 4 * (count + 1)
+        self._categories = view[pos:pos + count]
+        pos += count
+        self._labels = view[pos:pos + blob_size]
+
+    @staticmethod
+    def _column(view: memoryview, pos: int, typecode: str, length: int):
+        size = array(typecode).itemsize * length
+        if sys.byteorder == "little":
+            return view[pos:pos + size].cast(typecode)
+        # Big-endian hosts pay for a swapped in-memory copy
+        column = array(typecode, view[pos:pos + size].tobytes())
+        column.byteswap()
+        return column
+
+    def __len__(self) -> int:
+        return self.count
+
+    def coords(self, index: int) -> Tuple[float, float]:
+        """(lat, lon) rounded to the precision float32 actually stores"""
+        return round(self.lats[index], COORD_DECIMALS), round(self.lons[index], COORD_DECIMALS)
+
+    def label(self, index: int) -> str:
+        return bytes(self._labels[self._offsets[index]:self._offsets[index + 1]]).decode("utf-8")
+
+    def category(self, index: int) -> str:
+        return CATEGORIES[self._categories[index]]
+
+    def box_indices(self, lat: float, lon: float, radius_km: float) -> Iterator[int]:
+        """
+        Indices of POIs in the lat/lon box around a radius_km circle, via a
+        latitude-band bisect; callers apply their own distance test
+        """
+        dlat, dlon = box_degrees(lat, radius_km)
+        lo = bisect_left(self.lats, lat - dlat)
+        hi = bisect_right(self.lats, lat + dlat)
+        lons = self.lons
+        for i in range(lo, hi):
+            if abs(lons[i] - lon) <= dlon:
+                yield i
+
+    def nearby_indices(self, lat: float, lon: float, radius_km: float) -> List[int]:
+        """Indices of POIs within radius_km"""
+        lat_r = math.radians(lat)
+        lats, lons = self.lats, self.lons
+        found = []
+        for i in self.box_indices(lat, lon, radius_km):
+            poi_lat, poi_lon = lats[i], lons[i]
+            a = (math.sin(math.radians(poi_lat - lat) / 2) ** 2 +
+                 math.cos(lat_r) * math.cos(math.radians(poi_lat)) *
+                 math.sin(math.radians(poi_lon - lon) / 2) ** 2)
+            if 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a))) <= radius_km:
+                found.append(i)
+        return found
+
+    def close(self) -> None:
+        self.lats = self.lons = self._offsets = self._categories = self._labels = None
+        self._mmap.close()
+        self._file.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or inspect packed POI files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Pack GeoJSON/Overpass/CSV extracts into a POI file")
+    build.add_argument("inputs", nargs="+", help="Extract files")
+    build.add_argument("-o", "--output", default="pois.bin", help="Output path (default: pois.bin)")
+    info = sub.add_parser("info", help="Print a summary of a POI file")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        def all_pois():
+            for path in args.inputs:
+                yield from read_extract(path)
+        count = write_store(all_pois(), args.output)
+        size = os.path.getsize(args.output)
+        print(f"Wrote {count} POIs to {args.output} ({size / 1024:.1f} KiB)")
+    else:
+        store = PoiStore(args.path)
+        print(f"{args.path}: {len(store)} POIs")
+        for i in range(min(5, len(store))):
+            print(f"  {store.lats[i]:.5f}, {store.lons[i]:.5f}  {store.label(i)} ({store.category(i)})")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
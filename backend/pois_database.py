@@ -1,52 +1,91 @@
 """Static database of San Francisco Points of Interest"""
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
 from models import POI
+from poi_store import PoiStore, box_degrees
+import heapq
 import math
+import os
 
 
 # Static list of San Francisco landmarks and coffee shops
 SF_POIS = [
     # Major Landmarks
-    {"lat": 37.8199, "lon": -122.4783, "label": "Golden Gate Bridge"},
-    {"lat": 37.8080, "lon": -122.4177, "label": "Alcatraz Island"},
-    {"lat": 37.7749, "lon": -122.4194, "label": "San Francisco City Hall"},
-    {"lat": 37.8024, "lon": -122.4058, "label": "Coit Tower"},
-    {"lat": 37.7955, "lon": -122.4058, "label": "Pier 39"},
-    {"lat": 37.8030, "lon": -122.4187, "label": "Lombard Street"},
-    {"lat": 37.7694, "lon": -122.4862, "label": "Golden Gate Park"},
-    {"lat": 37.7790, "lon": -122.5190, "label": "Ocean Beach"},
-    {"lat": 37.7648, "lon": -122.4201, "label": "Mission Dolores"},
-    {"lat": 37.8025, "lon": -122.4186, "label": "Fisherman's Wharf"},
+    {"lat": 37.8199, "lon": -122.4783, "label": "Golden Gate Bridge", "category": "landmark"},
+    {"lat": 37.8080, "lon": -122.4177, "label": "Alcatraz Island", "category": "landmark"},
+    {"lat": 37.7749, "lon": -122.4194, "label": "San Francisco City Hall", "category": "landmark"},
+    {"lat": 37.8024, "lon": -122.4058, "label": "Coit Tower", "category": "landmark"},
+    {"lat": 37.7955, "lon": -122.4058, "label": "Pier 39", "category": "landmark"},
+    {"lat": 37.8030, "lon": -122.4187, "label": "Lombard Street", "category": "landmark"},
+    {"lat": 37.7694, "lon": -122.4862, "label": "Golden Gate Park", "category": "landmark"},
+    {"lat": 37.7790, "lon": -122.5190, "label": "Ocean Beach", "category": "landmark"},
+    {"lat": 37.7648, "lon": -122.4201, "label": "Mission Dolores", "category": "landmark"},
+    {"lat": 37.8025, "lon": -122.4186, "label": "Fisherman's Wharf", "category": "landmark"},
+    {"lat": 37.8007, "lon": -122.4467, "label": "Palace of Fine Arts", "category": "landmark"},
     
     # Coffee Shops
-    {"lat": 37.7955, "lon": -122.3937, "label": "Blue Bottle Coffee - Ferry Building"},
-    {"lat": 37.7870, "lon": -122.4070, "label": "Philz Coffee - Mission"},
-    {"lat": 37.7991, "lon": -122.4075, "label": "Sightglass Coffee"},
-    {"lat": 37.7749, "lon": -122.4312, "label": "Ritual Coffee Roasters"},
-    {"lat": 37.7847, "lon": -122.4072, "label": "Four Barrel Coffee"},
-    {"lat": 37.7956, "lon": -122.4077, "label": "Contraband Coffee Bar"},
-    {"lat": 37.7614, "lon": -122.4221, "label": "Andytown Coffee Roasters"},
-    {"lat": 37.7683, "lon": -122.4278, "label": "Flywheel Coffee Roasters"},
+    {"lat": 37.7955, "lon": -122.3937, "label": "Blue Bottle Coffee - Ferry Building", "category": "coffee"},
+    {"lat": 37.7870, "lon": -122.4070, "label": "Philz Coffee - Mission", "category": "coffee"},
+    {"lat": 37.7991, "lon": -122.4075, "label": "Sightglass Coffee", "category": "coffee"},
+    {"lat": 37.7749, "lon": -122.4312, "label": "Ritual Coffee Roasters", "category": "coffee"},
+    {"lat": 37.7847, "lon": -122.4072, "label": "Four Barrel Coffee", "category": "coffee"},
+    {"lat": 37.7956, "lon": -122.4077, "label": "Contraband Coffee Bar", "category": "coffee"},
+    {"lat": 37.7614, "lon": -122.4221, "label": "Andytown Coffee Roasters", "category": "coffee"},
+    {"lat": 37.7683, "lon": -122.4278, "label": "Flywheel Coffee Roasters", "category": "coffee"},
     
     # Parks and Recreation
-    {"lat": 37.7694, "lon": -122.4862, "label": "Japanese Tea Garden"},
-    {"lat": 37.7691, "lon": -122.4833, "label": "California Academy of Sciences"},
-    {"lat": 37.7715, "lon": -122.4696, "label": "de Young Museum"},
-    {"lat": 37.8007, "lon": -122.4467, "label": "Palace of Fine Arts"},
+    {"lat": 37.7694, "lon": -122.4862, "label": "Japanese Tea Garden", "category": "park"},
+    
+    # Museums
+    {"lat": 37.7691, "lon": -122.4833, "label": "California Academy of Sciences", "category": "museum"},
+    {"lat": 37.7715, "lon": -122.4696, "label": "de Young Museum", "category": "museum"},
     
     # Shopping & Culture
-    {"lat": 37.7879, "lon": -122.4074, "label": "Ferry Building Marketplace"},
-    {"lat": 37.7883, "lon": -122.4076, "label": "Embarcadero Center"},
-    {"lat": 37.7879, "lon": -122.4101, "label": "Union Square"},
-    {"lat": 37.7986, "lon": -122.4099, "label": "Chinatown Gate"},
-    {"lat": 37.8013, "lon": -122.4058, "label": "North Beach"},
+    {"lat": 37.7879, "lon": -122.4074, "label": "Ferry Building Marketplace", "category": "culture"},
+    {"lat": 37.7883, "lon": -122.4076, "label": "Embarcadero Center", "category": "culture"},
+    {"lat": 37.7879, "lon": -122.4101, "label": "Union Square", "category": "culture"},
+    {"lat": 37.7986, "lon": -122.4099, "label": "Chinatown Gate", "category": "culture"},
+    {"lat": 37.8013, "lon": -122.4058, "label": "North Beach", "category": "culture"},
     
     # Tech & Modern
-    {"lat": 37.7767, "lon": -122.3908, "label": "Oracle Park"},
-    {"lat": 37.7858, "lon": -122.3970, "label": "Chase Center"},
+    {"lat": 37.7767, "lon": -122.3908, "label": "Oracle Park", "category": "venue"},
+    {"lat": 37.7858, "lon": -122.3970, "label": "Chase Center", "category": "venue"},
 ]
 
 
+# Optional packed extract (see poi_store.py); replaces SF_POIS when set
+POI_DATA_FILE = os.getenv("POI_DATA_FILE")
+poi_store: Optional[PoiStore] = PoiStore(POI_DATA_FILE) if POI_DATA_FILE else None
+
+
+# Relative importance of each category when ranking POIs in view
+CATEGORY_WEIGHTS = {
+    "landmark": 1.0,
+    "park": 0.8,
+    "museum": 0.75,
+    "culture": 0.7,
+    "venue": 0.6,
+    "coffee": 0.5,
+    "other": 0.3,
+}
+# Score = distance closeness + bearing alignment + category weight
+DISTANCE_WEIGHT = 1.0
+BEARING_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+# POIs this close are "here" and count as in view whatever the heading
+AT_POI_KM = 0.05
+# Margins on the planar pre-test in _cone_candidates; at view radii the
+# planar bearing and distance are within a fraction of a degree / percent
+# of the great-circle ones
+PLANAR_BEARING_SLACK_DEG = 1.0
+PLANAR_DISTANCE_SLACK = 1.02
+KM_PER_DEG = math.radians(6371)
+
+
+def _store_poi(index: int) -> POI:
+    lat, lon = poi_store.coords(index)
+    return POI(lat=lat, lon=lon, label=poi_store.label(index))
+
+
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Calculate distance between two points in kilometers using Haversine formula"""
     R = 6371  # Earth's radius in kilometers
@@ -74,6 +113,11 @@ def get_nearby_pois(lat: float, lon: float, radius_km: float = 1.5) -> List[POI]
     Returns:
         List of POI objects within the radius
     """
+    if poi_store is not None:
+        return [
+            _store_poi(i) for i in poi_store.nearby_indices(lat, lon, radius_km)
+        ]
+    
     nearby = []
     
     for poi_data in SF_POIS:
@@ -89,7 +133,218 @@ def get_nearby_pois(lat: float, lon: float, radius_km: float = 1.5) -> List[POI]
     return nearby
 
 
+def bearing_degrees(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Initial compass bearing (0-360, 0 = north) from point 1 to point 2"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dlon = math.radians(lon2 - lon1)
+    x = math.sin(dlon) * math.cos(phi2)
+    y = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(dlon)
+    return math.degrees(math.atan2(x, y)) % 360
+
+
+# (index, lat, lon, category) of a POI considered for view culling
+Candidate = Tuple[int, float, float, str]
+
+
+def _candidates(lat: float, lon: float, radius_km: float) -> Iterator[Candidate]:
+    """POIs in the lat/lon box around the radius; callers test the distance"""
+    if poi_store is not None:
+        return (
+            (i, *poi_store.coords(i), poi_store.category(i))
+            for i in poi_store.box_indices(lat, lon, radius_km)
+        )
+    dlat, dlon = box_degrees(lat, radius_km)
+    return (
+        (i, p["lat"], p["lon"], p.get("category", "other"))
+        for i, p in enumerate(SF_POIS)
+        if abs(p["lat"] - lat) <= dlat and abs(p["lon"] - lon) <= dlon
+    )
+
+
+def _cone_candidates(lat: float, lon: float, heading: float, fov_deg: float, radius_km: float) -> Iterator[Candidate]:
+    """
+    Candidates that may be within radius_km and the view cone, by a cheap
+    planar test on the raw coordinates with some slack; only these are built
+    and scored exactly
+    """
+    half_fov = fov_deg / 2 + PLANAR_BEARING_SLACK_DEG
+    cos_lat = math.cos(math.radians(lat))
+    far_deg2 = (radius_km * PLANAR_DISTANCE_SLACK / KM_PER_DEG) ** 2
+    near_deg2 = (AT_POI_KM * PLANAR_DISTANCE_SLACK / KM_PER_DEG) ** 2
+    if poi_store is not None:
+        lats, lons = poi_store.lats, poi_store.lons
+        indices: Iterable[int] = poi_store.box_indices(lat, lon, radius_km)
+    else:
+        lats = [p["lat"] for p in SF_POIS]
+        lons = [p["lon"] for p in SF_POIS]
+        indices = range(len(SF_POIS))
+    for i in indices:
+        north = lats[i] - lat
+        east = (lons[i] - lon) * cos_lat
+        distance2 = north * north + east * east
+        if distance2 > far_deg2:
+            continue
+        if (half_fov < 180 and distance2 > near_deg2 and
+                abs((math.degrees(math.atan2(east, north)) - heading + 180) % 360 - 180) > half_fov):
+            continue
+        if poi_store is not None:
+            yield (i, *poi_store.coords(i), poi_store.category(i))
+        else:
+            yield i, SF_POIS[i]["lat"], SF_POIS[i]["lon"], SF_POIS[i].get("category", "other")
+
+
+def _bearing_offset(lat: float, lon: float, poi_lat: float, poi_lon: float, heading: float) -> float:
+    return abs((bearing_degrees(lat, lon, poi_lat, poi_lon) - heading + 180) % 360 - 180)
+
+
+def _scored_in_view(
+    candidates: Iterable[Candidate], lat: float, lon: float, heading: float, fov_deg: float, radius_km: float
+) -> Iterator[Tuple[float, int]]:
+    """Yield (score, index) for every candidate inside the radius and view cone"""
+    half_fov = fov_deg / 2
+    for index, poi_lat, poi_lon, category in candidates:
+        distance = haversine_distance(lat, lon, poi_lat, poi_lon)
+        if distance > radius_km:
+            continue
+        if distance <= AT_POI_KM:
+            offset = 0.0
+        else:
+            offset = _bearing_offset(lat, lon, poi_lat, poi_lon, heading)
+        if offset > half_fov:
+            continue
+        score = (DISTANCE_WEIGHT * (1 - distance / radius_km) +
+                 BEARING_WEIGHT * (1 - offset / 180) +
+                 CATEGORY_WEIGHT * CATEGORY_WEIGHTS.get(category, CATEGORY_WEIGHTS["other"]))
+        yield score, index
+
+
+def view_candidates(
+    lat: float, lon: float, heading: float, fov_deg: float, radius_km: float,
+    slack_km: float, heading_slack_deg: float = 0.0,
+) -> List[Tuple[float, Candidate]]:
+    """
+    Candidates that can be in the view cone of a player anywhere within
+    slack_km of (lat, lon) and heading within heading_slack_deg of `heading`.
+    The cone is widened by the largest bearing change that moving slack_km
+    can cause, so ranking them from the player's own position finds the same
+    POIs as a full query would.
+
+    Each comes with an upper bound on the score it can reach from there,
+    highest first, for rank_bounded().
+    """
+    half_fov = fov_deg / 2
+    found = []
+    for candidate in _candidates(lat, lon, radius_km + slack_km):
+        _, poi_lat, poi_lon, category = candidate
+        distance = haversine_distance(lat, lon, poi_lat, poi_lon)
+        if distance > radius_km + slack_km:
+            continue
+        if distance > AT_POI_KM + slack_km:
+            margin = math.degrees(math.asin(min(1.0, slack_km / distance))) + heading_slack_deg
+            offset = max(0.0, _bearing_offset(lat, lon, poi_lat, poi_lon, heading) - margin)
+            if offset > half_fov:
+                continue
+        else:
+            offset = 0.0
+        bound = (DISTANCE_WEIGHT * (1 - max(0.0, distance - slack_km) / radius_km) +
+                 BEARING_WEIGHT * (1 - offset / 180) +
+                 CATEGORY_WEIGHT * CATEGORY_WEIGHTS.get(category, CATEGORY_WEIGHTS["other"]))
+        found.append((bound + 1e-9, candidate))
+    found.sort(key=lambda item: item[0], reverse=True)
+    return found
+
+
+def rank_in_view(
+    candidates: Iterable[Candidate], lat: float, lon: float, heading: float,
+    fov_deg: float, max_count: int, radius_km: float,
+) -> List[int]:
+    """Indices of the best candidates in view from (lat, lon), highest ranked first"""
+    scored = _scored_in_view(candidates, lat, lon, heading, fov_deg, radius_km)
+    if max_count > 0:
+        top = heapq.nlargest(max_count, scored)
+    else:
+        top = sorted(scored, reverse=True)
+    return [index for _, index in top]
+
+
+def rank_bounded(
+    bounded: List[Tuple[float, Candidate]], lat: float, lon: float, heading: float,
+    fov_deg: float, max_count: int, radius_km: float,
+) -> List[int]:
+    """
+    rank_in_view() over view_candidates() output: stops at the first
+    candidate whose bound can't beat the current top max_count
+    """
+    if max_count <= 0:
+        return rank_in_view((c for _, c in bounded), lat, lon, heading, fov_deg, max_count, radius_km)
+    top: List[Tuple[float, int]] = []
+    for bound, candidate in bounded:
+        if len(top) == max_count and bound < top[0][0]:
+            break
+        for scored in _scored_in_view((candidate,), lat, lon, heading, fov_deg, radius_km):
+            if len(top) < max_count:
+                heapq.heappush(top, scored)
+            else:
+                heapq.heappushpop(top, scored)
+    return [index for _, index in sorted(top, reverse=True)]
+
+
+def pois_at(indices: Iterable[int]) -> List[POI]:
+    """POI objects for database indices (as returned by rank_in_view)"""
+    if poi_store is not None:
+        return [_store_poi(index) for index in indices]
+    return [
+        POI(lat=SF_POIS[index]["lat"], lon=SF_POIS[index]["lon"], label=SF_POIS[index]["label"])
+        for index in indices
+    ]
+
+
+def get_pois_in_view(
+    lat: float,
+    lon: float,
+    heading: float,
+    fov_deg: float = 120.0,
+    max_count: int = 10,
+    radius_km: float = 1.5,
+) -> List[POI]:
+    """
+    Get the best POIs in front of the player, highest ranked first.
+    
+    Args:
+        lat: Player's latitude
+        lon: Player's longitude
+        heading: Player's heading in degrees (0 = north)
+        fov_deg: Width of the view cone centered on heading (360 = all around)
+        max_count: Maximum POIs returned (0 = no limit)
+        radius_km: Radius in kilometers (default 1.5km)
+    
+    Returns:
+        Up to max_count POI objects ranked by distance, bearing alignment and
+        category weight. Uses a bounded heap, so cost is O(n log k) and only
+        the returned POIs are materialized.
+    """
+    return pois_at(rank_in_view(
+        _cone_candidates(lat, lon, heading, fov_deg, radius_km), lat, lon, heading, fov_deg, max_count, radius_km
+    ))
+
+
+def get_fence_sites(lat: float, lon: float, radius_km: float) -> List[Tuple[int, float, float, str]]:
+    """(stable id, lat, lon, label) of POIs within radius_km, for lazily built geofences"""
+    if poi_store is not None:
+        return [
+            (i, *poi_store.coords(i), poi_store.label(i))
+            for i in poi_store.nearby_indices(lat, lon, radius_km)
+        ]
+    return [
+        (i, p["lat"], p["lon"], p["label"])
+        for i, p in enumerate(SF_POIS)
+        if haversine_distance(lat, lon, p["lat"], p["lon"]) <= radius_km
+    ]
+
+
 def get_all_pois() -> List[POI]:
     """Get all POIs in the database"""
+    if poi_store is not None:
+        return [_store_poi(i) for i in range(len(poi_store))]
     return [POI(lat=p["lat"], lon=p["lon"], label=p["label"]) for p in SF_POIS]
 
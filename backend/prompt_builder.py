@@ -0,0 +1,106 @@
+"""Token-budgeted prompt construction with a prefix-cache-friendly layout"""
+from typing import Iterable, List, Optional
+
+
+# Rough English average for OpenAI tokenizers; good enough for budgeting
+CHARS_PER_TOKEN = 4
+# Per-entry overhead in the history block: the "[i] " label plus its newline
+ENTRY_OVERHEAD_TOKENS = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer dependency)"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Trim text so its estimated size fits in max_tokens"""
+    max_chars = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 3:
+        return text[:max_chars]
+    return text[:max_chars - 3].rstrip() + "..."
+
+
+def dedupe(entries: Iterable[str], exclude: Optional[str] = None) -> List[str]:
+    """
+    Drop empty and repeated entries (whitespace/case-insensitive), keeping the
+    most recent occurrence. Anything equal to `exclude` is dropped too.
+    """
+    seen = set()
+    if exclude:
+        seen.add(_normalize(exclude))
+    kept: List[str] = []
+    for entry in reversed(list(entries)):
+        key = _normalize(entry)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        kept.append(entry)
+    kept.reverse()
+    return kept
+
+
+def fit_to_budget(entries: List[str], budget_tokens: int, overhead_tokens: int = 1) -> List[str]:
+    """
+    Keep the newest entries that fit in budget_tokens, returned oldest-first.
+    Each entry is charged `overhead_tokens` on top of its text (by default one
+    for the joining newline).
+    """
+    kept: List[str] = []
+    used = 0
+    for entry in reversed(entries):
+        cost = estimate_tokens(entry) + overhead_tokens
+        if used + cost > budget_tokens:
+            break
+        kept.append(entry)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def build_observation_prompt(
+    history: List[str],
+    latest: str,
+    budget_tokens: int,
+    summary: str = "",
+    history_header: str = "Recent camera observations:",
+    latest_header: str = "Latest observation:",
+    summary_header: str = "Earlier (summarized):",
+) -> str:
+    """
+    Build the per-call (dynamic) part of a prompt.
+
+    The latest observation is always included; earlier observations are
+    de-duplicated against it and against each other, then trimmed oldest-first
+    to whatever budget is left. An optional summary of older context is placed
+    first and gets budget after the verbatim observations. Callers put this
+    AFTER their static system prompt so the static prefix stays byte-identical
+    between calls.
+    """
+    # Every header, separator and label is charged, so the estimate of the
+    # whole prompt never exceeds budget_tokens (estimates are subadditive)
+    latest_text = truncate_to_tokens(latest, budget_tokens - estimate_tokens(latest_header) - 1)
+    latest_block = f"{latest_header}\n{latest_text}"
+    # Two blank-line separators between at most three blocks
+    remaining = budget_tokens - estimate_tokens(latest_block) - estimate_tokens(history_header) - 2
+
+    context = fit_to_budget(dedupe(history, exclude=latest), remaining, ENTRY_OVERHEAD_TOKENS)
+    remaining -= sum(estimate_tokens(entry) + ENTRY_OVERHEAD_TOKENS for entry in context)
+
+    blocks = []
+    if summary and remaining > estimate_tokens(summary_header) + 1:
+        summary_text = truncate_to_tokens(summary, remaining - estimate_tokens(summary_header) - 1)
+        blocks.append(f"{summary_header} {summary_text}")
+    if context:
+        lines = "\n".join(f"[{i}] {entry}" for i, entry in enumerate(context))
+        blocks.append(f"{history_header}\n{lines}")
+    blocks.append(latest_block)
+    return "\n\n".join(blocks)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded session (see session_recorder.py) against the backend,
+in-process over httpx's ASGI transport, with no sockets and no server.
+
+  python replay.py walk.jsonl                  # real time
+  python replay.py walk.jsonl --speed 10       # 10x
+  python replay.py walk.jsonl --speed max --fake-openai --quiet
+
+Timed replays (1x, 10x) fire each call at its recorded offset divided by the
+speed, overlapping calls like the original clients did. `max` sends calls
+back to back, each after the previous answered, which measures throughput.
+The report gives per-endpoint latency, how far calls started behind
+schedule (the backend not keeping up), and calls whose status differs
+from the recording.
+
+The backend's session clock (main.clock: GPS filter, motion model and
+prefetch, message expiry) follows the recording at any speed, so those
+decide as they did live. Event-loop timers do not: the camera batch
+window, message wake-ups, broadcast ticks and (fake) OpenAI latency run
+in real time, so at 10x a 100 ms batch window spans 1 s of recorded time.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+from metrics import percentile
+from session_recorder import load_session
+
+
+@dataclass
+class ReplayResult:
+    speed: float
+    wall_s: float = 0.0
+    latencies_ms: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    lag_ms: List[float] = field(default_factory=list)
+    mismatches: List[Dict[str, Any]] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def calls(self) -> int:
+        return sum(len(v) for v in self.latencies_ms.values())
+
+    def report(self) -> str:
+        label = "max" if self.speed <= 0 else f"{self.speed:g}x"
+        lines = [f"replay at {label}: {self.calls} calls in {self.wall_s:.2f} s "
+                 f"({self.calls / max(self.wall_s, 1e-9):.0f} calls/s)"]
+        for path, samples in sorted(self.latencies_ms.items()):
+            lines.append(f"  {path:24s} {len(samples):6d}  p50 {percentile(samples, 50):7.2f} ms  "
+                         f"p95 {percentile(samples, 95):7.2f} ms  max {max(samples):7.2f} ms")
+        if self.lag_ms:
+            lines.append(f"  behind schedule  p50 {percentile(self.lag_ms, 50):.1f} ms  "
+                         f"p95 {percentile(self.lag_ms, 95):.1f} ms")
+        lines.append(f"  status mismatches {len(self.mismatches)}  errors {self.errors}")
+        for mismatch in self.mismatches[:5]:
+            lines.append(f"    t={mismatch['t']:.3f} {mismatch['m']} {mismatch['p']}: "
+                         f"recorded {mismatch['s']}, got {mismatch['got']}")
+        return "\n".join(lines)
+
+
+class ReplayClock:
+    """
+    Recorded session time for main.session_clock. Timed replays run it at
+    `speed` from the first record; `max` replays step it to each record's
+    offset as that record is sent. It carries on from where the previous
+    replay left it, so it never runs backwards.
+    """
+
+    def __init__(self):
+        self.base = self.origin = self.now = self.speed = 0.0
+        self.started = time.perf_counter()
+
+    def start(self, origin: float, speed: float) -> None:
+        self.base = self()
+        self.origin = self.now = origin
+        self.speed = speed
+        self.started = time.perf_counter()
+
+    def __call__(self) -> float:
+        if self.speed <= 0:
+            return self.base + self.now - self.origin
+        return self.base + (time.perf_counter() - self.started) * self.speed
+
+
+CLOCK = ReplayClock()
+
+
+async def send(client, record: Dict[str, Any], result: ReplayResult) -> None:
+    url = record["p"] + (f"?{record['q']}" if record.get("q") else "")
+    kwargs = {}
+    if "b" in record:
+        kwargs["json"] = record["b"]
+    elif "x" in record:
+        kwargs["content"] = record["x"]
+    started = time.perf_counter()
+    try:
+        response = await client.request(record["m"], url, **kwargs)
+    except Exception as e:
+        print(f"Replay of {record['m']} {record['p']} failed: {e}", file=sys.stderr)
+        result.errors += 1
+        return
+    result.latencies_ms[record["p"]].append((time.perf_counter() - started) * 1000)
+    if record.get("s") and response.status_code != record["s"]:
+        result.mismatches.append({**record, "got": response.status_code})
+
+
+async def replay(app, records: List[Dict[str, Any]], speed: float = 1.0, lifespan: bool = True) -> ReplayResult:
+    """Drive `app` with `records`; speed <= 0 replays as fast as possible"""
+    import httpx
+
+    result = ReplayResult(speed=speed)
+    origin = records[0]["t"] if records else 0.0
+    async with contextlib.AsyncExitStack() as stack:
+        if lifespan:
+            await stack.enter_async_context(app.router.lifespan_context(app))
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://replay")
+        )
+        started = time.perf_counter()
+        CLOCK.start(origin, speed)
+        if speed <= 0:
+            for record in records:
+                CLOCK.now = record["t"]
+                await send(client, record, result)
+        else:
+            tasks = []
+            for record in records:
+                due = started + (record["t"] - origin) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                result.lag_ms.append(max(0.0, time.perf_counter() - due) * 1000)
+                tasks.append(asyncio.create_task(send(client, record, result)))
+            await asyncio.gather(*tasks)
+        result.wall_s = time.perf_counter() - started
+    return result
+
+
+def load_app(fake_openai: bool):
+    """main.app with recording off and on the replay clock, optionally answering camera calls from fake_openai"""
+    os.environ.pop("SESSION_RECORD_PATH", None)
+    import main
+    main.session_clock = CLOCK
+    if fake_openai:
+        import ai_processor
+        import fake_openai as fake
+        ai_processor.client = fake.make_client()
+    return main.app
+
+
+def parse_speed(value: str) -> float:
+    return 0.0 if value == "max" else float(value.rstrip("x"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a recorded SideQuest session in-process")
+    parser.add_argument("session", help="Session file written with SESSION_RECORD_PATH")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="1, 10, ... or 'max' (default 1)")
+    parser.add_argument("--since", type=float, default=0, help="Start at this offset (seconds)")
+    parser.add_argument("--until", type=float, default=None, help="Stop before this offset (seconds)")
+    parser.add_argument("--fake-openai", action="store_true", help="Answer camera calls from fake_openai.py")
+    parser.add_argument("--quiet", action="store_true", help="Hide the backend's own log output")
+    args = parser.parse_args()
+
+    records = load_session(args.session, args.since, args.until)
+    if not records:
+        print(f"No calls in {args.session}", file=sys.stderr)
+        sys.exit(1)
+    app = load_app(args.fake_openai)
+    with contextlib.ExitStack() as stack:
+        if args.quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        result = asyncio.run(replay(app, records, args.speed))
+    print(result.report())
+
+
+if __name__ == "__main__":
+    main()
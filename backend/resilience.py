@@ -0,0 +1,203 @@
+"""Circuit breaker and adaptive token-bucket rate limiter for upstream API calls"""
+from typing import Mapping, Optional, Tuple
+import re
+import threading
+import time
+
+from metrics import metrics
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for a cooldown. When the cooldown ends a single probe is let
+    through (half-open): success closes the breaker, failure re-opens it with
+    the cooldown doubled, up to `max_cooldown_s`.
+
+    Thread-safe, so one instance can be shared by async handlers and worker
+    threads alike.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        base_cooldown_s: float = 2.0,
+        max_cooldown_s: float = 60.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown_s = base_cooldown_s
+        self.max_cooldown_s = max_cooldown_s
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._cooldown_s = base_cooldown_s
+        self._open_until = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._open_until:
+                return HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until the next call would be let through (0 if now)"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._open_until - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a call may go out now. A True in half-open state is the probe."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() < self._open_until:
+                    return False
+                self._state = HALF_OPEN
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                metrics.incr(f"breaker.{self.name}.closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._cooldown_s = self.base_cooldown_s
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN:
+                self._cooldown_s = min(self.max_cooldown_s, self._cooldown_s * 2)
+                self._trip()
+            elif self._state == CLOSED and self._failures >= self.failure_threshold:
+                self._cooldown_s = self.base_cooldown_s
+                self._trip()
+
+    def record_abandoned(self) -> None:
+        """A let-through call ended without a verdict (e.g. it was cancelled)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._open_until = time.monotonic() + self._cooldown_s
+        self._probe_in_flight = False
+        metrics.incr(f"breaker.{self.name}.opened")
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse OpenAI-style reset durations like '20ms', '1s', '6m0s' to seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def parse_rate_limit_headers(
+    headers: Optional[Mapping[str, str]],
+) -> Tuple[Optional[int], Optional[float], Optional[float]]:
+    """Return (remaining requests, seconds until reset, retry-after seconds)"""
+    if not headers:
+        return None, None, None
+    remaining = headers.get("x-ratelimit-remaining-requests")
+    reset = parse_duration(headers.get("x-ratelimit-reset-requests", ""))
+    retry_after = None
+    if headers.get("retry-after-ms"):
+        retry_after = parse_duration(headers["retry-after-ms"] + "ms")
+    elif headers.get("retry-after"):
+        retry_after = parse_duration(headers["retry-after"])
+    return (int(remaining) if remaining and remaining.isdigit() else None), reset, retry_after
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose refill rate adapts to the upstream's signals.
+
+    Successes raise the rate additively up to `max_rate`; a 429 halves it
+    (down to `min_rate`) and empties the bucket until the server's retry-after
+    passes. When rate-limit headers report the remaining quota, the rate is
+    capped so that quota lasts until the reset.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 2.0,
+        burst: float = 4.0,
+        min_rate: float = 0.1,
+        max_rate: float = 10.0,
+        increase_step: float = 0.1,
+    ):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available; never waits"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return False
+            self._refill(now)
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def on_success(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        remaining, reset, _ = parse_rate_limit_headers(headers)
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+            if remaining is not None and reset:
+                self.rate = max(self.min_rate, min(self.rate, remaining / reset))
+        metrics.observe(f"ratelimit.{self.name}.rate", self.rate)
+
+    def on_rate_limited(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        _, reset, retry_after = parse_rate_limit_headers(headers)
+        pause = retry_after if retry_after is not None else (reset or 1.0 / self.rate)
+        with self._lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            self._updated = now
+            self._blocked_until = max(self._blocked_until, now + pause)
+        metrics.incr(f"ratelimit.{self.name}.throttled")
+        metrics.observe(f"ratelimit.{self.name}.rate", self.rate)
@@ -0,0 +1,185 @@
+"""
+Recording of inbound /api/* calls for offline replay (see replay.py).
+
+A session file is plain JSON lines: a header line, then one line per call
+with its arrival offset in seconds, method, path, query string, JSON body
+and the status the backend answered with:
+
+  {"session":1,"started":1760000000.0}
+  {"t":0.412,"m":"POST","p":"/api/location","b":{"lat":37.77,"lon":-122.41},"s":200}
+
+Plain text rather than gzip so that every written line stays readable after
+a crash, and a restart can append to the same file.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import os
+import queue
+import threading
+import time
+
+from metrics import metrics
+
+
+FORMAT_VERSION = 1
+RECORD_PREFIX = "/api/"
+# Push channels and the metrics endpoint are outputs, not inputs to replay
+SKIP_PATHS = ("/api/stream", "/api/state/poll", "/api/metrics")
+FSYNC_INTERVAL_S = 1.0
+
+
+class SessionRecorder:
+    """
+    Appends calls to a session file. record() only queues the call; a
+    writer thread formats it, writes it and hands it to the OS as soon as
+    the queue drains, so a crashed process loses at most the calls still
+    queued, and request handling never waits on the disk. The file is
+    fsynced every FSYNC_INTERVAL_S against power loss. Reopening an
+    existing file appends a new header and the loader continues its clock,
+    so restarts within one walk stay one session.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.perf_counter()
+        self._file = open(path, "a", encoding="utf-8")
+        self._synced_at = self.started
+        if _ends_mid_line(path):
+            # A crash tore the last line; keep our header off it
+            self._file.write("\n")
+        self._write({"session": FORMAT_VERSION, "started": time.time()})
+        self._file.flush()
+        self._sync()
+        self._queue: "queue.Queue[Optional[Tuple]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._run, name="session-recorder", daemon=True)
+        self._writer.start()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def record(self, arrived: float, method: str, path: str, query: bytes, body: bytes, status: int) -> None:
+        """Queue a call for the writer thread (never blocks)"""
+        self._queue.put((arrived, method, path, query, body, status))
+
+    @staticmethod
+    def _entry(arrived: float, method: str, path: str, query: bytes, body: bytes, status: int) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {"t": round(arrived, 3), "m": method, "p": path}
+        if query:
+            entry["q"] = query.decode("latin-1")
+        if body:
+            try:
+                entry["b"] = json.loads(body)
+            except ValueError:
+                entry["x"] = body.decode("utf-8", "replace")
+        entry["s"] = status
+        return entry
+
+    def _run(self) -> None:
+        while True:
+            call = self._queue.get()
+            if call is None:
+                break
+            self._write(self._entry(*call))
+            metrics.incr("session.recorded")
+            if self._queue.empty():
+                self._file.flush()
+                if time.perf_counter() - self._synced_at >= FSYNC_INTERVAL_S:
+                    self._sync()
+        self._file.flush()
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._synced_at = time.perf_counter()
+
+    def close(self) -> None:
+        """Write out everything queued, then sync and close the file"""
+        self._queue.put(None)
+        self._writer.join()
+        self._sync()
+        self._file.close()
+
+
+def _ends_mid_line(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+class RecordingMiddleware:
+    """
+    ASGI middleware that hands every /api/* request to a SessionRecorder.
+    Lines are written when a call completes, so long calls (camera) may
+    appear after later ones; load_session() orders them by arrival.
+    """
+
+    def __init__(self, app, recorder: SessionRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith(RECORD_PREFIX) or path in SKIP_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        arrived = self.recorder.elapsed()
+        chunks: List[bytes] = []
+        status = 0
+
+        async def recording_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, recording_receive, recording_send)
+        finally:
+            self.recorder.record(arrived, scope["method"], path, scope.get("query_string", b""), b"".join(chunks), status)
+
+
+def iter_session(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Records of a session file in file order, offsets relative to the first
+    header. A line cut short by a crash is skipped; lines a restart appended
+    after it are read as usual.
+    """
+    first_started = offset = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if "session" in entry:
+                if first_started is None:
+                    first_started = entry["started"]
+                offset = entry["started"] - first_started
+                continue
+            if offset:
+                entry["t"] = round(entry["t"] + offset, 3)
+            yield entry
+
+
+def load_session(path: str, since: float = 0, until: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Records with since <= t < until, in arrival order"""
+    records = [
+        entry for entry in iter_session(path)
+        if entry["t"] >= since and (until is None or entry["t"] < until)
+    ]
+    records.sort(key=lambda entry: entry["t"])
+    return records
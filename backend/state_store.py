@@ -0,0 +1,122 @@
+"""Copy-on-write GameState snapshots with per-revision encoding"""
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from http_encoding import compress
+from metrics import metrics
+from models import GameState
+
+
+class StateStore:
+    """
+    Holds the current GameState as an immutable snapshot.
+
+    Writers never touch the published object: update() builds a new
+    snapshot from the current one plus the changed fields and swaps it in
+    with a new revision number, so a reader always sees all or none of a
+    multi-field change. Everything runs on the event loop thread and no
+    write spans an await, so no lock is needed.
+
+    The JSON encoding is computed once per revision and shared by every
+    reader (WebSocket fan-out, /api/state, ...). The same goes for each
+    field projection (`encode(state, fields)`, fields None = everything):
+    only projections somebody asked for are encoded, and compressed()
+    likewise gzips (or brotlis) each at most once per revision.
+
+    `critical_revision` is the last revision that changed one of
+    `critical_fields`; broadcasters send those without waiting out a
+    client's throttle. Listeners added with add_listener() are called as
+    `listener(revision, critical)` right after each publish, so a critical
+    change can be pushed without waiting for the next broadcast tick.
+    Coroutines can instead await wait_for_change(since), which wakes every
+    waiter with one event per publish.
+    """
+
+    def __init__(
+        self,
+        initial: GameState,
+        encode: Callable[[GameState, Optional[Tuple[str, ...]]], bytes],
+        critical_fields: Tuple[str, ...] = (),
+    ):
+        self._encode = encode
+        self._state = initial
+        self.critical_fields = critical_fields
+        self.revision = 1
+        self.critical_revision = 0
+        self.changed_at = self.critical_changed_at = time.monotonic()
+        self._listeners: List[Callable[[int, bool], None]] = []
+        self._changed: Optional[asyncio.Event] = None
+        self._encoded_revision = 0
+        self._encoded: Dict[Optional[Tuple[str, ...]], Tuple[bytes, str]] = {}
+        self._compressed: Dict[Tuple[Optional[Tuple[str, ...]], str], bytes] = {}
+
+    @property
+    def state(self) -> GameState:
+        return self._state
+
+    def update(self, **changes) -> GameState:
+        """Publish a copy of the current state with `changes` applied"""
+        return self.replace(replace(self._state, **changes))
+
+    def replace(self, state: GameState) -> GameState:
+        """Publish `state` as the new snapshot"""
+        previous, self._state = self._state, state
+        self.revision += 1
+        self.changed_at = time.monotonic()
+        critical = any(getattr(previous, name) != getattr(state, name) for name in self.critical_fields)
+        if critical:
+            self.critical_revision = self.revision
+            self.critical_changed_at = self.changed_at
+        metrics.incr("state.revisions")
+        for listener in self._listeners:
+            listener(self.revision, critical)
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+        return state
+
+    def add_listener(self, listener: Callable[[int, bool], None]) -> None:
+        self._listeners.append(listener)
+
+    async def wait_for_change(self, since: int, timeout: Optional[float] = None) -> bool:
+        """Wait until the revision is past `since`; False if `timeout` ran out first"""
+        if self.revision > since:
+            return True
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _encoding(self, fields: Optional[Tuple[str, ...]]) -> Tuple[bytes, str]:
+        if self._encoded_revision != self.revision:
+            self._encoded = {}
+            self._compressed = {}
+            self._encoded_revision = self.revision
+        encoding = self._encoded.get(fields)
+        if encoding is None:
+            body = self._encode(self._state, fields)
+            encoding = self._encoded[fields] = (body, body.decode())
+            metrics.incr("state.encodes")
+        return encoding
+
+    def encoded(self, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        """JSON of the current snapshot, encoded at most once per revision"""
+        return self._encoding(fields)[0]
+
+    def encoded_text(self, fields: Optional[Tuple[str, ...]] = None) -> str:
+        return self._encoding(fields)[1]
+
+    def compressed(self, coding: str, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        """encoded(fields) in content coding "gzip" or "br", cached per revision"""
+        body = self.encoded(fields)
+        key = (fields, coding)
+        compressed = self._compressed.get(key)
+        if compressed is None:
+            compressed = self._compressed[key] = compress(body, coding)
+            metrics.incr("state.compressions")
+        return compressed
@@ -0,0 +1,61 @@
+"""Strict JSON-schema structured output: request format, parsing and repair"""
+from typing import Any, Dict, List, Type, TypeVar
+import copy
+
+from pydantic import BaseModel, ValidationError
+
+
+M = TypeVar("M", bound=BaseModel)
+
+# Keywords strict mode rejects or that only describe the Python side
+_DROPPED_KEYS = ("default", "title")
+
+
+def _strict(node: Any, is_properties: bool = False) -> Any:
+    if isinstance(node, dict):
+        # Keys of a "properties" map are field names, never keywords
+        node = {
+            k: _strict(v, is_properties=k == "properties" and not is_properties)
+            for k, v in node.items()
+            if is_properties or k not in _DROPPED_KEYS
+        }
+        if not is_properties and node.get("type") == "object" and "properties" in node:
+            # Strict mode: every property listed as required (optional ones
+            # are nullable instead), and nothing beyond them
+            node["required"] = list(node["properties"])
+            node["additionalProperties"] = False
+        return node
+    if isinstance(node, list):
+        return [_strict(item) for item in node]
+    return node
+
+
+def strict_json_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """model's JSON schema, adjusted to what OpenAI strict structured output accepts"""
+    return _strict(copy.deepcopy(model.model_json_schema()))
+
+
+def response_format(model: Type[BaseModel], name: str) -> Dict[str, Any]:
+    """`response_format` for chat.completions that constrains decoding to `model`"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": strict_json_schema(model)},
+    }
+
+
+def parse_reply(model: Type[M], content: str) -> M:
+    """Validate the reply straight from JSON text; raises ValidationError"""
+    return model.model_validate_json(content)
+
+
+def repair_messages(messages: List[Dict[str, Any]], content: str, error: ValidationError) -> List[Dict[str, Any]]:
+    """`messages` plus the bad reply and a request to fix it, for one retry"""
+    problems = "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'reply'}: {e['msg']}"
+        for e in error.errors(include_url=False)[:5]
+    )
+    return messages + [
+        {"role": "assistant", "content": content},
+        {"role": "user", "content": f"That reply did not match the required JSON schema ({problems}). "
+                                    "Reply again with only the corrected JSON object."},
+    ]
@@ -0,0 +1,164 @@
+"""Per-client /ws subscriptions: which GameState fields, and how often"""
+from collections import deque
+from dataclasses import fields
+from typing import Deque, Iterable, Optional, Tuple
+import asyncio
+import itertools
+import time
+
+from models import GameState
+
+
+STATE_FIELDS = tuple(f.name for f in fields(GameState))
+
+
+def parse_fields(names: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    """
+    Normalize requested field names to a canonical tuple (state field order),
+    so equal projections share one encoding. None means the full state.
+    """
+    if names is None:
+        return None
+    if isinstance(names, str):
+        names = names.split(",")
+    names = list(names)
+    if not all(isinstance(name, str) for name in names):
+        raise TypeError("field names must be strings")
+    wanted = {name.strip() for name in names}
+    projection = tuple(name for name in STATE_FIELDS if name in wanted)
+    if not projection or len(projection) == len(STATE_FIELDS):
+        return None
+    return projection
+
+
+# A send taking more than this share of the client's interval, an app-level
+# ack slower than SLOW_RTT_S, or frames piling up while a send is in flight
+# marks the link as congested
+SEND_BUDGET = 0.5
+SLOW_RTT_S = 0.3
+MAX_UNACKED = 3
+
+_client_ids = itertools.count(1)
+
+
+class Subscription:
+    """
+    One /ws client: its field projection (None = full state) and its own
+    adaptive update rate.
+
+    The rate starts at the fastest allowed (`max_hz`) and halves whenever
+    the link looks congested: a send that blocks for more than SEND_BUDGET
+    of the interval, frames offered while a send is still in flight, or (for clients that
+    send {"ack": true} per frame) a slow or lagging round trip, but never
+    below `min_hz`. Clean sends speed it back up gradually. `max_hz` is the
+    client's cap and is never exceeded, even when it is below `min_hz`.
+
+    Frames are coalesced: the sender always sends the latest encoding, never
+    a backlog. Full-state clients get a frame every interval as before;
+    projected clients only when their projection's content changed. Critical
+    changes (see StateStore.critical_revision) skip the interval and don't
+    count as congestion.
+    """
+    __slots__ = (
+        "websocket", "fields", "client_id", "floor_interval", "min_interval", "max_interval", "interval",
+        "last_sent", "last_revision", "last_payload", "wakeup", "sending", "coalesced",
+        "send_s", "rtt_s", "acks", "_unacked",
+    )
+
+    def __init__(
+        self,
+        websocket,
+        fields: Optional[Tuple[str, ...]] = None,
+        max_hz: float = 10.0,
+        min_hz: float = 1.0,
+    ):
+        self.websocket = websocket
+        self.client_id = next(_client_ids)
+        self.floor_interval = 1.0 / min_hz
+        self.configure(fields, max_hz)
+        self.last_sent = 0.0
+        self.wakeup = asyncio.Event()
+        self.sending = False
+        self.coalesced = 0
+        self.send_s = 0.0
+        self.rtt_s: Optional[float] = None
+        self.acks = False
+        self._unacked: Deque[float] = deque(maxlen=32)
+
+    def configure(self, fields: Optional[Tuple[str, ...]], max_hz: float) -> None:
+        self.fields = fields
+        # The client's max_hz is a hard cap: a cap below the server's
+        # min_hz pins the rate there instead of being raised to the floor
+        self.min_interval = 1.0 / max_hz
+        self.max_interval = max(self.floor_interval, self.min_interval)
+        self.interval = self.min_interval
+        self.last_revision = 0  # resend in the new shape
+        self.last_payload = ""
+
+    @property
+    def rate_hz(self) -> float:
+        return 1.0 / self.interval
+
+    def wants(self, names: Iterable[str]) -> bool:
+        """True if any of `names` is in this client's projection"""
+        return self.fields is None or any(name in self.fields for name in names)
+
+    def due(self, revision: int, now: float, critical: bool = False) -> bool:
+        if critical:
+            return True
+        if now - self.last_sent < self.interval - 1e-3:
+            return False
+        return self.fields is None or revision != self.last_revision
+
+    def offer(self, critical: bool = False) -> None:
+        """Wake the sender; it will send whatever is latest when it gets to it"""
+        if self.sending and not critical:
+            self.coalesced += 1
+        self.wakeup.set()
+
+    def unchanged(self, revision: int, payload: str) -> bool:
+        """True (and remembers the revision) if payload is what was last sent"""
+        if self.fields is None or payload != self.last_payload:
+            return False
+        self.last_revision = revision
+        return True
+
+    def sent(self, revision: int, payload: str, started: float, duration_s: float) -> None:
+        self.last_sent = started
+        self.last_revision = revision
+        self.last_payload = payload
+        self.send_s = duration_s
+        if self.acks:
+            self._unacked.append(started)
+        congested = (
+            duration_s > self.interval * SEND_BUDGET
+            or self.coalesced > 0
+            or (self.acks and len(self._unacked) > MAX_UNACKED)
+        )
+        self.coalesced = 0
+        self._adapt(congested)
+
+    def acked(self, now: Optional[float] = None) -> None:
+        """An app-level ack for the oldest unacknowledged frame"""
+        now = time.monotonic() if now is None else now
+        self.acks = True
+        if not self._unacked:
+            return
+        self.rtt_s = now - self._unacked.popleft()
+        if self.rtt_s > SLOW_RTT_S:
+            self._adapt(True)
+
+    def _adapt(self, congested: bool) -> None:
+        if congested:
+            self.interval = min(self.max_interval, self.interval * 2)
+        else:
+            self.interval = max(self.min_interval, self.interval * 0.9)
+
+    def stats(self) -> dict:
+        return {
+            "id": self.client_id,
+            "fields": list(self.fields) if self.fields else None,
+            "rate_hz": round(self.rate_hz, 2),
+            "send_ms": round(self.send_s * 1000, 2),
+            "rtt_ms": round(self.rtt_s * 1000, 1) if self.rtt_s is not None else None,
+        }
@@ -0,0 +1,23 @@
+"""Shared fixtures; backend modules are flat, so the backend dir is on sys.path (see pyproject)"""
+import os
+
+# main and ai_processor read config at import; keep tests offline and quiet
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("AI_PREWARM_DELAY_S", "-1")
+os.environ.setdefault("OPENAI_WARMUP_ENABLED", "false")
+os.environ.setdefault("TTS_PREWARM_ENABLED", "false")
+os.environ.pop("SESSION_RECORD_PATH", None)
+
+import pytest
+
+from models import GameState, Message, Player
+
+
+@pytest.fixture
+def game_state() -> GameState:
+    return GameState(
+        player=Player(lat=37.7749, lon=-122.4194, heading=0.0),
+        pois=[],
+        objective="Explore",
+        message=Message(text="", visible=False, timeoutMs=3000),
+    )
@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import ai_processor
+from resilience import HALF_OPEN, CircuitBreaker
+
+
+def fake_client(create):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+        with_raw_response=SimpleNamespace(create=create),
+    )))
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=1, base_cooldown_s=0.0)
+    monkeypatch.setattr(ai_processor, "openai_breaker", breaker)
+    return breaker
+
+
+def test_half_open_probe_that_raises_unexpectedly_is_released(monkeypatch, breaker):
+    async def create(**kwargs):
+        raise RuntimeError("unexpected")
+
+    monkeypatch.setattr(ai_processor, "client", fake_client(create))
+    breaker.record_failure()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()  # this call is the probe
+    assert not breaker.allow()
+    with pytest.raises(RuntimeError):
+        asyncio.run(ai_processor.request_completion("gpt-test", []))
+    assert breaker.allow()  # the next call may probe again
+
+
+def test_concurrent_get_client_builds_one_client(monkeypatch):
+    import threading
+
+    monkeypatch.setattr(ai_processor, "client", None)
+    monkeypatch.setattr(ai_processor, "pool_transport", None)
+    barrier = threading.Barrier(8)
+    clients = []
+
+    def build():
+        barrier.wait()
+        clients.append(ai_processor.get_client())
+
+    threads = [threading.Thread(target=build) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(c) for c in clients}) == 1
+    assert clients[0]._client._transport is ai_processor.pool_transport
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+
+from announcements import AnnouncementPipeline
+
+
+async def drain(subscriber, count, timeout=1.0):
+    return [(await asyncio.wait_for(subscriber.get(), timeout)).text for _ in range(count)]
+
+
+def test_burst_only_voices_the_latest():
+    synthesized = []
+
+    async def run():
+        pipeline = AnnouncementPipeline(lambda text: synthesized.append(text) or text)
+        subscriber = pipeline.subscribe()
+        for text in ("one", "two", "three"):
+            pipeline.announce(text)
+        worker = asyncio.create_task(pipeline.run())
+        published = await drain(subscriber, 1)
+        worker.cancel()
+        return published
+
+    assert asyncio.run(run()) == ["three"]
+    assert synthesized == ["three"]
+
+
+def test_announcement_superseded_during_synthesis_is_dropped():
+    started, release = threading.Event(), threading.Event()
+
+    def synthesize(text):
+        if text == "slow":
+            started.set()
+            release.wait()
+        return text
+
+    async def run():
+        pipeline = AnnouncementPipeline(synthesize)
+        subscriber = pipeline.subscribe()
+        worker = asyncio.create_task(pipeline.run())
+        pipeline.announce("slow")
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        pipeline.announce("fresh")
+        release.set()
+        published = await drain(subscriber, 1)
+        await asyncio.sleep(0.05)
+        worker.cancel()
+        return published, subscriber.empty()
+
+    assert asyncio.run(run()) == (["fresh"], True)
+
+
+def test_full_subscriber_drops_oldest_without_blocking():
+    async def run():
+        pipeline = AnnouncementPipeline(lambda text: text, subscriber_backlog=2)
+        slow = pipeline.subscribe()
+        worker = asyncio.create_task(pipeline.run())
+        for i in range(5):
+            pipeline.announce(f"message {i}")
+            await asyncio.sleep(0.02)  # let each one through
+        worker.cancel()
+        return await drain(slow, 2)
+
+    assert asyncio.run(run()) == ["message 3", "message 4"]
+
+
+def test_new_message_is_announced_when_published(monkeypatch):
+    import main
+
+    pipeline = AnnouncementPipeline(lambda text: text)
+    monkeypatch.setattr(main, "announcer", pipeline)
+    monkeypatch.setattr(main, "ANNOUNCE_ENABLED", True)
+    main.message_scheduler.post("Boss incoming!", 3000, priority=99)
+    assert pipeline._pending is not None and pipeline._pending.text == "Boss incoming!"
+    main.message_scheduler.clear()
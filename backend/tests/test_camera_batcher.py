@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from camera_batcher import CameraBatcher
+
+
+class Recorder:
+    """process() stand-in: records batches and how many ran at once"""
+
+    def __init__(self, delay_s=0.05):
+        self.delay_s = delay_s
+        self.batches = []
+        self.running = self.max_running = 0
+
+    async def __call__(self, batch):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay_s)
+        finally:
+            self.running -= 1
+        self.batches.append(batch)
+        return len(self.batches)
+
+
+def test_lone_post_does_not_wait_for_window():
+    async def scenario():
+        process = Recorder(delay_s=0)
+        batcher = CameraBatcher(process, window_ms=10_000)
+        return await asyncio.wait_for(batcher.submit("a hallway", "cam0"), 1.0), process
+
+    result, process = asyncio.run(scenario())
+    assert result == 1
+    assert process.batches == [[("cam0", "a hallway")]]
+
+
+def test_posts_in_the_same_turn_share_one_call():
+    async def scenario():
+        process = Recorder()
+        batcher = CameraBatcher(process, window_ms=0)
+        results = await asyncio.gather(*(batcher.submit(f"scene {i}", f"cam{i}") for i in range(4)))
+        return results, process
+
+    results, process = asyncio.run(scenario())
+    assert results == [1, 1, 1, 1]
+    assert len(process.batches) == 1 and len(process.batches[0]) == 4
+
+
+def test_one_call_in_flight_and_next_batch_queues():
+    async def scenario():
+        process = Recorder(delay_s=0.05)
+        batcher = CameraBatcher(process, window_ms=0)
+        first = asyncio.ensure_future(batcher.submit("scene 0", "cam0"))
+        await asyncio.sleep(0.01)  # first call is running now
+        late = [asyncio.ensure_future(batcher.submit(f"scene {i}", f"cam{i}")) for i in range(1, 4)]
+        await asyncio.sleep(0.01)
+        stale = asyncio.ensure_future(batcher.submit("scene 1 again", "cam1"))
+        return await first, await asyncio.gather(*late, stale), process
+
+    first, late, process = asyncio.run(scenario())
+    assert process.max_running == 1
+    assert first == 1 and late == [2, 2, 2, 2]
+    assert process.batches[1] == [("cam2", "scene 2"), ("cam3", "scene 3"), ("cam1", "scene 1 again")]
+
+
+def test_queued_batch_keeps_newest_max_batch():
+    async def scenario():
+        process = Recorder(delay_s=0.05)
+        batcher = CameraBatcher(process, window_ms=0, max_batch=2)
+        first = asyncio.ensure_future(batcher.submit("scene 0"))
+        await asyncio.sleep(0.01)
+        queued = [asyncio.ensure_future(batcher.submit(f"scene {i}")) for i in range(1, 5)]
+        await first
+        return await asyncio.gather(*queued), process
+
+    queued, process = asyncio.run(scenario())
+    assert queued == [2, 2, 2, 2]
+    assert process.batches[1] == [(None, "scene 3"), (None, "scene 4")]
+
+
+def test_failure_reaches_every_submitter_and_batcher_recovers():
+    calls = []
+
+    async def process(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise RuntimeError("upstream down")
+        return "ok"
+
+    async def scenario():
+        batcher = CameraBatcher(process, window_ms=0)
+        failures = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+        return failures, await batcher.submit("c")
+
+    failures, after = asyncio.run(scenario())
+    assert all(isinstance(f, RuntimeError) for f in failures)
+    assert after == "ok"
+
+
+def test_cancelled_call_is_set_on_the_shared_result():
+    async def process(batch):
+        if batch == [(None, "cancelled")]:
+            raise asyncio.CancelledError()
+        return "ok"
+
+    async def scenario():
+        batcher = CameraBatcher(process, window_ms=0)
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(batcher.submit("cancelled"), 1.0)
+        return await asyncio.wait_for(batcher.submit("next"), 1.0)
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_after_a_multi_camera_batch_the_next_round_waits_for_the_others():
+    async def scenario():
+        process = Recorder(delay_s=0.01)
+        batcher = CameraBatcher(process, window_ms=50)
+        await asyncio.gather(*(batcher.submit(f"scene {i}", f"cam{i}") for i in range(4)))
+
+        async def post(i):
+            await asyncio.sleep(i * 0.01)
+            return await batcher.submit(f"next {i}", f"cam{i}")
+
+        return await asyncio.gather(*(post(i) for i in range(4))), process
+
+    results, process = asyncio.run(scenario())
+    assert results == [2, 2, 2, 2]
+    assert len(process.batches) == 2
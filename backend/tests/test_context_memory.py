@@ -0,0 +1,77 @@
+from context_memory import TieredMemory, condense
+from prompt_builder import estimate_tokens
+
+
+def test_recent_tier_keeps_the_newest_entries_verbatim():
+    memory = TieredMemory(recent_size=3)
+    for i in range(6):
+        memory.add(f"Scene {i}: a fountain in a square")
+    assert memory.recent() == [f"Scene {i}: a fountain in a square" for i in (3, 4, 5)]
+    assert memory.needs_compaction
+
+
+def test_compaction_summarizes_evicted_entries():
+    memory = TieredMemory(recent_size=2)
+    memory.add("A red bicycle leans on a lamp post. The street is empty.")
+    memory.add("A bakery window full of bread")
+    memory.add("Pigeons gather around a bench")
+    memory.add("A tram passes through the intersection")
+    memory.compact()
+    assert not memory.needs_compaction
+    assert memory.summary == "A red bicycle leans on a lamp post; A bakery window full of bread"
+    assert memory.recent() == ["Pigeons gather around a bench", "A tram passes through the intersection"]
+
+
+def test_similar_facts_merge_into_the_newer_one():
+    memory = TieredMemory(recent_size=1)
+    for text in ("A red bicycle near a lamp post", "A red bicycle beside a lamp post", "Now"):
+        memory.add(text)
+    memory.compact()
+    assert memory.summary == "A red bicycle beside a lamp post"
+
+
+def test_summary_stays_within_budget_dropping_oldest_facts():
+    memory = TieredMemory(recent_size=1, summary_tokens=30)
+    for i in range(20):
+        memory.add(f"Landmark {i} number{i} seen")
+    memory.compact()
+    assert estimate_tokens(memory.summary) <= 30
+    facts = memory.summary.split("; ")
+    assert facts[-1] == "Landmark 18 number18 seen"
+    assert "Landmark 0 number0 seen" not in facts
+
+
+def test_condense_keeps_first_sentence_and_caps_words():
+    assert condense("One thing. Another thing.") == "One thing"
+    assert condense(" ".join(["word"] * 30), max_words=5) == "word word word word word ..."
+
+
+def test_reset_during_compaction_discards_its_result(monkeypatch):
+    import threading
+
+    import context_memory
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_condense(text, *args):
+        started.set()
+        release.wait()
+        return condense(text, *args)
+
+    memory = TieredMemory(recent_size=1)
+    memory.add("Old session scene")
+    memory.add("Another old scene")
+    monkeypatch.setattr(context_memory, "condense", slow_condense)
+    compaction = threading.Thread(target=memory.compact)
+    compaction.start()
+    assert started.wait(1)
+    memory.reset()
+    release.set()
+    compaction.join()
+    assert memory.summary == ""
+
+    monkeypatch.setattr(context_memory, "condense", condense)
+    memory.add("New session scene")
+    memory.add("Next scene")
+    memory.compact()
+    assert memory.summary == "New session scene"
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+
+@pytest.fixture(scope="module")
+def main():
+    import main
+    return main
+
+
+@pytest.fixture(autouse=True)
+def fresh_change_event(main):
+    # Each test runs its own event loop; a wait that timed out in an earlier
+    # one leaves the store's asyncio.Event bound to that loop
+    main.store._changed = None
+
+
+def run_with_client(main, scenario):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await scenario(client)
+    return asyncio.run(run())
+
+
+def test_poll_behind_the_revision_returns_at_once(main):
+    async def scenario(client):
+        started = time.monotonic()
+        r = await client.get("/api/state/poll", params={"since": main.store.revision - 1, "timeout": 5})
+        return r, time.monotonic() - started
+
+    r, elapsed = run_with_client(main, scenario)
+    assert r.status_code == 200 and elapsed < 1
+    body = r.json()
+    assert body["revision"] == main.store.revision
+    assert body["state"]["objective"] == main.store.state.objective
+
+
+def test_poll_times_out_with_204(main):
+    async def scenario(client):
+        return await client.get("/api/state/poll", params={"since": main.store.revision, "timeout": 0.05})
+
+    r = run_with_client(main, scenario)
+    assert r.status_code == 204
+
+
+def test_change_wakes_a_held_poll(main):
+    async def scenario(client):
+        since = main.store.revision
+        poll = asyncio.create_task(client.get(
+            "/api/state/poll", params={"since": since, "timeout": 5, "fields": "objective"}
+        ))
+        await asyncio.sleep(0.05)
+        assert not poll.done()
+        started = time.monotonic()
+        main.store.update(objective="Woken")
+        r = await poll
+        return r, since, time.monotonic() - started
+
+    r, since, elapsed = run_with_client(main, scenario)
+    assert elapsed < 1
+    assert r.json() == {"revision": since + 1, "state": {"objective": "Woken"}}
+
+
+def test_sse_sends_one_event_per_revision(main):
+    async def run():
+        events = main.sse_events(None, 0.0, 0)
+        frames = [await asyncio.wait_for(events.__anext__(), 1)]
+        for step in range(3):
+            main.store.update(objective=f"SSE step {step}")
+            frames.append(await asyncio.wait_for(events.__anext__(), 1))
+        await events.aclose()
+        return frames
+
+    start = main.store.revision
+    frames = asyncio.run(run())
+    ids = [int(frame.split("\n")[0].removeprefix("id: ")) for frame in frames]
+    assert ids == [start, start + 1, start + 2, start + 3]
+    assert [json.loads(frame.split("data: ", 1)[1])["objective"] for frame in frames[1:]] == [
+        f"SSE step {step}" for step in range(3)
+    ]
+
+
+def test_projected_sse_skips_revisions_that_do_not_change_its_fields(main):
+    async def run():
+        events = main.sse_events(("danger_level",), 0.0, 0)
+        await asyncio.wait_for(events.__anext__(), 1)
+        main.store.update(objective="Not projected")
+        main.store.update(danger_level="high" if main.store.state.danger_level != "high" else "low")
+        frame = await asyncio.wait_for(events.__anext__(), 1)
+        await events.aclose()
+        return frame
+
+    assert list(json.loads(asyncio.run(run()).split("data: ", 1)[1])) == ["danger_level"]
@@ -0,0 +1,84 @@
+import math
+
+from geofence import ENTER, EXIT, GeofenceEngine
+from models import POI
+from motion import METERS_PER_DEG_LAT
+
+LAT, LON = 37.7749, -122.4194
+
+
+def offset(lat, lon, north_m, east_m):
+    return lat + north_m / METERS_PER_DEG_LAT, lon + east_m / (METERS_PER_DEG_LAT * math.cos(math.radians(lat)))
+
+
+def kinds(events):
+    return [(event.kind, event.fence.label) for event in events]
+
+
+def test_enter_then_exit():
+    engine = GeofenceEngine()
+    engine.add_pois([POI(lat=LAT, lon=LON, label="Fountain")], radius_m=50)
+    assert kinds(engine.check(*offset(LAT, LON, 0, 100))) == []
+    assert kinds(engine.check(*offset(LAT, LON, 0, 30))) == [(ENTER, "Fountain")]
+    assert kinds(engine.check(*offset(LAT, LON, 0, 10))) == []
+    assert [f.label for f in engine.inside()] == ["Fountain"]
+    assert kinds(engine.check(*offset(LAT, LON, 0, 100))) == [(EXIT, "Fountain")]
+    assert engine.inside() == []
+
+
+def test_exit_needs_exit_factor_times_the_radius():
+    engine = GeofenceEngine(exit_factor=1.2)
+    engine.add_pois([POI(lat=LAT, lon=LON, label="Fountain")], radius_m=50)
+    assert kinds(engine.check(*offset(LAT, LON, 45, 0))) == [(ENTER, "Fountain")]
+    # Jitter past the radius but inside 60 m keeps the player in
+    for north_m in (55, 48, 58, 52):
+        assert engine.check(*offset(LAT, LON, north_m, 0)) == []
+    assert kinds(engine.check(*offset(LAT, LON, 62, 0))) == [(EXIT, "Fountain")]
+    # ...and re-entering needs the plain radius again
+    assert engine.check(*offset(LAT, LON, 55, 0)) == []
+
+
+def test_players_are_tracked_separately():
+    engine = GeofenceEngine()
+    engine.add_pois([POI(lat=LAT, lon=LON, label="Fountain")], radius_m=50)
+    assert kinds(engine.check(LAT, LON, "a")) == [(ENTER, "Fountain")]
+    assert engine.check(*offset(LAT, LON, 0, 200), "b") == []
+    assert [f.label for f in engine.inside("a")] == ["Fountain"]
+    assert engine.inside("b") == []
+
+
+def test_source_fences_load_with_their_cell():
+    sites = {7: (LAT, LON, "Fountain"), 8: (*offset(LAT, LON, 0, 2000), "Far Tower")}
+    lookups = []
+
+    def lookup(lat, lon, radius_km):
+        lookups.append((lat, lon))
+        return [
+            (site_id, site_lat, site_lon, label)
+            for site_id, (site_lat, site_lon, label) in sites.items()
+            if math.hypot((site_lat - lat) * METERS_PER_DEG_LAT,
+                          (site_lon - lon) * METERS_PER_DEG_LAT * math.cos(math.radians(lat))) <= radius_km * 1000
+        ]
+
+    engine = GeofenceEngine()
+    engine.add_source(lookup, radius_m=50)
+    assert len(engine) == 0
+    assert kinds(engine.check(*offset(LAT, LON, 0, 20))) == [(ENTER, "Fountain")]
+    assert len(lookups) == 1
+    assert [f.label for f in engine.fences.values()] == ["Fountain"]
+    # The same cell isn't fetched again
+    engine.check(LAT, LON)
+    assert len(lookups) == 1
+    assert kinds(engine.check(*offset(LAT, LON, 0, 1990))) == [(EXIT, "Fountain"), (ENTER, "Far Tower")]
+    assert len(lookups) == 2
+
+
+def test_poi_and_source_fence_ids_do_not_collide():
+    engine = GeofenceEngine()
+    engine.add_source(lambda lat, lon, radius_km: [(0, LAT, LON, "Fountain")], radius_m=50)
+    engine.add_pois([POI(lat=LAT, lon=LON, label="Kiosk")], radius_m=50)
+    assert sorted(kinds(engine.check(LAT, LON))) == [(ENTER, "Fountain"), (ENTER, "Kiosk")]
+    assert len(engine) == 2
+    engine.add_pois([POI(lat=LAT, lon=LON, label="Bench")], radius_m=50)
+    assert kinds(engine.check(LAT, LON)) == [(ENTER, "Bench")]
+    assert sorted(f.label for f in engine.inside()) == ["Bench", "Fountain", "Kiosk"]
@@ -0,0 +1,62 @@
+import math
+
+import pytest
+
+from demo_routes import DEMO_WAYPOINTS, demo_route
+from gps_filter import GpsFilter
+from motion import METERS_PER_DEG_LAT
+
+
+def offset(lat, lon, north_m, east_m):
+    return lat + north_m / METERS_PER_DEG_LAT, lon + east_m / (METERS_PER_DEG_LAT * math.cos(math.radians(lat)))
+
+
+@pytest.mark.parametrize("pause_s", [1.0, 5.0, 7.0])
+def test_demo_route_reaches_every_waypoint(pause_s):
+    """demo_livestream.py: three fixes 1 s apart per leg, a camera call and a pause between legs"""
+    gps = GpsFilter()
+    route = demo_route(steps_per_leg=3)
+    t = 0.0
+    first = gps.update(*DEMO_WAYPOINTS[0], t=t)
+    assert first.accepted
+    for leg, waypoint in enumerate(DEMO_WAYPOINTS[1:]):
+        t += pause_s
+        for lat, lon, _ in route[leg * 3:leg * 3 + 3]:
+            fix = gps.update(lat, lon, t=t)
+            t += 1.0
+        assert fix.accepted, f"waypoint {leg + 1} rejected"
+        assert fix.lat == pytest.approx(waypoint[0]) and fix.lon == pytest.approx(waypoint[1])
+
+
+def test_single_outlier_is_rejected():
+    gps = GpsFilter()
+    lat, lon = DEMO_WAYPOINTS[0]
+    for i in range(5):
+        gps.update(lat, lon, t=float(i))
+    spike = gps.update(*offset(lat, lon, 400, 0), t=5.0)
+    assert not spike.accepted
+    back = gps.update(lat, lon, t=6.0)
+    assert back.accepted
+    assert back.lat == pytest.approx(lat, abs=1e-5)
+
+
+def test_scattered_outliers_do_not_reset():
+    gps = GpsFilter()
+    lat, lon = DEMO_WAYPOINTS[0]
+    for i in range(5):
+        gps.update(lat, lon, t=float(i))
+    assert not gps.update(*offset(lat, lon, 300, 0), t=5.0).accepted
+    assert not gps.update(*offset(lat, lon, -200, 250), t=6.0).accepted
+    assert gps.update(lat, lon, t=7.0).accepted
+
+
+def test_jump_followed_once_two_fixes_agree():
+    gps = GpsFilter()
+    lat, lon = DEMO_WAYPOINTS[0]
+    for i in range(5):
+        gps.update(lat, lon, t=float(i))
+    jumped = offset(lat, lon, 0, 900)
+    assert not gps.update(*jumped, t=5.0).accepted
+    fix = gps.update(*offset(*jumped, 3, 3), t=6.0)
+    assert fix.accepted
+    assert fix.lon == pytest.approx(offset(*jumped, 3, 3)[1])
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from hedging import HedgePolicy, hedged
+from metrics import metrics
+
+
+def counters():
+    return metrics.snapshot()["counters"]
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def policy():
+    return HedgePolicy(initial_delay_ms=10, min_delay_ms=10, budget=0.5, burst=1)
+
+
+async def slow(result, delay_s=0.2):
+    await asyncio.sleep(delay_s)
+    return result
+
+
+def test_slow_primary_is_hedged_and_backup_wins():
+    hedge_policy = policy()
+    result = asyncio.run(hedged(lambda: slow("primary"), lambda: slow("backup", 0), hedge_policy, name="t"))
+    assert result == "backup"
+    assert hedge_policy.hedges == 1
+    assert counters()["hedge.t.fired"] == 1
+    assert counters()["hedge.t.won"] == 1
+
+
+def test_declined_hedge_is_refunded_and_not_counted_as_fired():
+    hedge_policy = policy()
+    backups = []
+
+    async def backup():
+        backups.append(1)
+        return "backup"
+
+    result = asyncio.run(hedged(lambda: slow("primary"), backup, hedge_policy, name="t", can_hedge=lambda: False))
+    assert result == "primary"
+    assert backups == []
+    assert hedge_policy.hedges == 0
+    assert "hedge.t.fired" not in counters()
+    assert counters()["hedge.t.declined"] == 1
+
+
+def test_can_hedge_is_not_asked_without_budget():
+    hedge_policy = HedgePolicy(initial_delay_ms=10, min_delay_ms=10, budget=0)
+    asked = []
+    asyncio.run(hedged(lambda: slow("primary"), lambda: slow("backup", 0), hedge_policy,
+                       can_hedge=lambda: asked.append(1) or True))
+    assert asked == []
@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from http_pool import PoolMetricsTransport
+from metrics import metrics
+
+
+async def serve(delay_s=0.0):
+    """Minimal keep-alive HTTP/1.1 server; returns (server, base url)"""
+    async def handle(reader, writer):
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                await asyncio.sleep(delay_s)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nContent-Type: application/json\r\n\r\n{}")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def run(limits, requests, concurrent=False, delay_s=0.0, inspect=None):
+    async def main():
+        server, url = await serve(delay_s)
+        transport = PoolMetricsTransport("test", limits)
+        async with httpx.AsyncClient(transport=transport) as client:
+            if concurrent:
+                await asyncio.gather(*(client.get(f"{url}/") for _ in range(requests)))
+            else:
+                for _ in range(requests):
+                    await client.get(f"{url}/")
+            stats = inspect(transport) if inspect else transport.stats()
+        server.close()
+        await server.wait_closed()
+        return stats
+    return asyncio.run(main())
+
+
+def test_sequential_requests_reuse_one_connection():
+    stats = run(httpx.Limits(max_connections=4, max_keepalive_connections=4), requests=3)
+    counters = metrics.snapshot()["counters"]
+    assert counters["test.pool.requests"] == 3
+    assert counters["test.pool.connects"] == 1
+    assert len(metrics.samples("test.pool.wait_ms")) == 3
+    assert metrics.samples("test.pool.in_flight") == [1, 1, 1]
+    assert stats == {"connections": 1, "busy": 0, "max_connections": 4, "in_flight": 0, "http2": False}
+
+
+def test_requests_beyond_the_limit_queue_for_a_connection():
+    run(httpx.Limits(max_connections=1, max_keepalive_connections=1), requests=3, concurrent=True, delay_s=0.05)
+    assert metrics.snapshot()["counters"]["test.pool.connects"] == 1
+    assert max(metrics.samples("test.pool.in_flight")) == 3
+    # The last request waited for the other two to finish
+    assert max(metrics.samples("test.pool.wait_ms")) >= 90
+
+
+def test_outer_trace_still_sees_every_event():
+    events = []
+
+    async def trace(event, info):
+        events.append(event)
+
+    async def main():
+        server, url = await serve()
+        async with httpx.AsyncClient(transport=PoolMetricsTransport("test", httpx.Limits())) as client:
+            await client.get(f"{url}/", extensions={"trace": trace})
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(main())
+    assert "connection.connect_tcp.complete" in events
+    assert "http11.send_request_headers.started" in events
+
+
+def test_stats_survive_a_pool_without_connections():
+    def inspect(transport):
+        pool, transport._pool = transport._pool, SimpleNamespace()
+        try:
+            return transport.stats()
+        finally:
+            transport._pool = pool
+
+    stats = run(httpx.Limits(), requests=1, inspect=inspect)
+    assert stats["connections"] is None and stats["busy"] is None
+    assert stats["in_flight"] == 0
@@ -0,0 +1,49 @@
+from message_scheduler import MessageScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_reset_replaces_message_and_queue_without_notifying():
+    clock, changes = Clock(), []
+    scheduler = MessageScheduler(changes.append, clock)
+    scheduler.post("first", 3000)
+    scheduler.post("queued", 3000)
+    changes.clear()
+
+    message = scheduler.reset("fresh", 1000)
+    assert message.text == "fresh" and message.visible
+    assert changes == []
+
+    clock.now = 1.5  # "fresh" expires; the queue was dropped
+    scheduler.advance()
+    assert [(m.text, m.visible) for m in changes] == [("", False)]
+
+
+def test_reset_to_nothing_hides_the_message():
+    scheduler = MessageScheduler(lambda message: None, Clock())
+    scheduler.post("first", 0)
+    message = scheduler.reset()
+    assert not message.visible
+    assert scheduler.next_deadline is None
+
+
+def test_update_publishes_one_revision(game_state):
+    from dataclasses import asdict
+    from starlette.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        main.message_scheduler.post("old", 3000)
+        before = main.store.revision
+        body = asdict(game_state)
+        body["message"] = {"text": "Hello", "visible": True, "timeoutMs": 3000}
+        assert client.post("/update", json=body).status_code == 200
+        assert main.store.revision == before + 1
+        assert main.store.state.message.text == "Hello"
+        assert main.message_scheduler.next_deadline is not None
@@ -0,0 +1,69 @@
+import math
+
+import pytest
+
+from demo_routes import DEMO_WAYPOINTS, demo_route
+from motion import METERS_PER_DEG_LAT, MotionModel
+
+LAT, LON = 37.7749, -122.4194
+
+
+def offset(lat, lon, north_m, east_m):
+    return lat + north_m / METERS_PER_DEG_LAT, lon + east_m / (METERS_PER_DEG_LAT * math.cos(math.radians(lat)))
+
+
+def test_predict_extrapolates_constant_velocity():
+    motion = MotionModel()
+    for i in range(5):
+        motion.update(*offset(LAT, LON, 3.0 * i, 4.0 * i), t=float(i))
+    assert motion.speed == pytest.approx(5.0)
+    assert motion.heading == pytest.approx(math.degrees(math.atan2(4, 3)))
+    lat, lon = motion.predict(10.0)
+    expected = offset(LAT, LON, 3.0 * 14, 4.0 * 14)
+    assert lat == pytest.approx(expected[0], abs=1e-7) and lon == pytest.approx(expected[1], abs=1e-7)
+
+
+def test_predict_without_fixes_raises():
+    with pytest.raises(ValueError):
+        MotionModel().predict(1.0)
+
+
+def test_standing_still_predicts_the_last_fix():
+    motion = MotionModel()
+    motion.update(LAT, LON, t=0.0)
+    assert motion.predict(5.0) == (LAT, LON)
+    motion.update(LAT, LON, t=1.0)
+    assert motion.speed == 0.0 and motion.predict(5.0) == (LAT, LON)
+
+
+def test_old_fixes_age_out():
+    motion = MotionModel(max_age_s=3.0)
+    motion.update(*offset(LAT, LON, 0, 0), t=0.0)
+    motion.update(*offset(LAT, LON, 100, 0), t=1.0)
+    motion.update(*offset(LAT, LON, 100, 0), t=10.0)
+    assert motion.speed == 0.0
+
+
+def test_turn_restarts_the_fit():
+    motion = MotionModel()
+    for i in range(4):
+        motion.update(*offset(LAT, LON, 10.0 * i, 0), t=float(i))
+    # Turn east at the corner: the next prediction follows the new leg
+    motion.update(*offset(LAT, LON, 30.0, 10.0), t=4.0)
+    assert motion.heading == pytest.approx(90.0)
+    lat, lon = motion.predict(1.0)
+    expected = offset(LAT, LON, 30.0, 20.0)
+    assert lat == pytest.approx(expected[0], abs=1e-7) and lon == pytest.approx(expected[1], abs=1e-7)
+
+
+def test_demo_route_second_fix_of_each_leg_is_predicted():
+    motion = MotionModel()
+    route = demo_route(steps_per_leg=3)
+    for i, (lat, lon, heading) in enumerate(route[:-1]):
+        motion.update(lat, lon, t=float(i))
+        if i % 3 == 0 and i > 0:
+            predicted = motion.predict(1.0)
+            assert predicted[0] == pytest.approx(route[i + 1][0], abs=1e-6)
+            assert predicted[1] == pytest.approx(route[i + 1][1], abs=1e-6)
+            assert motion.heading == pytest.approx(route[i + 1][2], abs=0.5)
+    assert len(route) == 3 * (len(DEMO_WAYPOINTS) - 1)
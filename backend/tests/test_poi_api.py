@@ -0,0 +1,34 @@
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def client():
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_view_query_returns_ranked_pois(client):
+    r = client.get("/api/pois", params={"lat": 37.7749, "lon": -122.4194, "fov": 120, "limit": 3})
+    assert r.status_code == 200
+    assert len(json.loads(r.content)) <= 3
+
+
+@pytest.mark.parametrize("params", [
+    {"radius_km": 1e6},
+    {"radius_km": 0},
+    {"radius_km": -1},
+    {"fov": -10},
+    {"fov": 0},
+    {"fov": 720},
+    {"limit": -1},
+    {"limit": 10_000},
+    {"lat": 91},
+    {"lon": -181},
+])
+def test_out_of_range_query_is_rejected(client, params):
+    r = client.get("/api/pois", params={"lat": 37.7749, "lon": -122.4194, **params})
+    assert r.status_code == 422
@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+import pois_database
+from motion import MotionModel
+from poi_cache import PoiPrefetcher, PoiTileCache, ViewTile, geohash_decode, geohash_encode
+from poi_store import CATEGORIES, PoiStore, write_store
+
+
+def test_geohash_known_value():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    lat, lon = geohash_decode("u4pruydqqvj")
+    assert lat == pytest.approx(57.64911, abs=1e-5) and lon == pytest.approx(10.40744, abs=1e-5)
+
+
+@pytest.mark.parametrize("lat, lon", [
+    (37.7749, -122.4194), (0.0, 0.0), (-33.8688, 151.2093),
+    (12.5, 180.0), (12.5, -180.0), (-12.5, 179.9999), (-12.5, -179.9999), (90.0, 180.0), (-90.0, -180.0),
+])
+@pytest.mark.parametrize("precision", [1, 5, 7, 9])
+def test_geohash_round_trip(lat, lon, precision):
+    cell = geohash_encode(lat, lon, precision)
+    assert len(cell) == precision
+    center_lat, center_lon = geohash_decode(cell)
+    bits = 5 * precision
+    assert abs(center_lat - lat) <= 180 / 2 ** (bits // 2) / 2
+    assert abs(center_lon - lon) <= 360 / 2 ** (bits - bits // 2) / 2
+    assert -180 < center_lon < 180
+    assert geohash_encode(center_lat, center_lon, precision) == cell
+
+
+def test_antimeridian_edges_land_in_opposite_cells():
+    east, west = geohash_encode(0.0, 180.0, 3), geohash_encode(0.0, -180.0, 3)
+    assert geohash_decode(east)[1] > 179 and geohash_decode(west)[1] < -179
+
+
+def test_least_recently_used_tile_is_evicted():
+    cache = PoiTileCache(precision=7, max_tiles=2)
+    a, b, c = (37.7749, -122.4194), (37.7849, -122.4194), (37.7949, -122.4194)
+    cache.get(*a, 1.0)
+    cache.get(*b, 1.0)
+    cache.get(*a, 1.0)  # a is now the most recent
+    cache.get(*c, 1.0)  # evicts b
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (1, 3)
+    cache.get(*a, 1.0)
+    assert (cache.hits, cache.misses) == (2, 3)
+    cache.get(*b, 1.0)
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_warm_does_not_count_as_a_lookup():
+    cache = PoiTileCache()
+    assert cache.warm(37.7749, -122.4194, 1.0)
+    assert not cache.warm(37.7749, -122.4194, 1.0)
+    cache.get(37.7749, -122.4194, 1.0)
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    rng = random.Random(11)
+    pois = [
+        (37.7749 + rng.uniform(-0.03, 0.03), -122.4194 + rng.uniform(-0.03, 0.03), f"POI {i}", rng.choice(CATEGORIES))
+        for i in range(3000)
+    ]
+    path = str(tmp_path / "pois.bin")
+    write_store(pois, path)
+    store = PoiStore(path)
+    monkeypatch.setattr(pois_database, "poi_store", store)
+    yield store
+
+
+def test_cached_view_matches_the_uncached_query(store):
+    cache = PoiTileCache()
+    rng = random.Random(5)
+    for _ in range(300):
+        # Clustered, so most fixes reuse a tile from an earlier one
+        lat, lon = 37.7749 + rng.uniform(-0.002, 0.002), -122.4194 + rng.uniform(-0.002, 0.002)
+        heading = rng.choice([0, 90, 200]) + rng.uniform(-15, 15)
+        fov, count, radius = rng.choice([30, 360]), rng.choice([1, 15]), 1.5
+        tile = cache.get(lat, lon, radius, heading, fov, count)
+        assert tile.pois == pois_database.get_pois_in_view(lat, lon, heading, fov, count, radius)
+    assert cache.hits > 100
+    assert all(isinstance(tile, ViewTile) for tile in cache._tiles.values())
+
+
+def test_prefetch_keys_view_tiles_by_the_predicted_heading():
+    cache = PoiTileCache()
+    prefetcher = PoiPrefetcher(cache, horizon_s=3.0)
+    motion = MotionModel()
+    for i in range(3):
+        motion.update(37.7749, -122.4194 + 0.0002 * i, t=float(i))  # heading east
+    points = prefetcher.predicted_points(motion)
+    assert len(points) == 3
+    assert all(heading == pytest.approx(90.0) for _, _, heading in points)
+    assert prefetcher.prefetch_now(points, 1.5, 120.0, 15) > 0
+    # The next fix heads east, whatever the phone reported on the last one
+    lat, lon = motion.predict(1.0)
+    cache.get(lat, lon, 1.5, 90.0, 120.0, 15)
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_standing_player_prefetches_nothing():
+    motion = MotionModel()
+    motion.update(37.7749, -122.4194, t=0.0)
+    assert PoiPrefetcher(PoiTileCache()).predicted_points(motion) == []
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+import pois_database
+from poi_store import CATEGORIES, PoiStore, write_store
+
+
+def exhaustive(lat, lon, heading, fov_deg, max_count, radius_km):
+    """rank_in_view over every POI, with no pre-filtering"""
+    if pois_database.poi_store is not None:
+        store = pois_database.poi_store
+        candidates = [(i, *store.coords(i), store.category(i)) for i in range(len(store))]
+    else:
+        candidates = [(i, p["lat"], p["lon"], p.get("category", "other")) for i, p in enumerate(pois_database.SF_POIS)]
+    return pois_database.pois_at(pois_database.rank_in_view(
+        candidates, lat, lon, heading, fov_deg, max_count, radius_km
+    ))
+
+
+def queries(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield (37.7749 + rng.uniform(-0.03, 0.03), -122.4194 + rng.uniform(-0.03, 0.03),
+               rng.uniform(0, 360), rng.choice([30, 90, 120, 359, 360]), rng.choice([0, 5, 15]),
+               rng.choice([0.5, 1.5, 3.0]))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    rng = random.Random(7)
+    pois = [
+        (37.7749 + rng.uniform(-0.05, 0.05), -122.4194 + rng.uniform(-0.05, 0.05), f"POI {i}", rng.choice(CATEGORIES))
+        for i in range(5000)
+    ]
+    path = str(tmp_path / "pois.bin")
+    write_store(pois, path)
+    store = PoiStore(path)
+    monkeypatch.setattr(pois_database, "poi_store", store)
+    yield store
+    store.close()
+
+
+def test_view_query_matches_exhaustive_ranking_on_store(store):
+    for query in queries(1, 200):
+        assert pois_database.get_pois_in_view(*query) == exhaustive(*query)
+
+
+def test_view_query_matches_exhaustive_ranking_on_builtin_list(monkeypatch):
+    monkeypatch.setattr(pois_database, "poi_store", None)
+    for query in queries(2, 300):
+        assert pois_database.get_pois_in_view(*query) == exhaustive(*query)
+
+
+def test_nearby_indices_matches_haversine(store):
+    lat, lon = 37.7749, -122.4194
+    expected = [
+        i for i in range(len(store))
+        if pois_database.haversine_distance(lat, lon, store.lats[i], store.lons[i]) <= 1.5
+    ]
+    assert sorted(store.nearby_indices(lat, lon, 1.5)) == expected
+
+
+def test_museums_have_their_own_weighted_category():
+    categories = {p["label"]: p["category"] for p in pois_database.SF_POIS}
+    assert categories["de Young Museum"] == "museum"
+    assert categories["California Academy of Sciences"] == "museum"
+    assert set(categories.values()) <= set(pois_database.CATEGORY_WEIGHTS)
+    assert set(CATEGORIES) <= set(pois_database.CATEGORY_WEIGHTS)
@@ -0,0 +1,47 @@
+import pytest
+
+from prompt_builder import build_observation_prompt, dedupe, estimate_tokens, fit_to_budget
+
+
+SCENES = [
+    f"Observation {i}: a person walks past a parked bicycle near a cafe with outdoor seating."
+    for i in range(40)
+]
+
+
+def test_dedupe_collapses_repeats_keeping_the_newest():
+    entries = ["A cat on a wall", "a  CAT on a wall ", "A dog", "", "A cat on a wall"]
+    assert dedupe(entries) == ["A dog", "A cat on a wall"]
+    assert dedupe(entries, exclude="a dog") == ["A cat on a wall"]
+
+
+def test_fit_to_budget_keeps_newest_entries_oldest_first():
+    kept = fit_to_budget(SCENES, 100)
+    assert kept == SCENES[-len(kept):]
+    assert 0 < len(kept) < len(SCENES)
+    assert sum(estimate_tokens(entry) + 1 for entry in kept) <= 100
+
+
+@pytest.mark.parametrize("budget", range(20, 420, 13))
+def test_prompt_never_exceeds_budget(budget):
+    summary = "; ".join(SCENES[:10])
+    prompt = build_observation_prompt(SCENES, SCENES[-1] * 3, budget, summary=summary)
+    assert estimate_tokens(prompt) <= budget
+    assert "Latest observation:" in prompt
+
+
+def test_prompt_drops_duplicate_observations():
+    history = ["A red door", "A blue car", "a red door", "A blue car"]
+    prompt = build_observation_prompt(history, "A blue car", 500)
+    assert prompt.lower().count("a red door") == 1
+    assert prompt.count("A blue car") == 1  # only as the latest observation
+
+
+def test_summary_gets_budget_after_observations():
+    history = SCENES[-3:]
+    prompt = build_observation_prompt(history, "Now", 500, summary="an earlier summary")
+    assert prompt.startswith("Earlier (summarized): an earlier summary")
+    assert all(scene in prompt for scene in history)
+
+    tight = build_observation_prompt(history, "Now", estimate_tokens(build_observation_prompt(history, "Now", 500)))
+    assert "Earlier (summarized)" not in tight
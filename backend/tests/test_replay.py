@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+import replay
+from motion import METERS_PER_DEG_LAT
+
+
+@pytest.fixture
+def main(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "session_clock", main.session_clock)
+    monkeypatch.setattr(main, "gps_filter", type(main.gps_filter)())
+    return main
+
+
+def location(t, north_m):
+    return {"t": t, "m": "POST", "p": "/api/location", "s": 200,
+            "b": {"lat": 37.7749 + north_m / METERS_PER_DEG_LAT, "lon": -122.4194}}
+
+
+def test_clock_steps_to_each_record_at_max_speed_and_never_runs_backwards():
+    clock = replay.ReplayClock()
+    clock.start(100.0, 0.0)
+    clock.now = 104.0
+    assert clock() == pytest.approx(4.0)
+    clock.start(0.0, 0.0)
+    assert clock() == pytest.approx(4.0)
+
+
+def test_gps_filter_sees_recorded_time_at_max_speed(main):
+    # 150 m in 4 recorded seconds is a brisk ride; in the few real
+    # milliseconds a max-speed replay takes it would be an outlier
+    app = replay.load_app(fake_openai=False)
+    result = asyncio.run(replay.replay(app, [location(0.0, 0), location(4.0, 150)], speed=0, lifespan=False))
+    assert result.errors == 0
+    assert main.store.state.player.lat == pytest.approx(37.7749 + 150 / METERS_PER_DEG_LAT, abs=2e-5)
@@ -0,0 +1,30 @@
+import threading
+import time
+
+from session_recorder import SessionRecorder, load_session
+
+
+def test_records_round_trip_through_close(tmp_path):
+    path = str(tmp_path / "walk.jsonl")
+    recorder = SessionRecorder(path)
+    recorder.record(0.5, "POST", "/api/location", b"", b'{"lat":1,"lon":2}', 200)
+    recorder.record(0.25, "GET", "/api/state", b"fields=objective", b"", 304)
+    recorder.close()
+    assert load_session(path) == [
+        {"t": 0.25, "m": "GET", "p": "/api/state", "q": "fields=objective", "s": 304},
+        {"t": 0.5, "m": "POST", "p": "/api/location", "b": {"lat": 1, "lon": 2}, "s": 200},
+    ]
+
+
+def test_record_does_not_wait_for_the_disk(tmp_path):
+    recorder = SessionRecorder(str(tmp_path / "walk.jsonl"))
+    release = threading.Event()
+    write = recorder._write
+    recorder._write = lambda entry: (release.wait(), write(entry))
+    started = time.perf_counter()
+    for i in range(100):
+        recorder.record(i, "GET", "/api/state", b"", b"", 200)
+    assert time.perf_counter() - started < 0.5
+    release.set()
+    recorder.close()
+    assert len(load_session(recorder.path)) == 100
@@ -0,0 +1,79 @@
+import gzip
+
+import pytest
+from starlette.testclient import TestClient
+
+import http_encoding
+
+
+def vary(response):
+    return [value.strip() for value in response.headers["vary"].split(",")]
+
+
+@pytest.fixture(scope="module")
+def main():
+    import main
+    return main
+
+
+@pytest.fixture
+def client(main):
+    with TestClient(main.app) as client:
+        # Big enough to be worth compressing
+        main.store.update(objective="Find the hidden courtyard " * 40)
+        yield client
+
+
+def test_matching_if_none_match_gets_bodyless_304(client):
+    first = client.get("/api/state")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    again = client.get("/api/state", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+
+@pytest.mark.parametrize("header", ['W/{etag}', '"other", {etag}', '"a",W/{etag} , "b"', "*"])
+def test_weak_and_list_etags_match(client, header):
+    etag = client.get("/api/state").headers["etag"]
+    assert client.get("/api/state", headers={"If-None-Match": header.format(etag=etag)}).status_code == 304
+
+
+def test_stale_etag_gets_the_new_state(client, main):
+    etag = client.get("/api/state").headers["etag"]
+    main.store.update(danger_level="low")
+    r = client.get("/api/state", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert r.json()["danger_level"] == "low"
+
+
+def test_gzip_when_accepted_and_vary_always_set(client, main):
+    r = client.get("/api/state", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in vary(r)
+    assert r.json()["objective"].startswith("Find the hidden courtyard")
+    assert main.store.compressed("gzip") == gzip.compress(main.store.encoded(), http_encoding.GZIP_LEVEL, mtime=0)
+
+    plain = client.get("/api/state", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert "Accept-Encoding" in vary(plain)
+
+
+@pytest.mark.parametrize("accept", ["gzip;q=0", "gzip; q=0.0, identity", "br;q=0, gzip;q=0"])
+def test_q_zero_is_honoured(client, accept):
+    r = client.get("/api/state", headers={"Accept-Encoding": accept})
+    assert "content-encoding" not in r.headers
+
+
+def test_small_bodies_are_not_compressed():
+    assert http_encoding.pick_encoding("gzip", http_encoding.MIN_COMPRESS_BYTES - 1) is None
+    assert http_encoding.pick_encoding("gzip", http_encoding.MIN_COMPRESS_BYTES) == "gzip"
+
+
+def test_br_preferred_when_available(monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    monkeypatch.setattr(http_encoding, "brotli", brotli)
+    assert http_encoding.pick_encoding("gzip, br", 1000) == "br"
+    assert http_encoding.pick_encoding("gzip, br;q=0", 1000) == "gzip"
@@ -0,0 +1,71 @@
+import asyncio
+import json
+from dataclasses import asdict
+
+from models import GameState
+from state_store import StateStore
+
+
+def encode(state: GameState, fields=None) -> bytes:
+    data = asdict(state)
+    if fields is not None:
+        data = {name: data[name] for name in fields}
+    return json.dumps(data).encode()
+
+
+def test_update_publishes_new_snapshot_and_revision(game_state):
+    store = StateStore(game_state, encode)
+    before = store.state
+    store.update(objective="Find the cat", danger_level="low")
+    assert store.revision == 2
+    assert store.state.objective == "Find the cat"
+    assert store.state.danger_level == "low"
+    assert before.objective == "Explore"  # old snapshot untouched
+
+
+def test_encoding_is_cached_per_revision_and_projection(game_state):
+    calls = []
+
+    def counting(state, fields=None):
+        calls.append(fields)
+        return encode(state, fields)
+
+    store = StateStore(game_state, counting)
+    assert store.encoded() is store.encoded()
+    assert json.loads(store.encoded(("objective",))) == {"objective": "Explore"}
+    assert calls == [None, ("objective",)]
+    store.update(objective="Next")
+    assert json.loads(store.encoded())["objective"] == "Next"
+    assert calls == [None, ("objective",), None]
+
+
+def test_compressed_is_cached_per_revision(game_state):
+    import gzip
+
+    store = StateStore(game_state, encode)
+    body = store.compressed("gzip")
+    assert store.compressed("gzip") is body
+    assert gzip.decompress(body) == store.encoded()
+
+
+def test_critical_revision_and_listeners(game_state):
+    store = StateStore(game_state, encode, critical_fields=("danger_level", "boss_fight_active"))
+    seen = []
+    store.add_listener(lambda revision, critical: seen.append((revision, critical)))
+    store.update(objective="Next")
+    store.update(danger_level="high")
+    store.update(danger_level="high")  # unchanged value is not critical
+    assert seen == [(2, False), (3, True), (4, False)]
+    assert store.critical_revision == 3
+
+
+def test_wait_for_change(game_state):
+    async def run(store):
+        assert await store.wait_for_change(0) is True  # already past
+        assert await store.wait_for_change(store.revision, timeout=0.01) is False
+        waiter = asyncio.create_task(store.wait_for_change(store.revision, timeout=1))
+        await asyncio.sleep(0)
+        store.update(objective="Next")
+        assert await waiter is True
+
+    asyncio.run(run(StateStore(game_state, encode)))
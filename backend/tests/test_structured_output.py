@@ -0,0 +1,105 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+import ai_processor
+from resilience import CircuitBreaker
+from structured_output import parse_reply, repair_messages, strict_json_schema
+
+
+class Inner(BaseModel):
+    label: str = "x"
+
+
+class Outer(BaseModel):
+    title: str  # a field named like a dropped keyword stays
+    count: int = 3
+    note: Optional[str] = None
+    items: List[Inner] = []
+
+
+def walk(node):
+    yield node
+    if isinstance(node, dict):
+        for value in node.values():
+            yield from walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from walk(value)
+
+
+def test_strict_schema_requires_everything_and_drops_defaults():
+    schema = strict_json_schema(Outer)
+    objects = [n for n in walk(schema) if isinstance(n, dict) and n.get("type") == "object"]
+    assert len(objects) == 2  # Outer and Inner
+    for node in objects:
+        assert node["required"] == list(node["properties"])
+        assert node["additionalProperties"] is False
+    assert "title" in schema["properties"]
+    subschemas = [n for n in walk(schema) if isinstance(n, dict) and ("type" in n or "anyOf" in n)]
+    assert not any("default" in n or "title" in n for n in subschemas)
+
+
+def test_strict_schema_of_the_game_update():
+    schema = strict_json_schema(ai_processor.AIGameUpdate)
+    assert set(schema["required"]) == set(ai_processor.AIGameUpdate.model_fields)
+    assert schema["additionalProperties"] is False
+    assert "default" not in json.dumps(schema)
+
+
+VALID = {
+    "objective": "Cross the bridge", "message_text": "Onward!", "message_visible": True,
+    "danger_level": "low", "boss_fight_active": False, "boss_name": None, "environment_summary": "a bridge",
+}
+BAD_ENUM = json.dumps({**VALID, "danger_level": "extreme"})
+TRUNCATED = json.dumps(VALID)[:40]
+
+
+def test_repair_messages_quote_the_errors():
+    with pytest.raises(ValidationError) as error:
+        parse_reply(ai_processor.AIGameUpdate, BAD_ENUM)
+    messages = repair_messages([{"role": "user", "content": "scene"}], BAD_ENUM, error.value)
+    assert messages[1] == {"role": "assistant", "content": BAD_ENUM}
+    assert "danger_level" in messages[2]["content"]
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Scripted completions; the list of message lists each call received"""
+    calls, script = [], []
+
+    async def request_completion(model, messages):
+        calls.append(messages)
+        return script.pop(0)
+
+    monkeypatch.setattr(ai_processor, "request_completion", request_completion)
+    monkeypatch.setattr(ai_processor, "openai_limiter", SimpleNamespace(try_acquire=lambda: True))
+    monkeypatch.setattr(ai_processor, "openai_breaker", CircuitBreaker("test"))
+    monkeypatch.setattr(ai_processor, "HEDGE_ENABLED", False)
+    monkeypatch.setattr(ai_processor, "LLM_REPAIR_RETRIES", 1)
+    monkeypatch.setattr(ai_processor, "last_good_update", None)
+    return script, calls
+
+
+@pytest.mark.parametrize("bad", [BAD_ENUM, TRUNCATED])
+def test_bad_reply_is_repaired_once(replies, bad):
+    script, calls = replies
+    script.extend([bad, json.dumps(VALID)])
+    update = asyncio.run(ai_processor.request_update("gpt-test", [{"role": "user", "content": "scene"}]))
+    assert update.danger_level == "low"
+    assert len(calls) == 2
+    assert calls[1][-2] == {"role": "assistant", "content": bad}
+
+
+@pytest.mark.parametrize("bad", [BAD_ENUM, TRUNCATED])
+def test_second_bad_reply_falls_back(replies, bad):
+    script, calls = replies
+    script.extend([bad, bad, json.dumps(VALID)])
+    update = asyncio.run(ai_processor.process_camera_description("A quiet street"))
+    assert len(calls) == 2  # the original call and exactly one repair
+    assert update == ai_processor.degraded_update()
+    ai_processor.reset_context()
@@ -0,0 +1,43 @@
+import pytest
+
+import tts
+from tts import ClipCache
+
+
+def test_clip_cache_touches_disk_only_on_first_use(tmp_path):
+    directory = tmp_path / "clips"
+    cache = ClipCache(str(directory))
+    assert not directory.exists()
+    cache.put("abc", b"audio")
+    assert cache.get("abc") == b"audio"
+    assert "abc" in ClipCache(str(directory))  # reloaded from disk
+
+
+def test_prewarm_caches_stock_phrases(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts, "_backend", "local")
+    monkeypatch.setattr(tts, "clip_cache", ClipCache(str(tmp_path)))
+    tts.prewarm()
+    tts.wait_for_playback()
+    assert len(tts.clip_cache) == len(tts.STOCK_PHRASES)
+
+
+def test_prewarm_is_a_noop_without_tts(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts, "_backend", "elevenlabs")
+    monkeypatch.setattr(tts, "_configured", False)
+    monkeypatch.setattr(tts, "clip_cache", ClipCache(str(tmp_path / "clips")))
+    tts.prewarm()
+    tts.wait_for_playback()
+    assert not (tmp_path / "clips").exists()
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_server_startup_prewarms_tts(monkeypatch, enabled):
+    from starlette.testclient import TestClient
+    import main
+
+    calls = []
+    monkeypatch.setattr(main, "TTS_PREWARM_ENABLED", enabled)
+    monkeypatch.setattr(tts, "prewarm", lambda: calls.append(1))
+    with TestClient(main.app):
+        pass
+    assert calls == ([1] if enabled else [])
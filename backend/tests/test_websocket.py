@@ -0,0 +1,80 @@
+import json
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+from subscriptions import Subscription
+
+BAD_MESSAGES = [
+    "not json",
+    "[1, 2]",
+    '{"fields": 5}',
+    '{"fields": [1, 2]}',
+]
+
+
+@pytest.fixture(scope="module")
+def main():
+    import main
+    return main
+
+
+@pytest.mark.parametrize("bad", BAD_MESSAGES)
+def test_bad_control_message_raises_a_handled_error(main, bad):
+    with pytest.raises((ValueError, TypeError, KeyError)):
+        main.handle_control(Subscription(None, None, 10.0, 1.0), bad)
+
+
+def test_bad_control_message_keeps_socket_open(main):
+    with TestClient(main.app) as client, client.websocket_connect("/ws") as ws:
+        assert "objective" in json.loads(ws.receive_text())
+        for bad in BAD_MESSAGES:
+            ws.send_text(bad)
+        ws.send_text(json.dumps({"fields": ["danger_level"]}))
+        assert list(json.loads(ws.receive_text())) == ["danger_level"]
+
+
+@pytest.mark.parametrize("requested", [None, 0, -1, "fast", [1], float("nan"), float("inf"), "1e400", 50])
+def test_unusable_max_hz_falls_back_to_the_server_cap(main, requested):
+    assert main.client_max_hz(requested) == main.BROADCAST_MAX_HZ
+
+
+def test_max_hz_below_the_cap_is_kept(main):
+    assert main.client_max_hz("2") == 2.0
+    assert main.client_max_hz(0.5) == 0.5
+
+
+def test_non_numeric_max_hz_still_applies_the_fields(main):
+    client = Subscription(None, None, 2.0, 1.0)
+    main.handle_control(client, '{"fields": ["danger_level"], "max_hz": "fast"}')
+    assert client.fields == ("danger_level",)
+    assert client.interval == client.min_interval == pytest.approx(1.0 / main.BROADCAST_MAX_HZ)
+
+
+def test_critical_change_skips_a_slow_clients_interval(main, monkeypatch):
+    """A danger change reaches a 0.2 Hz client at once; a client not watching danger isn't woken"""
+    offers = []
+    offer = Subscription.offer
+
+    def recording_offer(self, critical=False):
+        offers.append((self.fields, critical))
+        offer(self, critical)
+
+    main.store.update(danger_level="none")
+    with TestClient(main.app) as client, \
+            client.websocket_connect("/ws?fields=objective,danger_level&max_hz=0.2") as slow, \
+            client.websocket_connect("/ws?fields=objective&max_hz=0.2") as unrelated:
+        assert json.loads(slow.receive_text())["danger_level"] == "none"
+        unrelated.receive_text()
+        assert all(c.interval == pytest.approx(5.0) for c in main.connected_clients)
+        monkeypatch.setattr(Subscription, "offer", recording_offer)
+        started = time.monotonic()
+        client.post("/api/danger", json={"danger_level": "high", "boss_fight_active": False})
+        frame = json.loads(slow.receive_text())
+        elapsed = time.monotonic() - started
+        assert frame == {"objective": main.store.state.objective, "danger_level": "high"}
+        assert elapsed < 1.0
+        assert (("objective", "danger_level"), True) in offers
+        assert not any(fields == ("objective",) for fields, _ in offers)
+        client.post("/api/danger", json={"danger_level": "none", "boss_fight_active": False})
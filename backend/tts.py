@@ -1,39 +1,290 @@
+"""
+Text-to-speech with an on-disk clip cache and background playback.
+
+Clips are cached by (text, voice_id, model_id), so stock phrases are only
+synthesized once; call prewarm() at startup to fetch them ahead of time.
+stream_tts() queues the phrase and returns immediately: a worker thread
+synthesizes (or loads) and plays clips in order.
+
+Set TTS_BACKEND=local to use an offline stand-in synthesizer (short WAV
+tones, optional TTS_LOCAL_LATENCY_MS delay, playback simulated by sleeping)
+instead of ElevenLabs.
+"""
+from collections import OrderedDict
 from os import getenv
-from typing import Optional
+from typing import Callable, Iterable, Optional
+import hashlib
+import importlib.util
+import io
+import math
+import os
+import queue
+import struct
+import threading
+import time
+import wave
 from dotenv import load_dotenv
-from elevenlabs import stream as play_stream
-from elevenlabs.client import ElevenLabs
+
+from metrics import metrics
 
 # Load environment variables from backend/.env if present
 load_dotenv()
 
+_backend: str = getenv("TTS_BACKEND", "elevenlabs")
 _api_key: Optional[str] = getenv("ELEVENLABS_API_KEY")
-_client: Optional[ElevenLabs] = ElevenLabs(api_key=_api_key) if _api_key else None
+# The elevenlabs SDK is imported and its client built on first use (_get_client);
+# offline setups without the package can still use TTS_BACKEND=local
+_configured = bool(_api_key) and _backend == "elevenlabs" and importlib.util.find_spec("elevenlabs") is not None
+_client = None
+_client_lock = threading.Lock()
 _default_voice: Optional[str] = getenv("ELEVENLABS_VOICE_ID")
 _default_model: str = getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2")
 
+# Format of cached clips (ElevenLabs streams MP3 by default)
+CLIP_MEDIA_TYPE = "audio/wav" if _backend == "local" else "audio/mpeg"
 
-def stream_tts(text: str, voice_id: Optional[str] = None, model_id: Optional[str] = None, play: bool = True) -> None:
+# Phrases the demo and overlay speak over and over
+STOCK_PHRASES = (
+    "Adventure begins!",
+    "Danger approaching!",
+    "Enemy defeated!",
+    "Achievement unlocked: First quest!",
+)
+
+
+class ClipCache:
     """
-    Stream TTS audio from ElevenLabs. For demo resilience, this is a no-op if
-    ELEVENLABS_API_KEY or voice_id are missing.
+    Content-addressed audio clips on disk, evicted least recently used once
+    the directory exceeds `max_bytes`. Recency is tracked via file mtimes,
+    so it survives restarts. The directory is created and scanned on first
+    use, so importing tts touches nothing on disk.
     """
-    if not _client:
-        return
+
+    def __init__(self, directory: str, max_bytes: int = 50 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".clip"):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((stat.st_mtime, name[:-5], stat.st_size))
+            for _, key, size in sorted(entries):
+                self._sizes[key] = size
+            self._loaded = True
+
+    @staticmethod
+    def key(text: str, voice_id: str, model_id: str) -> str:
+        return hashlib.sha256(f"{model_id}\0{voice_id}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".clip")
+
+    def get(self, key: str) -> Optional[bytes]:
+        self._load()
+        with self._lock:
+            if key not in self._sizes:
+                return None
+            self._sizes.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                audio = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            with self._lock:
+                self._sizes.pop(key, None)
+            return None
+        return audio
+
+    def put(self, key: str, audio: bytes) -> None:
+        self._load()
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            self._sizes[key] = len(audio)
+            self._sizes.move_to_end(key)
+            while sum(self._sizes.values()) > self.max_bytes and len(self._sizes) > 1:
+                old_key, _ = self._sizes.popitem(last=False)
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+                metrics.incr("tts.cache.evictions")
+
+    def __contains__(self, key: str) -> bool:
+        self._load()
+        return key in self._sizes
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._sizes)
+
+
+def local_synthesize(text: str, voice_id: str, model_id: str) -> bytes:
+    """Offline stand-in: a mono 16 kHz WAV tone, ~60 ms per character"""
+    time.sleep(float(getenv("TTS_LOCAL_LATENCY_MS", "0")) / 1000)
+    rate = 16000
+    frames = int(rate * 0.06 * max(1, len(text)))
+    pitch = 220 + int(hashlib.md5(voice_id.encode()).hexdigest()[:2], 16)
+    samples = b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * pitch * i / rate)))
+        for i in range(frames)
+    )
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples)
+    return out.getvalue()
+
+
+def _local_play(audio: bytes) -> None:
+    """Simulated playback: wait as long as the clip lasts"""
+    with wave.open(io.BytesIO(audio)) as w:
+        time.sleep(w.getnframes() / w.getframerate())
+
+
+clip_cache = ClipCache(
+    getenv("TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tts_cache")),
+    max_bytes=int(getenv("TTS_CACHE_MAX_MB", "50")) * 2**20,
+)
+
+
+def _get_client():
+    """The ElevenLabs client, imported and constructed on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from elevenlabs.client import ElevenLabs
+            _client = ElevenLabs(api_key=_api_key)
+    return _client
+
+
+def _resolve(voice_id: Optional[str], model_id: Optional[str]):
+    """(voice, model) to use, or None when TTS is not configured"""
+    if _backend == "local":
+        return voice_id or _default_voice or "local", model_id or "local"
+    if not _configured:
+        return None
     vid = voice_id or _default_voice
     if not vid:
+        return None
+    return vid, model_id or _default_model
+
+
+def cache_clip(text: str, voice_id: Optional[str] = None, model_id: Optional[str] = None) -> Optional[str]:
+    """Make sure the clip for text is cached; returns its cache key"""
+    resolved = _resolve(voice_id, model_id)
+    if resolved is None:
+        return None
+    vid, mid = resolved
+    key = ClipCache.key(text, vid, mid)
+    if key in clip_cache:
+        metrics.incr("tts.cache.hits")
+    else:
+        metrics.incr("tts.cache.misses")
+        started = time.perf_counter()
+        if _backend == "local":
+            audio = local_synthesize(text, vid, mid)
+        else:
+            audio = b"".join(_get_client().text_to_speech.convert(text=text, voice_id=vid, model_id=mid))
+        metrics.observe("tts.synthesize_ms", (time.perf_counter() - started) * 1000)
+        clip_cache.put(key, audio)
+    return key
+
+
+def get_clip(text: str, voice_id: Optional[str] = None, model_id: Optional[str] = None) -> Optional[bytes]:
+    """Cached audio for text, synthesizing (and caching) on a miss"""
+    key = cache_clip(text, voice_id, model_id)
+    return clip_cache.get(key) if key else None
+
+
+def _speak(text: str, voice_id: Optional[str], model_id: Optional[str], play: bool) -> None:
+    resolved = _resolve(voice_id, model_id)
+    if resolved is None:
         return
-    mid = model_id or _default_model
-    audio_stream = _client.text_to_speech.stream(
-        text=text,
-        voice_id=vid,
-        model_id=mid,
-    )
-    if play:
-        play_stream(audio_stream)
+    vid, mid = resolved
+    key = ClipCache.key(text, vid, mid)
+    if _backend != "local" and play and key not in clip_cache:
+        # Play while it streams in, then keep the full clip
+        metrics.incr("tts.cache.misses")
+        from elevenlabs import stream as play_stream
+        audio_stream = _get_client().text_to_speech.stream(text=text, voice_id=vid, model_id=mid)
+        clip_cache.put(key, play_stream(audio_stream))
+        return
+    audio = get_clip(text, vid, mid)
+    if play and audio:
+        if _backend == "local":
+            _local_play(audio)
+        else:
+            from elevenlabs import play as play_audio
+            play_audio(audio)
+
+
+_jobs: "queue.Queue[Callable[[], None]]" = queue.Queue()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+
+def _run_jobs() -> None:
+    while True:
+        job = _jobs.get()
+        try:
+            job()
+        except Exception as e:
+            print(f"TTS error: {e}")
+        finally:
+            _jobs.task_done()
+
+
+def _submit(job: Callable[[], None]) -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run_jobs, name="tts", daemon=True)
+            _worker.start()
+    _jobs.put(job)
+
+
+def stream_tts(
+    text: str,
+    voice_id: Optional[str] = None,
+    model_id: Optional[str] = None,
+    play: bool = True,
+    block: bool = False,
+) -> None:
+    """
+    Speak text via ElevenLabs (or the local stand-in). Returns immediately
+    unless block=True; clips play one after another in the background. For
+    demo resilience, this is a no-op if ELEVENLABS_API_KEY or voice_id are
+    missing.
+    """
+    if block:
+        _speak(text, voice_id, model_id, play)
     else:
-        for _chunk in audio_stream:
-            # Hook for future processing of raw bytes
-            pass
+        _submit(lambda: _speak(text, voice_id, model_id, play))
+
+
+def prewarm(phrases: Iterable[str] = STOCK_PHRASES, voice_id: Optional[str] = None,
+            model_id: Optional[str] = None) -> None:
+    """Synthesize missing clips for phrases in the background"""
+    if _resolve(voice_id, model_id) is None:
+        return
+    for text in phrases:
+        _submit(lambda text=text: cache_clip(text, voice_id, model_id))
 
 
+def wait_for_playback() -> None:
+    """Block until every queued phrase has been spoken"""
+    _jobs.join()